@@ -1,82 +1,159 @@
 import os
-import cv2
 import time
-import json
 import logging
 import asyncio
-import datetime
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from functools import partial
 from dotenv import load_dotenv
 from telegram.ext import ApplicationBuilder
 from telegram.ext import CommandHandler
+from src.archive import DetectionArchive
 from src.camera import Camera
+from src.camera_manager import CameraManager, open_sources
+from src.cascade import CascadeDetector
+from src.clip_recorder import ClipRecorder
 from src.detection import CatDetector
+from src.detection_worker import DetectionWorker
+from src.frame_broker import BrokerSource, brokered
+from src.frame_source import Picamera2Source
+from src.inference_server import InferenceServer
+from src.metrics import METRICS, MetricsServer, process_uptime
+from src.roi import RegionOfInterest
+from src.scheduler import SCHEDULERS
+from src.thermal import ThermalGovernor
+from src.tiling import TiledDetector
+from src.voting import DECISION_ENGINES
 from src.telegram_notifier import TelegramNotifier
+from utils.motion_detection import MOTION_ENGINES, parse_regions
 
-last_detection_time = 0
+background_tasks = set()
 
-async def periodic_detection(bot, chat_id: str):
+
+async def record_clip(source_id, detection_type: str, cycle_id: int, caption: str, post_roll: float, fps: float,
+                      send: bool):
+    """
+    Records the clip of a confirmed event: the camera's pre-roll plus the frames of
+    the next `post_roll` seconds, collected off the detection worker so detection
+    keeps running, encoded by the clip recorder process, indexed in the archive
+    and optionally sent to Telegram.
+
+    Args:
+        source_id: The camera of the event.
+        detection_type (str): The confirmed class.
+        cycle_id (int): The detection cycle of the event.
+        caption (str): Caption of the video.
+        post_roll (float): Seconds to record after the detection.
+        fps (float): Maximum frame rate of the post-roll.
+        send (bool): Whether the clip is sent to Telegram.
+    """
+    try:
+        loop = asyncio.get_running_loop()
+        frames, timestamps = await loop.run_in_executor(None, camera.camera(source_id).record_clip_frames,
+                                                        post_roll, fps)
+        path = str(archive.clip_path(timestamps[0], detection_type, source_id))
+        await asyncio.wrap_future(clip_recorder.submit(frames, timestamps, path))
+        await loop.run_in_executor(None, archive.add_clip, path, timestamps.tolist(), detection_type, cycle_id,
+                                   source_id)
+        logging.info(f"Saved clip {path}")
+        if send:
+            notifier.send_video(path, caption)
+    except Exception as e:
+        logging.error(f"Error recording clip: {e}")
+
+
+async def periodic_detection(album_size: int = 3, clip_post_roll: float = 3.0, clip_fps: float = 5.0,
+                             send_clips: bool = True):
     """
     Perform periodic detection of cats and notify via Telegram
 
+    Capture and inference run on the detection worker thread, cat frames are
+    written by the archive thread and notifications are sent by the notifier's
+    queue, so the bot keeps polling meanwhile. The scheduler decides how long to
+    wait between cycles, and learns the usual visit times from the archive once a day.
+
+    Confirmed events are also recorded as clips in the background when the clip
+    recorder is enabled.
+
     Args:
-        bot: Telegram bot instance for sending messages.
-        chat_id (str): The chat ID for sending notifications.
+        album_size (int): Number of best frames of the decided class sent as one album.
+        clip_post_roll (float): Seconds recorded after a confirmed event.
+        clip_fps (float): Frame rate of the post-roll capture.
+        send_clips (bool): Whether clips are sent to Telegram.
     """
-    global last_detection_time
-    cooldown_period = 7200
+    loop = asyncio.get_running_loop()
+    visits_updated = float("-inf")
 
     while True:
         try:
             current_time = time.time()
-
-            if current_time - last_detection_time < cooldown_period:
-                await asyncio.sleep(30)
-                continue
+            if current_time - visits_updated > 86400:
+                scheduler.update_visits(await loop.run_in_executor(None, archive.visit_times))
+                visits_updated = current_time
 
             logging.info("Starting object detection cycle...")
-            detection_count = {'cat': 0, 'person': 0, 'none': 0, 'error': 0}
-
-            for i in range(5):
-                logging.info(f"Object detection iteration: [{i+1}/5]")
-                detection_type, img_with_box, img_original = camera.capture_and_detect()
-                detection_count[detection_type] += 1
-
-                if detection_type == "cat":
-                    file_name = f"cat_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}_{i}.jpg"
-                    file_path = Path(f"/home/raspi/CatBot/data/detections/{datetime.datetime.now().strftime('%Y%m%d')}/{file_name}")
-                    try:
-                        file_path.parent.mkdir(parents=True, exist_ok=True)
-                        if not cv2.imwrite(str(file_path), img_original):
-                            raise IOError("Failed to write image to file")
-                    except Exception as e:
-                        logging.error(f"Error saving cat image: {e}")
-
-                    metadata = {
-                        "timestamp": datetime.datetime.now().isoformat(),
-                        "detection_type": detection_type,
-                        "file_name": str(file_path)
-                    }
-
-                    with open(str(file_path.with_suffix(".json")), "w") as f:
-                        json.dump(metadata, f)
-
-                # Send notification if majority detection is confirmed
-                if detection_count['cat'] > 3 or detection_count['person'] > 3:
-                    logging.info(f"Majority detection confirmed: {detection_type}")
-                    success, encoded_image = cv2.imencode('.jpg', cv2.cvtColor(img_with_box, cv2.COLOR_BGR2RGB))
-                    if success:
-                        await bot.send_photo(chat_id=chat_id, photo=encoded_image.tobytes(), caption=f"{detection_type.capitalize()} detected!")
-                        break
-
-                    logging.info("Sleeping for 1 hour after detection.")
-                    await asyncio.sleep(3600)
-
-                    last_detection_time = current_time
-                    break
-
-            logging.info("Cycle complete. Sleeping for 30 seconds")
-            await asyncio.sleep(30)
+            for decision_engine in decision_engines.values():
+                decision_engine.reset()
+            decisions = {}
+            best_frames = {source_id: {} for source_id in decision_engines}
+            cycle_id = int(current_time)
+            motion = False
+            max_frames = sum(decision_engine.max_frames for decision_engine in decision_engines.values())
+
+            async with aclosing(worker.frames(max_frames)) as frames:
+                async for detection_type, frame, scores in frames:
+                    if 'time_to_first_detection_seconds' not in METRICS.gauges:
+                        METRICS.set('time_to_first_detection_seconds', process_uptime())
+                        logging.info(f"Time to first detection: "
+                                     f"{METRICS.gauges['time_to_first_detection_seconds']:.1f} s")
+                    source_id = frame.source_id
+                    if source_id in decisions:
+                        continue
+                    decision_engine = decision_engines[source_id]
+                    i = decision_engine.frames_used
+                    logging.info(f"Object detection iteration{f' ({source_id})' if source_id else ''}: "
+                                 f"[{i+1}/{decision_engine.max_frames}]")
+                    motion = motion or detection_type != "no motion"
+
+                    if detection_type == "cat":
+                        archive.submit(frame, scores[detection_type], index=i, cycle_id=cycle_id)
+                    if detection_type in ("cat", "person"):
+                        best = best_frames[source_id].setdefault(detection_type, [])
+                        best.append((scores[detection_type], frame))
+                        best.sort(key=lambda entry: entry[0], reverse=True)
+                        del best[album_size:]
+
+                    decision = decision_engine.update(detection_type, scores)
+                    if decision is not None:
+                        decisions[source_id] = decision
+                        if len(decisions) == len(decision_engines):
+                            break
+
+            notified = None
+            for source_id, decision in decisions.items():
+                logging.info(f"Decision{f' ({source_id})' if source_id else ''}: {decision} after "
+                             f"{decision_engines[source_id].frames_used} frames")
+
+                # Send notification if the detection is confirmed
+                if decision in best_frames[source_id]:
+                    where = f" at {source_id}" if source_id else ""
+                    notifier.send_album([frame for _, frame in best_frames[source_id][decision]],
+                                        caption=f"{decision.capitalize()} detected{where}!")
+                    notified = notified or decision
+
+                    if clip_recorder is not None:
+                        task = asyncio.create_task(record_clip(source_id, decision, cycle_id,
+                                                               f"{decision.capitalize()} clip{where}", clip_post_roll,
+                                                               clip_fps, send_clips))
+                        background_tasks.add(task)
+                        task.add_done_callback(background_tasks.discard)
+            scheduler.record_cycle(time.time(), motion, notified)
+
+            gating = camera.gating_stats()
+            logging.info(f"Motion gating: {gating['gated']} frames gated, {gating['inferred']} frames inferred")
+            delay = scheduler.next_delay(time.time())
+            logging.info(f"Cycle complete. Sleeping for {delay:.0f} seconds")
+            await asyncio.sleep(delay)
         
         except RuntimeError as e:
             error_message = ""
@@ -87,13 +164,31 @@ async def periodic_detection(bot, chat_id: str):
                 error_message = "Critical: Object Detection failure."
 
             logging.critical(error_message)
-            await notifier.send_error_message(error_message)
+            notifier.send_error_message(error_message)
 
         except Exception as e:
             logging.error(f"Unexpected Error: {e}")
 
 
 
+async def govern_quality(governor: ThermalGovernor, detector: CatDetector, interval: float = 10.0):
+    """
+    Checks the temperature and load periodically and applies the matching quality level.
+
+    Args:
+        governor (ThermalGovernor): The governor.
+        detector (CatDetector): The shared detector.
+        interval (float): Seconds between two checks.
+    """
+    while True:
+        try:
+            governor.update()
+            governor.apply(detector, worker)
+        except Exception as e:
+            logging.error(f"Thermal governor error: {e}")
+        await asyncio.sleep(interval)
+
+
 def start_bot_polling(application):
     """
     Start the bot polling.
@@ -114,27 +209,182 @@ def main():
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
     default_chat_id = os.getenv('TELEGRAM_CHAT_ID')
     model_path = os.getenv('MODEL_PATH')
+    detector_backend = os.getenv('DETECTOR_BACKEND', 'auto')
+    intra_op_threads = int(os.getenv('ONNX_INTRA_OP_THREADS', '0'))
+    inter_op_threads = int(os.getenv('ONNX_INTER_OP_THREADS', '0'))
+    graph_optimization_level = os.getenv('ONNX_GRAPH_OPTIMIZATION', 'all')
+    onnx_cache_dir = os.getenv('ONNX_CACHE_DIR', os.path.join(os.path.dirname(model_path or ''), '.ort_cache'))
+    roi_spec = os.getenv('DETECTION_ROI')
+    class_thresholds = {
+        15: float(os.getenv('CAT_CONF_THRESHOLD', '0.25')),
+        0: float(os.getenv('PERSON_CONF_THRESHOLD', '0.25')),
+    }
 
     async def test_command(update, context):
-        await notifier.send_current_frame(camera)
+        source_id = context.args[0] if context.args else None
+        if source_id is not None and source_id not in camera.cameras:
+            await update.message.reply_text(f"Unknown camera {source_id}, available: {', '.join(camera.cameras)}")
+            return
+        # With the capture broker /test reads the latest frame without waiting for the detection thread.
+        executor = None if isinstance(camera.camera(source_id).source, BrokerSource) else worker.executor
+        await notifier.send_current_frame(camera.camera(source_id), executor, test_detector)
+
+    async def stats_command(update, context):
+        await update.message.reply_text(METRICS.summary())
 
+    async def visits_command(update, context):
+        visits = await asyncio.get_running_loop().run_in_executor(None, archive.visits_per_day, "cat", 7)
+        lines = [f"{day[:4]}-{day[4:6]}-{day[6:]}: {count}" for day, count in visits]
+        await update.message.reply_text("Cat visits in the last 7 days:\n" + ("\n".join(lines) or "none"))
+
+    inference_server = None
+    test_detector = None
     try:
-        application = ApplicationBuilder().token(bot_token).build()
-        bot = application.bot
-        notifier = TelegramNotifier(bot_token, default_chat_id)
+        application = ApplicationBuilder().token(bot_token).connection_pool_size(4).build()
+        global notifier
+        notifier = TelegramNotifier(application.bot, default_chat_id,
+                                    min_interval=float(os.getenv('NOTIFY_MIN_INTERVAL', '1.0')),
+                                    coalesce_window=float(os.getenv('NOTIFY_COALESCE_WINDOW', '1.0')))
+
+        # The cameras are opened before the model so the inference slots can be sized for their frames.
+        cameras_spec = os.getenv('CAMERAS')
+        # One capture thread per camera owns the device, detection and /test read from it.
+        broker_options = {'fps': float(os.getenv('CAPTURE_FPS', '10')) or None} \
+            if os.getenv('CAPTURE_BROKER', '1') == '1' else None
+        if cameras_spec:
+            sources = open_sources(cameras_spec, broker_options)
+        else:
+            source = Picamera2Source()
+            if broker_options is not None:
+                source = brokered(source, **broker_options)
+            sources = [(None, source)]
 
-        detector = CatDetector(model_path)
+        load_start = time.perf_counter()
+        detector_options = {
+            'backend': detector_backend,
+            'intra_op_threads': intra_op_threads,
+            'inter_op_threads': inter_op_threads,
+            'graph_optimization_level': graph_optimization_level,
+            'roi': RegionOfInterest.parse(roi_spec) if roi_spec else None,
+            'cache_dir': onnx_cache_dir,
+        }
+        if os.getenv('INFERENCE_SERVER', '0') == '1':
+            # The model lives in its own process; the region of interest is applied by the client.
+            roi = detector_options.pop('roi')
+            # Full resolution frames are sent for tiling, so a slot must fit the largest main image.
+            if os.getenv('INFERENCE_MAX_FRAME'):
+                width, height = map(int, os.environ['INFERENCE_MAX_FRAME'].lower().split('x'))
+            else:
+                width, height = max((source.main_size for _, source in sources if source.main_size),
+                                    key=lambda size: size[0] * size[1], default=(1920, 1080))
+            inference_server = InferenceServer(partial(CatDetector, model_path, class_thresholds=class_thresholds,
+                                                       **detector_options),
+                                               slots=int(os.getenv('INFERENCE_SLOTS', '8')),
+                                               max_frame_shape=(height, width, 3))
+            inference_server.start()
+            detector = inference_server.client(roi=roi)
+            test_detector = inference_server.client()
+        else:
+            detector = CatDetector(model_path, class_thresholds=class_thresholds, **detector_options)
+        if os.getenv('DETECTION_CASCADE', '0') == '1' and inference_server is not None:
+            logging.warning("DETECTION_CASCADE is not supported with INFERENCE_SERVER, running a single pass")
+        elif os.getenv('DETECTION_CASCADE', '0') == '1':
+            screen_model = os.getenv('CASCADE_SCREEN_MODEL')
+            screen_thresholds = dict.fromkeys(class_thresholds, float(os.getenv('CASCADE_SCREEN_THRESHOLD', '0.1')))
+            screen_scale = float(os.getenv('CASCADE_SCREEN_SCALE', '1' if screen_model else '0.5'))
+            if screen_model:
+                screen = CatDetector(screen_model, class_thresholds=screen_thresholds, **detector_options)
+                screen.input_scale = screen_scale
+            else:
+                if detector.backend == 'onnxruntime' and not detector.model.dynamic_input:
+                    logging.warning("The cascade screens at the model's fixed input size, export it with "
+                                    "--dynamic or set CASCADE_SCREEN_MODEL for a cheaper first stage")
+                screen = detector.derive(screen_thresholds, screen_scale)
+            detector = CascadeDetector(screen, detector)
+        METRICS.set('model_load_seconds', time.perf_counter() - load_start)
+
+        # Warm up on the detection thread while the cameras start, before it serves the first frame.
+        batch_size = int(os.getenv('DETECTION_BATCH_SIZE', '5'))
+        detection_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="detection")
+        warmup = detection_executor.submit(detector.warmup, batch_sizes=(1, batch_size))
+        motion_engine = os.getenv('MOTION_ENGINE', 'mog2')
+        motion_options = {}
+        if os.getenv('MOTION_REGIONS') and motion_engine == 'frame_diff':
+            logging.warning("MOTION_REGIONS needs MOTION_ENGINE=mog2 or running_average, "
+                            "frame_diff ignores the regions")
+        elif os.getenv('MOTION_REGIONS'):
+            motion_options['regions'] = parse_regions(os.environ['MOTION_REGIONS'])
+        camera_options = {
+            'motion_gating': os.getenv('MOTION_GATING', '1') == '1',
+            'motion_hold_time': float(os.getenv('MOTION_HOLD_TIME', '60')),
+            'jpeg_quality': int(os.getenv('JPEG_QUALITY', '90')),
+            'preroll_frames': int(os.getenv('CLIP_PREROLL_FRAMES', '20')),
+            'motion_engine': partial(MOTION_ENGINES[motion_engine], **motion_options),
+            'tiler': TiledDetector(detector, tile_size=int(os.getenv('TILE_SIZE', '640')),
+                                   overlap=float(os.getenv('TILE_OVERLAP', '0.2')))
+            if os.getenv('TILED_INFERENCE', '0') == '1' else None,
+        }
+        global clip_recorder
+        clip_recorder = ClipRecorder() if camera_options['preroll_frames'] > 0 else None
         global camera
-        camera = Camera(detector)
+        camera = CameraManager([Camera(detector, source=source, source_id=source_id, **camera_options)
+                                for source_id, source in sources])
+        global decision_engines
+        decision_engine = os.getenv('DECISION_ENGINE', 'sprt')
+        decision_options = {'max_frames': int(os.getenv('DECISION_MAX_FRAMES', '5'))}
+        if decision_engine == 'sprt':
+            # Confidences below the detector's class thresholds count as misses, higher ones weigh more.
+            decision_options['thresholds'] = {'cat': class_thresholds[15], 'person': class_thresholds[0]}
+        decision_engines = {
+            source_id: DECISION_ENGINES[decision_engine](**decision_options)
+            for source_id in camera.source_ids
+        }
+        global scheduler
+        scheduler_name = os.getenv('SCHEDULER', 'adaptive')
+        scheduler_options = {'cooldown': float(os.getenv('SCHEDULER_COOLDOWN', '7200'))}
+        if scheduler_name == 'adaptive':
+            scheduler_options.update(min_interval=float(os.getenv('SCHEDULER_MIN_INTERVAL', '10')),
+                                     max_interval=float(os.getenv('SCHEDULER_MAX_INTERVAL', '300')))
+        scheduler = SCHEDULERS[scheduler_name](**scheduler_options)
+        global archive
+        archive = DetectionArchive(os.getenv('DETECTION_ARCHIVE_DIR', '/home/raspi/CatBot/data/detections'),
+                                   maxsize=int(os.getenv('ARCHIVE_QUEUE_SIZE', '32')))
+        global worker
+        worker = DetectionWorker(camera, maxsize=int(os.getenv('DETECTION_QUEUE_SIZE', '2')),
+                                 executor=detection_executor, batch_size=batch_size)
+        METRICS.set('warmup_seconds', warmup.result())
+        METRICS.set('startup_seconds', process_uptime())
+        logging.info(f"Ready {METRICS.gauges['startup_seconds']:.1f} s after start "
+                     f"(model load {METRICS.gauges['model_load_seconds']:.2f} s, "
+                     f"warm-up {METRICS.gauges['warmup_seconds']:.2f} s)")
 
         test_handler = CommandHandler('test', test_command)
         application.add_handler(test_handler)
+        application.add_handler(CommandHandler('stats', stats_command))
+        application.add_handler(CommandHandler('visits', visits_command))
+
+        metrics_port = int(os.getenv('METRICS_PORT', '9108'))
+        if metrics_port:
+            MetricsServer(METRICS, metrics_port).start()
 
         loop = asyncio.get_event_loop()
-        loop.create_task(periodic_detection(bot, default_chat_id))
+        loop.create_task(worker.run())
+        loop.create_task(notifier.run())
+        if os.getenv('THERMAL_GOVERNOR', '1') == '1':
+            thresholds = tuple(float(t) for t in os.getenv('THERMAL_THRESHOLDS', '65,72,78').split(','))
+            governor = ThermalGovernor(os.getenv('THERMAL_SYSFS_ROOT', '/'), thresholds=thresholds,
+                                       max_batch_size=batch_size)
+            loop.create_task(govern_quality(governor, detector, float(os.getenv('THERMAL_CHECK_INTERVAL', '10'))))
+        loop.create_task(periodic_detection(int(os.getenv('NOTIFY_ALBUM_SIZE', '3')),
+                                            clip_post_roll=float(os.getenv('CLIP_POST_ROLL', '3')),
+                                            clip_fps=float(os.getenv('CLIP_FPS', '5')),
+                                            send_clips=os.getenv('NOTIFY_CLIPS', '1') == '1'))
         loop.run_until_complete(application.run_polling())
     except Exception as e:
         logging.error(f"Error in main: {e}")
+    finally:
+        if inference_server is not None:
+            inference_server.stop()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,310 @@
+import json
+import queue
+import sqlite3
+import logging
+import datetime
+import threading
+import numpy as np
+from contextlib import closing
+from pathlib import Path
+from typing import List, Optional, Tuple
+from src.frame_artifact import FrameArtifact
+from src.metrics import METRICS
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    day TEXT NOT NULL,
+    detection_type TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    boxes TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    cycle_id INTEGER,
+    source_id TEXT
+);
+CREATE INDEX IF NOT EXISTS detections_day ON detections (day, detection_type);
+CREATE INDEX IF NOT EXISTS detections_timestamp ON detections (timestamp);
+CREATE TABLE IF NOT EXISTS clips (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp REAL NOT NULL,
+    day TEXT NOT NULL,
+    detection_type TEXT NOT NULL,
+    file_path TEXT NOT NULL,
+    frames INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    cycle_id INTEGER,
+    source_id TEXT
+);
+"""
+
+
+class DetectionArchive:
+    """
+    Saves detection frames from a background thread and indexes them in SQLite.
+
+    submit() only enqueues, so the detection loop never waits on the SD card. The
+    writer thread collects up to `batch_size` records, writes their images and
+    inserts their metadata in a single transaction. When the queue is full new
+    records are dropped rather than blocking the caller.
+
+    Attributes:
+        root (Path): Folder the images are written to, in one subfolder per day.
+        db_path (Path): The SQLite index.
+        batch_size (int): Maximum number of records written per transaction.
+        flush_interval (float): Seconds to wait for more records before writing a partial batch.
+        dropped (int): Number of records dropped because the queue was full.
+    """
+    def __init__(self, root: str, db_path: Optional[str] = None, maxsize: int = 32, batch_size: int = 8,
+                 flush_interval: float = 1.0):
+        self.root = Path(root)
+        self.db_path = Path(db_path) if db_path else self.root / "detections.db"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=maxsize)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            columns = {row["name"] for row in connection.execute("PRAGMA table_info(detections)")}
+            if "source_id" not in columns:
+                connection.execute("ALTER TABLE detections ADD COLUMN source_id TEXT")
+        self._thread = threading.Thread(target=self._run, name="archive", daemon=True)
+        self._thread.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Opens a connection to the index. Every thread uses its own connection.
+        """
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def submit(self, frame: FrameArtifact, confidence: float, index: int = 0,
+               cycle_id: Optional[int] = None) -> bool:
+        """
+        Queues a detection frame for writing. The original JPEG is encoded on the
+        writer thread unless another consumer already did.
+
+        Args:
+            frame (FrameArtifact): The frame with its detection type, boxes and timestamp.
+            confidence (float): Confidence of the detected class.
+            index (int): The iteration of the detection cycle.
+            cycle_id (Optional[int]): Identifies the detection cycle, frames of one cycle count as one visit.
+
+        Returns:
+            bool: False if the record was dropped because the queue is full.
+        """
+        detection_type = frame.detection_type
+        record = {
+            "timestamp": frame.timestamp,
+            "detection_type": detection_type,
+            "confidence": float(confidence),
+            "boxes": np.asarray(frame.detections, dtype=float).round(2).tolist(),
+            "index": index,
+            "cycle_id": cycle_id,
+            "source_id": frame.source_id,
+        }
+        try:
+            self._queue.put_nowait((frame, record))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            logging.warning(f"Archive queue full, dropped {detection_type} frame ({self.dropped} dropped so far)")
+            return False
+
+    def flush(self):
+        """
+        Blocks until every queued record has been written.
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Writes the remaining records and stops the writer thread.
+        """
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        """
+        Writer thread: collects records into batches and writes them.
+        """
+        connection = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    self._queue.task_done()
+                    return
+                batch = [item]
+                stop = self._collect(batch)
+                try:
+                    self._write_batch(connection, batch)
+                except Exception as e:
+                    logging.error(f"Error writing detection archive batch: {e}")
+                finally:
+                    for _ in batch:
+                        self._queue.task_done()
+                if stop:
+                    self._queue.task_done()
+                    return
+        finally:
+            connection.close()
+
+    def _collect(self, batch: list) -> bool:
+        """
+        Adds queued records to the batch until it is full or the flush interval passes.
+
+        Returns:
+            bool: True if the stop sentinel was received.
+        """
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                return False
+            if item is None:
+                return True
+            batch.append(item)
+        return False
+
+    def _write_batch(self, connection: sqlite3.Connection, batch: list):
+        """
+        Writes the images of a batch and indexes them in one transaction.
+        """
+        rows = []
+        for frame, record in batch:
+            captured = datetime.datetime.fromtimestamp(record["timestamp"])
+            day = captured.strftime("%Y%m%d")
+            prefix = "_".join(filter(None, (record["detection_type"], record["source_id"])))
+            file_path = self.root / day / f"{prefix}_{captured.strftime('%Y%m%d_%H%M%S')}_{record['index']}.jpg"
+            try:
+                data = frame.original_jpeg()
+                with METRICS.timer("disk_write"):
+                    file_path.parent.mkdir(parents=True, exist_ok=True)
+                    file_path.write_bytes(data)
+            except Exception as e:
+                logging.error(f"Failed to write image to file {file_path}: {e}")
+                continue
+            rows.append((record["timestamp"], day, record["detection_type"], record["confidence"],
+                         json.dumps(record["boxes"]), str(file_path), record["cycle_id"], record["source_id"]))
+
+        with connection:
+            connection.executemany(
+                "INSERT INTO detections (timestamp, day, detection_type, confidence, boxes, file_path, cycle_id, "
+                "source_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def clip_path(self, timestamp: float, detection_type: str, source_id: Optional[str] = None) -> Path:
+        """
+        Returns where the clip of an event is written, next to its frames, and creates the folder.
+
+        Args:
+            timestamp (float): Time of the first frame of the clip.
+            detection_type (str): The detected class.
+            source_id (Optional[str]): The camera of the clip.
+
+        Returns:
+            Path: The MP4 file path.
+        """
+        captured = datetime.datetime.fromtimestamp(timestamp)
+        prefix = "_".join(filter(None, (detection_type, source_id)))
+        path = self.root / captured.strftime("%Y%m%d") / f"{prefix}_{captured.strftime('%Y%m%d_%H%M%S')}.mp4"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def add_clip(self, file_path: str, timestamps: List[float], detection_type: str,
+                 cycle_id: Optional[int] = None, source_id: Optional[str] = None):
+        """
+        Indexes an encoded clip. Blocks on SQLite, so call it off the event loop.
+
+        Args:
+            file_path (str): The written clip.
+            timestamps (List[float]): Capture times of its frames, oldest first.
+            detection_type (str): The detected class.
+            cycle_id (Optional[int]): The detection cycle of the event.
+            source_id (Optional[str]): The camera of the clip.
+        """
+        start = float(timestamps[0])
+        day = datetime.datetime.fromtimestamp(start).strftime("%Y%m%d")
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "INSERT INTO clips (timestamp, day, detection_type, file_path, frames, duration, cycle_id, source_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (start, day, detection_type, str(file_path), len(timestamps), float(timestamps[-1]) - start,
+                 cycle_id, source_id))
+
+    def last_clips(self, n: int = 10) -> List[dict]:
+        """
+        Returns the most recent clips, newest first.
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT timestamp, detection_type, file_path, frames, duration, cycle_id, source_id FROM clips "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?", (n,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def visits_per_day(self, detection_type: str = "cat", days: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Counts visits per day. Frames of the same detection cycle count as one visit.
+
+        Args:
+            detection_type (str): The class to count.
+            days (Optional[int]): Only count the last N days, all days if None.
+
+        Returns:
+            List[Tuple[str, int]]: (YYYYMMDD, visits) pairs, oldest first.
+        """
+        since = 0.0
+        if days is not None:
+            start = datetime.datetime.combine(datetime.date.today() - datetime.timedelta(days=days - 1), datetime.time())
+            since = start.timestamp()
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT day, COUNT(DISTINCT COALESCE(cycle_id, -id)) AS visits FROM detections "
+                "WHERE detection_type = ? AND timestamp >= ? GROUP BY day ORDER BY day",
+                (detection_type, since)).fetchall()
+        return [(row["day"], row["visits"]) for row in rows]
+
+    def visit_times(self, detection_type: str = "cat", days: Optional[int] = 28) -> List[float]:
+        """
+        Returns when each visit started, one timestamp per detection cycle.
+
+        Args:
+            detection_type (str): The class of the visits.
+            days (Optional[int]): Only return visits of the last N days, all visits if None.
+
+        Returns:
+            List[float]: UNIX timestamps, oldest first.
+        """
+        since = 0.0 if days is None else datetime.datetime.now().timestamp() - days * 86400
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT MIN(timestamp) AS start FROM detections WHERE detection_type = ? AND timestamp >= ? "
+                "GROUP BY COALESCE(cycle_id, -id) ORDER BY start", (detection_type, since)).fetchall()
+        return [row["start"] for row in rows]
+
+    def last_detections(self, n: int = 10, detection_type: Optional[str] = None) -> List[dict]:
+        """
+        Returns the most recent detections.
+
+        Args:
+            n (int): Maximum number of detections.
+            detection_type (Optional[str]): Only return this class, every class if None.
+
+        Returns:
+            List[dict]: Detections with timestamp, detection_type, confidence, boxes, file_path, cycle_id
+                        and source_id, newest first.
+        """
+        query = "SELECT timestamp, detection_type, confidence, boxes, file_path, cycle_id, source_id FROM detections"
+        params = ()
+        if detection_type is not None:
+            query += " WHERE detection_type = ?"
+            params = (detection_type,)
+        query += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+        with closing(self._connect()) as connection:
+            rows = connection.execute(query, params + (n,)).fetchall()
+        return [dict(row, boxes=json.loads(row["boxes"])) for row in rows]
@@ -1,10 +1,19 @@
-import cv2
+import time
 import logging
+import threading
 import numpy as np
-from picamera2 import Picamera2
-from typing import Tuple
+from typing import Callable, Dict, List, Optional, Tuple
+from src.clip_recorder import PreRollBuffer
 from src.detection import CatDetector
-#from utils.motion_detection import MotionDetector
+from src.frame_artifact import FrameArtifact
+from src.frame_broker import BrokerFrame, BrokerSource
+from src.frame_source import CapturedFrame, FrameSource, Picamera2Source, release_all
+from src.metrics import METRICS
+from src.tiling import TiledDetector
+from utils.motion_detection import MotionDetector
+
+
+NO_SCORES = {"cat": 0.0, "person": 0.0}
 
 
 class Camera:
@@ -13,65 +22,378 @@ class Camera:
 
     Attributes:
         detector (CatDetector): The object detection pipeline.
-        picam2 (Picamera2): PiCamera instance for capturing images.
-        frame_size (Tuple[int, int]): The resolution of the camera capture.
+        source (FrameSource): Where frames come from, the Pi camera unless another source is given.
+        motion_detector (MotionDetector): Gates inference on frames without motion, created by
+                                          `motion_engine` so that every camera has its own.
+        motion_gating (bool): Whether frames without motion skip inference.
+        motion_hold_time (float): Seconds after the last motion during which frames are still inferred.
+        frames_gated (int): Number of frames skipped because nothing moved.
+        frames_inferred (int): Number of frames passed to the detector.
+        jpeg_quality (int): JPEG quality of the frame artifacts.
+        source_id (Optional[str]): Name of the camera, stored with its frames when several cameras are used.
+        preroll (Optional[PreRollBuffer]): Copies of the latest `preroll_frames` lores frames for event clips,
+                                           None if clips are disabled.
+        continuous_preroll (bool): Whether the pre-roll and clips are fed with every frame of the source's
+                                   FrameBroker, rather than with the frames the detection cycles capture.
+        tiler (Optional[TiledDetector]): Runs detection on tiles of the main frame instead of the lores
+                                         frame, None to detect on the lores frame.
+        motion_mask (Optional[np.ndarray]): Threshold mask of the last frame with motion, which selects the
+                                            tiles to infer.
     """
-    def __init__(self, detector: CatDetector, frame_size: Tuple[int, int] = (640, 640)):
+    def __init__(self, detector: CatDetector, frame_size: Tuple[int, int] = (640, 360),
+                 main_size: Tuple[int, int] = (1920, 1080), motion_gating: bool = True,
+                 motion_hold_time: float = 60.0, source: Optional[FrameSource] = None, jpeg_quality: int = 90,
+                 source_id: Optional[str] = None, preroll_frames: int = 0, tiler: Optional[TiledDetector] = None,
+                 motion_engine: Optional[Callable[[], MotionDetector]] = None):
         self.detector = detector
-        self.picam2 = Picamera2()
-        self.frame_size = frame_size
-        #self.motion_detector = MotionDetector()
-
-        try:
-            camera_config = self.picam2.create_still_configuration(main={"size": self.frame_size})
-            self.picam2.configure(camera_config)
-            self.picam2.start()
-        except Exception as e:
-            logging.error(f"Camera initialization failed: {e}")
-            raise
+        self.source = source or Picamera2Source(frame_size, main_size)
+        self.motion_detector = (motion_engine or MotionDetector)()
+        self.motion_gating = motion_gating
+        self.motion_hold_time = motion_hold_time
+        self.last_motion_time = float("-inf")
+        self.frames_gated = 0
+        self.frames_inferred = 0
+        self.jpeg_quality = jpeg_quality
+        self.source_id = source_id
+        self.preroll = PreRollBuffer(preroll_frames) if preroll_frames > 0 else None
+        self.tiler = tiler
+        self.motion_mask: Optional[np.ndarray] = None
+        self._clip_lock = threading.Lock()
+        self._clip_listeners: List[Callable[[np.ndarray, float], None]] = []
+        self.continuous_preroll = self.preroll is not None and isinstance(self.source, BrokerSource)
+        if self.continuous_preroll:
+            self.source.broker.add_listener(self._on_broker_frame)
 
 
     def capture_frame(self) -> np.ndarray:
         """
-        Captures a single frame from the camera.
+        Captures a single full-resolution frame from the main stream.
 
         Returns:
             np.ndarray: The captured frame
         """
         try:
-            frame = self.picam2.capture_array()
-            if frame.dtype != np.uint8:
-                frame = np.clip(frame, 0, 255).astype(np.uint8)
-            return frame
+            return self.source.capture_main()
         
         except Exception as e:
             logging.error(f"Error capturing frame: {e}")
             raise RuntimeError("CameraError")
 
 
+    @staticmethod
+    def scale_box_to_main(box, lores_shape: Tuple[int, int], main_shape: Tuple[int, int]) -> Tuple[float, float, float, float]:
+        """
+        Maps a box from lores coordinates to main stream coordinates.
+
+        Args:
+            box: Bounding box as x1, y1, x2, y2 in lores coordinates.
+            lores_shape (Tuple[int, int]): The lores (height, width).
+            main_shape (Tuple[int, int]): The main (height, width).
+
+        Returns:
+            Tuple[float, float, float, float]: The box in main stream coordinates.
+        """
+        sx = main_shape[1] / lores_shape[1]
+        sy = main_shape[0] / lores_shape[0]
+        x1, y1, x2, y2 = box
+        return x1 * sx, y1 * sy, x2 * sx, y2 * sy
+
+
+    def should_infer(self, frame: np.ndarray) -> bool:
+        """
+        Runs the motion gate on a frame.
+
+        A frame is inferred when it shows motion, or when motion was seen within
+        the hold time so that a cat sitting still at the door is not gated out.
+        The threshold mask of the last frame with motion is kept for tile selection.
+
+        Args:
+            frame (np.ndarray): The captured frame.
+
+        Returns:
+            bool: True if the frame should go through object detection.
+        """
+        if not self.motion_gating:
+            return True
+
+        with METRICS.timer("motion"):
+            motion_detected, thresh = self.motion_detector.detect_motion(frame)
+        now = time.monotonic()
+        if motion_detected:
+            self.last_motion_time = now
+            self.motion_mask = thresh
+        return now - self.last_motion_time <= self.motion_hold_time
+
+
+    def gating_stats(self) -> Dict[str, int]:
+        """
+        Returns the motion gating counters.
+
+        Returns:
+            Dict[str, int]: Number of gated and inferred frames.
+        """
+        return {"gated": self.frames_gated, "inferred": self.frames_inferred}
+
+
     def capture_and_detect(self):
         """
-        Captures an image from the camera and processes it for object detection.
+        Captures a frame and processes it for object detection.
+
+        Motion gating and detection run on the lores stream. The main stream is only
+        copied out of the capture request when a cat or person was detected, so the
+        returned images are full resolution for detections and lores otherwise.
+        In tiled mode the main frame is copied for every inferred frame and
+        detection runs on its tiles with motion.
 
         Returns:
-            tuple: The type of detection, processed image with bounding box, and original image.
+            tuple: The type of detection, the FrameArtifact holding the frame and its
+                   detections, and the highest confidence per detection type. The type
+                   is 'no motion' when the frame was gated.
         """
         logging.info("Capturing frame for motion detection...")
         try:
-            frame = self.picam2.capture_array()
-
-            if frame.dtype != np.uint8:
-                frame = np.clip(frame, 0, 255).astype(np.uint8)
-
-            frame_copy = np.copy(frame)
-            
-            #motion_detected, _ = self.motion_detector.detect_motion(frame)
-            #if motion_detected:
-            logging.info("Motion detected. Processing frame for object detection...")
-            detection_type, detected_image, _ = self.detector.detection(frame_copy)
-            return detection_type, detected_image, frame
-            #else:
-            #    return "no motion", None, None
+            start = time.perf_counter()
+            captured = self.source.capture()
+            try:
+                frame = captured.lores()
+                METRICS.observe("capture", time.perf_counter() - start)
+                if not self.continuous_preroll:
+                    self._publish(frame)
+
+                if not self.should_infer(frame):
+                    self.frames_gated += 1
+                    METRICS.inc("frames_gated")
+                    return "no motion", self._captured_artifact(captured, "lores", "no motion"), dict(NO_SCORES)
+
+                self.frames_inferred += 1
+                METRICS.inc("frames_inferred")
+
+                logging.info("Motion detected. Processing frame for object detection...")
+                if self.tiler is not None:
+                    main_frame = captured.main()
+                    detections = self.tiler.detect(main_frame, self.motion_mask if self.motion_gating else None,
+                                                   frame.shape[:2])
+                    detections_shape = main_frame.shape[:2]
+                else:
+                    detections = self.detector.detect(frame)
+                    detections_shape = frame.shape[:2]
+                detection_type = self.detector.classify(detections)
+                if detection_type == "none":
+                    return "none", self._captured_artifact(captured, "lores", "none"), dict(NO_SCORES)
+
+                main_frame, release = captured.take("main")
+                return self._detection_result(main_frame, detections_shape, detections, detection_type, release)
+            finally:
+                captured.release()
+        except Exception as e:
+            logging.error(f"Camera or Motion Detection Error: {e}")
+            raise RuntimeError("CameraError")
+
+
+    def _artifact(self, frame: np.ndarray, detection_type: str, detections: Optional[np.ndarray] = None,
+                  release: Optional[Callable[[], None]] = None) -> FrameArtifact:
+        """
+        Wraps a frame into a FrameArtifact with the camera's JPEG settings.
+        """
+        return FrameArtifact(frame, detection_type, detections, jpeg_quality=self.jpeg_quality,
+                             source_id=self.source_id, release=release)
+
+
+    def _captured_artifact(self, captured: CapturedFrame, name: str, detection_type: str) -> FrameArtifact:
+        """
+        Wraps the 'lores' or 'main' image of a capture into a FrameArtifact that holds its ring slot.
+        """
+        image, release = captured.take(name)
+        return self._artifact(image, detection_type, release=release)
+
+
+    def _detection_result(self, main_frame: np.ndarray, lores_shape: Tuple[int, int], detections: np.ndarray,
+                          detection_type: str, release: Optional[Callable[[], None]] = None) -> tuple:
+        """
+        Maps lores detections onto the main frame. Boxes are only drawn when an
+        annotated JPEG is requested from the artifact.
+
+        Args:
+            main_frame (np.ndarray): The full-resolution frame.
+            lores_shape (Tuple[int, int]): The (height, width) the detections refer to.
+            detections (np.ndarray): The lores detections, sorted by score.
+            detection_type (str): The detection type of the top detection.
+            release (Optional[Callable[[], None]]): Gives the main frame's ring slot back, see CapturedFrame.take.
+
+        Returns:
+            tuple: Result in the capture_and_detect format.
+        """
+        scaled = detections.copy()
+        scaled[:, :4] = [self.scale_box_to_main(box, lores_shape, main_frame.shape[:2]) for box in detections[:, :4]]
+        return (detection_type, self._artifact(main_frame, detection_type, scaled, release),
+                self.detector.scores(detections))
+
+
+    def capture_burst(self, count: int) -> Tuple[List[CapturedFrame], List[int]]:
+        """
+        Captures a burst of frames and runs the motion gate on each of them.
+
+        The captures are returned unreleased, so that burst_results can copy the main
+        image of a frame with a detection out of the same capture request as its lores
+        frame once the detections are known. Frames without a detection only ever
+        cost the lores copy. The caller must release the captures after burst_results,
+        and must not ask for more than `source.max_held` frames at once.
+
+        Args:
+            count (int): Number of frames to capture.
+
+        Returns:
+            Tuple[List[CapturedFrame], List[int]]: The held captures and the indices of
+                the frames that go through object detection.
+        """
+        captures, inferred = [], []
+        try:
+            for i in range(count):
+                start = time.perf_counter()
+                captures.append(self.source.capture())
+                frame = captures[-1].lores()
+                METRICS.observe("capture", time.perf_counter() - start)
+                if not self.continuous_preroll:
+                    self._publish(frame)
+                if self.should_infer(frame):
+                    inferred.append(i)
+        except Exception:
+            release_all(captures)
+            raise
+
+        self.frames_gated += count - len(inferred)
+        self.frames_inferred += len(inferred)
+        METRICS.inc("frames_gated", count - len(inferred))
+        METRICS.inc("frames_inferred", len(inferred))
+        return captures, inferred
+
+
+    def _publish(self, frame: np.ndarray, timestamp: Optional[float] = None):
+        """
+        Pushes a lores frame into the pre-roll and hands it to the clips being recorded.
+        """
+        if self.preroll is None:
+            return
+        timestamp = timestamp if timestamp is not None else time.time()
+        with self._clip_lock:
+            self.preroll.push(frame, timestamp)
+            for listener in self._clip_listeners:
+                listener(frame, timestamp)
+
+
+    def _on_broker_frame(self, frame: BrokerFrame):
+        """
+        Feeds every frame of the broker's capture thread into the pre-roll.
+        """
+        self._publish(frame.lores, frame.timestamp)
+
+
+    def record_clip_frames(self, post_roll: float = 3.0, fps: float = 5.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Collects the post-roll of an event and returns it together with the pre-roll.
+
+        The camera is never read here: the post-roll is made of the frames that reach
+        the pre-roll during the next `post_roll` seconds, from the broker's capture
+        thread or from the detection cycles. This blocks for the post-roll, so it is
+        meant to run on its own thread rather than on the detection worker.
+
+        Args:
+            post_roll (float): Seconds to record after the detection.
+            fps (float): Maximum frame rate of the post-roll.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: RGB frames of shape (N, H, W, 3) and their
+                                           capture times, oldest first.
+        """
+        if self.preroll is None:
+            raise RuntimeError("Clip recording needs a pre-roll buffer")
+        post_frames, post_timestamps = [], []
+        shape_changed = threading.Event()
+
+        def collect(frame: np.ndarray, timestamp: float):
+            if shape_changed.is_set() or (post_timestamps and timestamp - post_timestamps[-1] < 0.9 / fps):
+                return
+            expected = frames.shape[1:] if len(frames) else post_frames[0].shape if post_frames else frame.shape
+            if frame.shape != expected:
+                shape_changed.set()
+                return
+            post_frames.append(frame.copy())
+            post_timestamps.append(timestamp)
+
+        with self._clip_lock:
+            frames, timestamps = self.preroll.snapshot()
+            self._clip_listeners.append(collect)
+        try:
+            shape_changed.wait(post_roll)
+        finally:
+            with self._clip_lock:
+                self._clip_listeners.remove(collect)
+
+        if post_frames:
+            frames = np.concatenate([frames, np.stack(post_frames)]) if len(frames) else np.stack(post_frames)
+            timestamps = np.concatenate([timestamps, post_timestamps])
+        return frames, timestamps
+
+
+    def burst_results(self, captures: List[CapturedFrame], inferred: List[int],
+                      batch_detections: List[np.ndarray]) -> List[tuple]:
+        """
+        Turns the detections of a gated burst into per-frame results.
+
+        Args:
+            captures (List[CapturedFrame]): The held captures of capture_burst.
+            inferred (List[int]): Indices of the frames that were inferred.
+            batch_detections (List[np.ndarray]): Detections of the inferred frames, in the same order.
+
+        Returns:
+            List[tuple]: Per-frame results with the same contract as capture_and_detect.
+        """
+        batch = dict(zip(inferred, batch_detections))
+        results = []
+        for i, captured in enumerate(captures):
+            if i not in batch:
+                results.append(("no motion", self._captured_artifact(captured, "lores", "no motion"),
+                                dict(NO_SCORES)))
+                continue
+            detection_type = self.detector.classify(batch[i])
+            if detection_type == "none":
+                results.append(("none", self._captured_artifact(captured, "lores", "none"), dict(NO_SCORES)))
+                continue
+            main_frame, release = captured.take("main")
+            results.append(self._detection_result(main_frame, captured.lores().shape[:2], batch[i],
+                                                  detection_type, release))
+        return results
+
+
+    def burst_detect(self, count: int) -> List[tuple]:
+        """
+        Captures a burst of frames and runs all frames with motion as one batched inference.
+
+        A burst longer than the source can hold is captured and inferred in chunks.
+        In tiled mode every frame needs its own main frame, so the burst is captured
+        frame by frame and each frame's tiles form one batch.
+
+        Args:
+            count (int): Number of frames in the burst.
+
+        Returns:
+            List[tuple]: Per-frame results with the same contract as capture_and_detect.
+        """
+        logging.info(f"Capturing burst of {count} frames for detection...")
+        if self.tiler is not None:
+            return [self.capture_and_detect() for _ in range(count)]
+        try:
+            results = []
+            step = self.source.max_held or count
+            for start in range(0, count, step):
+                captures, inferred = self.capture_burst(min(step, count - start))
+                try:
+                    batch_detections = self.detector.detect_batch([captures[i].lores() for i in inferred]) \
+                        if inferred else []
+                    results.extend(self.burst_results(captures, inferred, batch_detections))
+                finally:
+                    release_all(captures)
+            return results
         except Exception as e:
             logging.error(f"Camera or Motion Detection Error: {e}")
             raise RuntimeError("CameraError")
@@ -0,0 +1,183 @@
+import logging
+from typing import Dict, List, Optional, Tuple
+from src.camera import Camera
+from src.detection import CatDetector
+from src.frame_broker import brokered
+from src.frame_source import FrameSource, open_source, release_all
+
+
+class CameraManager:
+    """
+    Runs several cameras into one shared detector, so adding a camera does not load a second model.
+
+    The manager has the same capture_and_detect/burst_detect contract as a single
+    Camera, so the detection worker drives it unchanged. Frames are assigned to the
+    cameras round-robin: a burst captures from every camera in turn, gates each
+    frame with the motion detector of its own camera, and runs the frames of all
+    cameras through a single batched inference. Every result carries the source id
+    of its camera on the frame artifact.
+
+    Attributes:
+        cameras (Dict[str, Camera]): The cameras by source id, in capture order.
+        detector (CatDetector): The detector shared by all cameras.
+    """
+    def __init__(self, cameras: List[Camera]):
+        if not cameras:
+            raise ValueError("CameraManager needs at least one camera")
+        source_ids = [camera.source_id for camera in cameras]
+        if len(set(source_ids)) != len(source_ids):
+            raise ValueError(f"Duplicate camera source ids: {source_ids}")
+        self.detector = cameras[0].detector
+        if any(camera.detector is not self.detector for camera in cameras):
+            raise ValueError("All cameras must share one detector")
+        self.cameras: Dict[Optional[str], Camera] = {camera.source_id: camera for camera in cameras}
+        self._order = list(self.cameras.values())
+        self._next = 0
+
+    @classmethod
+    def from_spec(cls, detector: CatDetector, spec: str, broker_options: Optional[dict] = None,
+                  **camera_options) -> "CameraManager":
+        """
+        Opens the cameras of a specification such as 'front=picamera2:0;garden=picamera2:1'.
+
+        Args:
+            detector (CatDetector): The detector shared by all cameras.
+            spec (str): The camera specification, see open_sources.
+            broker_options (Optional[dict]): If given, every source is read by its own FrameBroker
+                                             created with these options.
+            **camera_options: Keyword arguments passed to every Camera.
+
+        Returns:
+            CameraManager: The manager of the opened cameras.
+        """
+        return cls([Camera(detector, source=source, source_id=source_id, **camera_options)
+                    for source_id, source in open_sources(spec, broker_options)])
+
+    @property
+    def source_ids(self) -> List[Optional[str]]:
+        """
+        The source ids of the cameras, in capture order.
+        """
+        return list(self.cameras)
+
+    def camera(self, source_id: Optional[str] = None) -> Camera:
+        """
+        Returns the camera with a source id, the first camera if None.
+
+        Raises:
+            KeyError: If no camera has the source id.
+        """
+        if source_id is None:
+            return self._order[0]
+        return self.cameras[source_id]
+
+    def capture_frame(self):
+        """
+        Captures a full-resolution frame from the first camera.
+        """
+        return self.camera().capture_frame()
+
+    def gating_stats(self) -> Dict[str, int]:
+        """
+        Returns the motion gating counters summed over all cameras.
+        """
+        stats = [camera.gating_stats() for camera in self._order]
+        return {key: sum(stat[key] for stat in stats) for key in ("gated", "inferred")}
+
+    def _take(self, count: int) -> List[Camera]:
+        """
+        Returns the cameras of the next `count` frames in round-robin order.
+        """
+        order = [self._order[(self._next + i) % len(self._order)] for i in range(count)]
+        self._next = (self._next + count) % len(self._order)
+        return order
+
+    def capture_and_detect(self):
+        """
+        Captures and detects one frame from the next camera in turn.
+
+        Returns:
+            tuple: The result of Camera.capture_and_detect.
+        """
+        return self._take(1)[0].capture_and_detect()
+
+    def burst_detect(self, count: int) -> List[tuple]:
+        """
+        Captures `count` frames spread over the cameras and infers all frames with motion in one batch.
+
+        A burst longer than a camera can hold is captured and inferred in chunks.
+
+        Args:
+            count (int): Number of frames in the burst, over all cameras.
+
+        Returns:
+            List[tuple]: Per-frame results in round-robin capture order, with the same
+                         contract as Camera.capture_and_detect.
+        """
+        order = self._take(count)
+        if any(camera.tiler is not None for camera in self._order):
+            # Tiled cameras batch the tiles of one frame instead of frames.
+            return [camera.capture_and_detect() for camera in order]
+        logging.info(f"Capturing burst of {count} frames from {len(set(map(id, order)))} cameras for detection...")
+        try:
+            # Round robin gives every camera at most `held` frames of a chunk of held * cameras frames.
+            held = min((camera.source.max_held for camera in self._order if camera.source.max_held), default=None)
+            step = held * len(self._order) if held else count
+            results = []
+            for start in range(0, count, step):
+                results.extend(self._burst_chunk(order[start:start + step]))
+            return results
+        except Exception as e:
+            logging.error(f"Camera or Motion Detection Error: {e}")
+            raise RuntimeError("CameraError")
+
+    def _burst_chunk(self, order: List[Camera]) -> List[tuple]:
+        """
+        Captures one frame per entry of `order` and infers the frames with motion in one batch.
+        """
+        bursts = []
+        try:
+            for camera in self._order:
+                bursts.append((camera, *camera.capture_burst(sum(1 for c in order if c is camera))))
+
+            batch = [captures[i].lores() for _, captures, inferred in bursts for i in inferred]
+            batch_detections = self.detector.detect_batch(batch) if batch else []
+
+            per_camera = {}
+            offset = 0
+            for camera, captures, inferred in bursts:
+                detections = batch_detections[offset:offset + len(inferred)]
+                offset += len(inferred)
+                per_camera[id(camera)] = iter(camera.burst_results(captures, inferred, detections))
+            return [next(per_camera[id(camera)]) for camera in order]
+        finally:
+            for _, captures, _ in bursts:
+                release_all(captures)
+
+
+def open_sources(spec: str, broker_options: Optional[dict] = None) -> List[Tuple[str, FrameSource]]:
+    """
+    Opens the frame sources of a camera specification such as 'front=picamera2:0;garden=picamera2:1'.
+
+    Each entry is a source id and a frame source in the format of open_source,
+    separated by ';'. The sources can be opened before the detector exists, so
+    their frame sizes are known when the model is loaded.
+
+    Args:
+        spec (str): The camera specification.
+        broker_options (Optional[dict]): If given, every source is read by its own FrameBroker
+                                         created with these options.
+
+    Returns:
+        List[Tuple[str, FrameSource]]: The source ids and their opened sources, in specification order.
+    """
+    sources = []
+    for entry in filter(None, (entry.strip() for entry in spec.split(";"))):
+        source_id, _, source_spec = entry.partition("=")
+        if not source_id or not source_spec:
+            raise ValueError(f"Invalid camera entry '{entry}', expected id=source")
+        source = open_source(source_spec.strip())
+        if broker_options is not None:
+            source = brokered(source, **broker_options)
+        sources.append((source_id.strip(), source))
+    return sources
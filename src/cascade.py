@@ -0,0 +1,123 @@
+import logging
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from src.detection import CatDetector
+from src.metrics import METRICS
+from src.roi import RegionOfInterest
+
+
+class CascadeDetector:
+    """
+    Screens frames with a cheap detector and confirms candidates with the full one.
+
+    Stage one runs every frame at a small input size, or through a smaller model,
+    with a low confidence threshold so that it misses as little as possible. Only
+    frames where it finds a candidate cat or person go through stage two, whose
+    detections are the result. Frames without a candidate return no detections,
+    exactly like a frame in which the full detector found nothing.
+
+    The cascade has the detect/detect_batch/classify/scores/derive interface of a
+    CatDetector, so cameras and the tiled detector use it unchanged.
+
+    Attributes:
+        screen (CatDetector): Stage one.
+        confirm (CatDetector): Stage two, whose detections are returned.
+        frames_screened (int): Frames that went through stage one.
+        frames_confirmed (int): Frames that went through stage two.
+    """
+    def __init__(self, screen: CatDetector, confirm: CatDetector):
+        self.screen = screen
+        self.confirm = confirm
+        self.frames_screened = 0
+        self.frames_confirmed = 0
+
+    @property
+    def input_scale(self) -> float:
+        """
+        The input scale of stage two, which the thermal governor lowers. Stage one keeps its own.
+        """
+        return self.confirm.input_scale
+
+    @input_scale.setter
+    def input_scale(self, value: float):
+        self.confirm.input_scale = value
+
+    @property
+    def roi(self) -> Optional[RegionOfInterest]:
+        """
+        The region of interest of stage two. Setting it sets it for both stages.
+        """
+        return self.confirm.roi
+
+    @roi.setter
+    def roi(self, value: Optional[RegionOfInterest]):
+        self.screen.roi = value
+        self.confirm.roi = value
+
+    def derive(self, class_thresholds: Optional[Dict[int, float]] = None,
+               input_scale: Optional[float] = None) -> "CascadeDetector":
+        """
+        Returns a cascade whose stages share this cascade's models, like CatDetector.derive().
+
+        Args:
+            class_thresholds (Optional[Dict[int, float]]): Minimum confidence per class ID of stage two, unchanged if None.
+            input_scale (Optional[float]): Input scale of both stages, unchanged if None. The tiled detector
+                                           sets 1.0, since a stage that shrinks the tiles would undo the tiling.
+
+        Returns:
+            CascadeDetector: The derived cascade, with its own region of interest and counters.
+        """
+        return CascadeDetector(self.screen.derive(input_scale=input_scale),
+                               self.confirm.derive(class_thresholds, input_scale))
+
+    @property
+    def confirm_rate(self) -> float:
+        """
+        Fraction of frames that needed stage two.
+        """
+        return self.frames_confirmed / self.frames_screened if self.frames_screened else 0.0
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """
+        Runs the cascade on a single image, see detect_batch().
+        """
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images) -> List[np.ndarray]:
+        """
+        Screens a batch and confirms the frames with candidates in one stage two batch.
+
+        Args:
+            images: Sequence or (N, H, W, C) array of images of the same size.
+
+        Returns:
+            List[np.ndarray]: Per-image detections of stage two, empty for frames without a candidate.
+        """
+        images = list(images)
+        candidates = [i for i, detections in enumerate(self.screen.detect_batch(images)) if len(detections)]
+        self.frames_screened += len(images)
+        self.frames_confirmed += len(candidates)
+        METRICS.inc("frames_screened", len(images))
+        METRICS.inc("frames_confirmed", len(candidates))
+
+        results = [np.zeros((0, 6), dtype=np.float32) for _ in images]
+        if candidates:
+            logging.info(f"Confirming {len(candidates)} of {len(images)} frames at full size")
+            for i, detections in zip(candidates, self.confirm.detect_batch([images[i] for i in candidates])):
+                results[i] = detections
+        return results
+
+    def classify(self, detections: np.ndarray) -> str:
+        return self.confirm.classify(detections)
+
+    def scores(self, detections: np.ndarray) -> Dict[str, float]:
+        return self.confirm.scores(detections)
+
+    def warmup(self, image_shape: Tuple[int, int] = (360, 640), batch_sizes: Tuple[int, ...] = (1,)) -> float:
+        """
+        Warms up both stages.
+
+        Returns:
+            float: Seconds the warm-up took.
+        """
+        return self.screen.warmup(image_shape, batch_sizes) + self.confirm.warmup(image_shape, batch_sizes)
@@ -0,0 +1,151 @@
+import cv2
+import time
+import logging
+import multiprocessing
+import numpy as np
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+
+class PreRollBuffer:
+    """
+    Keeps copies of the most recent frames so a clip can start before the detection.
+
+    Frames are copied into storage allocated once for `size` frames, so the capture
+    ring slots are released right away and no memory is allocated per frame.
+
+    Attributes:
+        size (int): Maximum number of frames kept.
+    """
+    def __init__(self, size: int = 20):
+        self.size = size
+        self._frames: Optional[np.ndarray] = None
+        self._timestamps = np.zeros(size, dtype=np.float64)
+        self._count = 0
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def push(self, frame: np.ndarray, timestamp: Optional[float] = None):
+        """
+        Copies a frame into the buffer, replacing the oldest one when it is full.
+
+        A frame of another shape clears the buffer, since a clip needs frames of one size.
+
+        Args:
+            frame (np.ndarray): The RGB frame.
+            timestamp (Optional[float]): Capture time as a UNIX timestamp, now if None.
+        """
+        if self._frames is None or self._frames.shape[1:] != frame.shape:
+            self._frames = np.empty((self.size,) + frame.shape, dtype=frame.dtype)
+            self._count = self._next = 0
+        np.copyto(self._frames[self._next], frame)
+        self._timestamps[self._next] = timestamp if timestamp is not None else time.time()
+        self._next = (self._next + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+    def snapshot(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns copies of the buffered frames and their timestamps, oldest first.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Frames of shape (N, H, W, 3) and N timestamps.
+        """
+        if self._frames is None or self._count == 0:
+            return np.empty((0, 0, 0, 3), dtype=np.uint8), np.empty(0)
+        order = (np.arange(self._count) + self._next - self._count) % self.size
+        return self._frames[order], self._timestamps[order]
+
+    def clear(self):
+        """
+        Forgets the buffered frames, keeping the storage.
+        """
+        self._count = self._next = 0
+
+
+def clip_fps(timestamps: np.ndarray, default: float = 5.0, max_fps: float = 30.0) -> float:
+    """
+    Estimates the frame rate of a clip from the capture times of its frames.
+
+    Frames come from detection bursts and post-roll captures at irregular intervals,
+    so the clip plays at the average rate they were captured at.
+
+    Args:
+        timestamps (np.ndarray): Capture times, oldest first.
+        default (float): Frame rate used when it cannot be estimated.
+        max_fps (float): Upper bound of the frame rate.
+
+    Returns:
+        float: The frame rate, at least 1.
+    """
+    if len(timestamps) < 2 or timestamps[-1] <= timestamps[0]:
+        return default
+    return float(np.clip((len(timestamps) - 1) / (timestamps[-1] - timestamps[0]), 1.0, max_fps))
+
+
+def encode_clip(frames: np.ndarray, fps: float, path: str) -> str:
+    """
+    Encodes RGB frames into an MP4 file. Runs in the recorder's worker process.
+
+    Args:
+        frames (np.ndarray): Frames of shape (N, H, W, 3).
+        fps (float): Frame rate of the clip.
+        path (str): The output file.
+
+    Returns:
+        str: The path of the written clip.
+
+    Raises:
+        IOError: If the video writer could not be opened.
+    """
+    height, width = frames.shape[1:3]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise IOError(f"Failed to open video writer for {path}")
+    try:
+        bgr = np.empty_like(frames[0])
+        for frame in frames:
+            cv2.cvtColor(frame, cv2.COLOR_RGB2BGR, dst=bgr)
+            writer.write(bgr)
+    finally:
+        writer.release()
+    return path
+
+
+class ClipRecorder:
+    """
+    Encodes event clips in a background worker process.
+
+    Encoding a clip takes far longer than a detection, and in a thread it would
+    compete with inference for the GIL. The frames are handed to a single spawned
+    worker process instead, so capture and inference keep their full rate.
+
+    Attributes:
+        executor (ProcessPoolExecutor): The worker process.
+    """
+    def __init__(self, executor: Optional[ProcessPoolExecutor] = None):
+        self.executor = executor or ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, frames: np.ndarray, timestamps: np.ndarray, path: str) -> Future:
+        """
+        Queues a clip for encoding.
+
+        Args:
+            frames (np.ndarray): RGB frames of shape (N, H, W, 3), oldest first.
+            timestamps (np.ndarray): Capture times of the frames.
+            path (str): The output file, its folder must exist.
+
+        Returns:
+            Future: Resolves to the path of the clip once it is written.
+        """
+        if len(frames) == 0:
+            raise ValueError("Cannot record a clip without frames")
+        logging.info(f"Encoding {len(frames)} frame clip to {path}")
+        return self.executor.submit(encode_clip, frames, clip_fps(timestamps), path)
+
+    def close(self):
+        """
+        Waits for the queued clips and stops the worker process.
+        """
+        self.executor.shutdown(wait=True)
@@ -1,27 +1,106 @@
 import cv2
+import copy
+import time
 import logging
 import numpy as np
-from typing import Tuple, Optional
-from ultralytics import YOLO
+from typing import Dict, List, Tuple, Optional
+from src.metrics import METRICS
+from src.postprocess import CAT_CLASS_ID, PERSON_CLASS_ID, DEFAULT_CLASS_THRESHOLDS, filter_detections
+from src.roi import RegionOfInterest
 
 class CatDetector:
     """
     Class for detecting cats and persons in images using YOLO model.
 
+    The model runs either through ultralytics or, for exported ``.onnx`` files,
+    directly through an onnxruntime session (see ``src/onnx_backend.py``).
+
     Attributes:
         model_path (str): Path to the YOLO model file.
+        backend (str): The inference backend, 'ultralytics' or 'onnxruntime'.
         cat_class_id (int): Class ID for cats in the model.
         person_class_id (int): Class ID for persons in the model.
+        class_thresholds (Dict[int, float]): Minimum confidence per class ID.
+        roi (Optional[RegionOfInterest]): Regions that images are cropped to before inference.
+        input_scale (float): Factor images are shrunk by before inference, lowered by the thermal governor.
     """
-    def __init__(self, model_path: str):
+    def __init__(self, model_path: str, backend: str = "auto", intra_op_threads: int = 0,
+                 inter_op_threads: int = 0, graph_optimization_level: str = "all",
+                 class_thresholds: Optional[Dict[int, float]] = None,
+                 roi: Optional[RegionOfInterest] = None, cache_dir: Optional[str] = None):
         try:
-            self.model = YOLO(model_path)
-            self.cat_class_id = 15
-            self.person_class_id = 0
+            self.class_thresholds = dict(class_thresholds or DEFAULT_CLASS_THRESHOLDS)
+            self.roi = roi
+            self.input_scale = 1.0
+
+            if backend == "auto":
+                backend = "onnxruntime" if str(model_path).endswith(".onnx") else "ultralytics"
+
+            if backend == "onnxruntime":
+                from src.onnx_backend import OnnxBackend
+                self.model = OnnxBackend(model_path, intra_op_threads=intra_op_threads,
+                                         inter_op_threads=inter_op_threads,
+                                         graph_optimization_level=graph_optimization_level,
+                                         class_thresholds=self.class_thresholds,
+                                         cache_dir=cache_dir)
+            elif backend == "ultralytics":
+                from ultralytics import YOLO
+                self.model = YOLO(model_path)
+            else:
+                raise ValueError(f"Unknown detection backend: {backend}")
+
+            self.model_path = model_path
+            self.backend = backend
+            self.cat_class_id = CAT_CLASS_ID
+            self.person_class_id = PERSON_CLASS_ID
         except Exception as e:
             logging.error(f"CatDetector initialization failed: {e}")
             raise
 
+    def derive(self, class_thresholds: Optional[Dict[int, float]] = None,
+               input_scale: Optional[float] = None) -> "CatDetector":
+        """
+        Returns a detector that shares this detector's model but has its own
+        thresholds and input scale, so a second stage needs no second session.
+
+        Args:
+            class_thresholds (Optional[Dict[int, float]]): Minimum confidence per class ID, unchanged if None.
+            input_scale (Optional[float]): Factor images are shrunk by before inference, unchanged if None.
+
+        Returns:
+            CatDetector: The derived detector.
+        """
+        derived = copy.copy(self)
+        if class_thresholds is not None:
+            derived.class_thresholds = dict(class_thresholds)
+            if self.backend == "onnxruntime":
+                # The onnxruntime session is shared, only the decoding thresholds differ.
+                derived.model = copy.copy(self.model)
+                derived.model.class_thresholds = derived.class_thresholds
+        if input_scale is not None:
+            derived.input_scale = input_scale
+        return derived
+
+    def warmup(self, image_shape: Tuple[int, int] = (360, 640), batch_sizes: Tuple[int, ...] = (1,)) -> float:
+        """
+        Runs blank frames through the model so the first real frame does not pay
+        for memory allocation and kernel initialization.
+
+        Args:
+            image_shape (Tuple[int, int]): The (height, width) of the frames that will be detected.
+            batch_sizes (Tuple[int, ...]): Batch sizes to warm up, each allocates its own buffers.
+
+        Returns:
+            float: Seconds the warm-up took.
+        """
+        start = time.perf_counter()
+        frame = np.zeros(image_shape + (3,), dtype=np.uint8)
+        for batch_size in dict.fromkeys(batch_sizes):
+            self.detect_batch([frame] * batch_size)
+        elapsed = time.perf_counter() - start
+        logging.info(f"Detector warm-up took {elapsed:.2f} s")
+        return elapsed
+
     def detection(self, image: np.ndarray, resize_to: Optional[Tuple[int, int]] = None):
         """
         Detects a cat or person in the given image.
@@ -37,19 +116,138 @@ class CatDetector:
             if resize_to:
                 image = self.resize_image(image, resize_to)
 
-            results = self.model.predict(source=image, save=False)
-            for r in results:
-                for box in r.boxes:
-                    detected_class = int(box.cls[0])
-                    if detected_class == self.cat_class_id:
-                        return self._process_detection(box, "cat", image)
-                    elif detected_class == self.person_class_id:
-                        return self._process_detection(box, "person", image)
-            return "none", image, None
+            detections = self.detect(image)
+            if len(detections) == 0:
+                return "none", image, None
+
+            return self._process_detection(detections[0, :4], self.classify(detections), image)
+        except Exception as e:
+            logging.error(f"Object Detection Error: {e}")
+            raise RuntimeError("ObjectDetectionError")
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """
+        Runs the model and returns every cat and person box above its class threshold.
+
+        Args:
+            image (np.ndarray): The image to process.
+
+        Returns:
+            np.ndarray: Array of shape (N, 6) holding x1, y1, x2, y2, score, class_id,
+                        sorted by descending score.
+        """
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images) -> List[np.ndarray]:
+        """
+        Runs a batch of images through the model in one inference call per image size.
+
+        With a region of interest the images are cropped to it first, and the boxes
+        are returned in full-image coordinates with boxes outside the regions dropped.
+
+        Args:
+            images: Sequence or (N, H, W, C) array of images, such as the frames of several cameras.
+
+        Returns:
+            List[np.ndarray]: Per-image detections as returned by detect().
+        """
+        try:
+            images = list(images)
+            if self.roi is None:
+                return self._run_model(images)
+
+            crops = [self.roi.crop(image) for image in images]
+            detections = self._run_model([crop for crop, _ in crops])
+            return [self.roi.to_frame(d, offset, image.shape[:2])
+                    for d, (_, offset), image in zip(detections, crops, images)]
         except Exception as e:
             logging.error(f"Object Detection Error: {e}")
             raise RuntimeError("ObjectDetectionError")
 
+    def _run_model(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Runs the backend on a list of images, grouped into one call per image shape.
+
+        With an input scale below 1 the images are shrunk first and the boxes are
+        scaled back, which only saves time with backends that infer at the image
+        size: ultralytics and ONNX models exported with dynamic axes. A static ONNX
+        model letterboxes the shrunk image back up to its input size, losing detail
+        at the same cost, so the scale is ignored for it.
+
+        Args:
+            images (List[np.ndarray]): The images to process.
+
+        Returns:
+            List[np.ndarray]: Per-image detections as returned by detect().
+        """
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for index, image in enumerate(images):
+            groups.setdefault(image.shape, []).append(index)
+        if len(groups) > 1:
+            detections: List[Optional[np.ndarray]] = [None] * len(images)
+            for members in groups.values():
+                for index, d in zip(members, self._run_model([images[i] for i in members])):
+                    detections[index] = d
+            return detections
+
+        if self.input_scale >= 1.0 or (self.backend == "onnxruntime" and not self.model.dynamic_input):
+            return self._run_backend(images)
+
+        h, w = images[0].shape[:2]
+        size = (max(32, round(w * self.input_scale)), max(32, round(h * self.input_scale)))
+        detections = self._run_backend([self.resize_image(image, size) for image in images])
+        for d in detections:
+            d[:, [0, 2]] *= w / size[0]
+            d[:, [1, 3]] *= h / size[1]
+        return detections
+
+    def _run_backend(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Runs the backend on a list of images of the same size.
+        """
+        if self.backend == "onnxruntime":
+            return self.model.predict_batch(images)
+
+        # Small crops run at a correspondingly small input size instead of 640.
+        imgsz = int(min(640, np.ceil(max(images[0].shape[:2]) / 32) * 32))
+        with METRICS.timer("inference"):
+            # Ultralytics takes arrays as BGR, the frames are RGB.
+            results = self.model.predict(source=[image[..., ::-1] for image in images], save=False, classes=list(self.class_thresholds),
+                                         conf=min(self.class_thresholds.values()), imgsz=imgsz, verbose=False)
+        return [filter_detections(r.boxes.data.cpu().numpy().astype(np.float32), self.class_thresholds)
+                for r in results]
+
+    def classify(self, detections: np.ndarray) -> str:
+        """
+        Maps the highest scoring detection to a detection type.
+
+        Args:
+            detections (np.ndarray): Detections as returned by detect().
+
+        Returns:
+            str: 'cat', 'person' or 'none'.
+        """
+        if len(detections) == 0:
+            return "none"
+        return "cat" if int(detections[0, 5]) == self.cat_class_id else "person"
+
+    def scores(self, detections: np.ndarray) -> Dict[str, float]:
+        """
+        Returns the highest confidence per detection type.
+
+        Args:
+            detections (np.ndarray): Detections as returned by detect().
+
+        Returns:
+            Dict[str, float]: Highest confidence for 'cat' and 'person', 0.0 if absent.
+        """
+        scores = {"cat": 0.0, "person": 0.0}
+        for label, class_id in (("cat", self.cat_class_id), ("person", self.person_class_id)):
+            confidences = detections[detections[:, 5] == class_id, 4]
+            if len(confidences):
+                scores[label] = float(confidences.max())
+        return scores
+
     @staticmethod
     def resize_image(image: np.ndarray, target_size: Tuple[int, int]) -> np.ndarray:
         """
@@ -64,20 +262,40 @@ class CatDetector:
         """
         return cv2.resize(image, target_size, interpolation=cv2.INTER_AREA)
 
+    @staticmethod
+    def draw_box(image: np.ndarray, box, detection_type: str, bgr: bool = False,
+                 thickness: int = 3) -> Tuple[int, int, int, int]:
+        """
+        Draws a bounding box for the given detection type on the image in place.
+
+        Args:
+            image (np.ndarray): Image on which to draw the bounding box.
+            box: Bounding box as x1, y1, x2, y2.
+            detection_type (str): Type of detection ('cat' or 'person').
+            bgr (bool): Whether the image is BGR ordered rather than RGB.
+            thickness (int): Line thickness in pixels.
+
+        Returns:
+            Tuple[int, int, int, int]: The integer box coordinates that were drawn.
+        """
+        x1, y1, x2, y2 = map(int, box)
+        color = (255, 0, 255) if detection_type == "cat" else (255, 255, 0)
+        if bgr:
+            color = color[::-1]
+        cv2.rectangle(image, (x1, y1), (x2, y2), color, thickness)
+        return x1, y1, x2, y2
+
     @staticmethod
     def _process_detection(box, detection_type, image):
         """
         Process the detection and draw bounding box on the image.
 
         Args:
-            box: Detected bounding box.
+            box: Detected bounding box as x1, y1, x2, y2.
             detection_type (str): Type of detection ('cat' or 'person').
             image (np.ndarray): Image on which to draw the bounding box.
 
         Returns:
             tuple: Detection type, image with bounding box, and bounding box coordinates.
         """
-        x1, y1, x2, y2 = map(int, box.xyxy[0])
-        color = (255, 0, 255) if detection_type == "cat" else (255, 255, 0)
-        cv2.rectangle(image, (x1, y1), (x2, y2), color, 3)
-        return detection_type, image, (x1, y1, x2, y2)
+        return detection_type, image, CatDetector.draw_box(image, box, detection_type)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Optional, Tuple, Union
+from src.camera import Camera
+from src.camera_manager import CameraManager
+
+
+class DetectionWorker:
+    """
+    Runs camera capture and inference in a worker thread and feeds the results
+    to the event loop through a bounded asyncio queue.
+
+    Frames are only captured on demand: the consumer iterates over a burst and the
+    next chunk is requested only once the previous one has been consumed, so an
+    abandoned burst costs no further inference. The first frame of a burst is
+    inferred on its own so that a consumer can stop after one frame; the rest are
+    inferred in batches of `batch_size`. The queue is bounded, so the worker
+    blocks instead of running ahead of a slow consumer. Requests are spaced so
+    that on average no more than one frame is captured per `frame_interval`.
+
+    Attributes:
+        camera (Union[Camera, CameraManager]): The camera, or the cameras sharing one detector.
+        results (asyncio.Queue): Bounded queue of (burst_id, result) pairs.
+        executor (ThreadPoolExecutor): Single thread that owns capture and inference.
+        batch_size (int): Frames captured and inferred together through Camera.burst_detect.
+        frame_interval (float): Minimum seconds between two captured frames, 0 captures as fast as possible.
+    """
+    def __init__(self, camera: Union[Camera, CameraManager], maxsize: int = 2,
+                 executor: Optional[ThreadPoolExecutor] = None, batch_size: int = 1):
+        self.camera = camera
+        self.batch_size = batch_size
+        self.frame_interval = 0.0
+        self.results = asyncio.Queue(maxsize=maxsize)
+        self.executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="detection")
+        self._requests = asyncio.Queue()
+        self._burst_id = 0
+        self._next_capture = 0.0
+
+    async def run(self):
+        """
+        Serves frame requests until cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            burst_id, size = await self._requests.get()
+            if burst_id != self._burst_id:
+                continue
+            delay = self._next_capture - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                if burst_id != self._burst_id:
+                    continue
+            self._next_capture = loop.time() + self.frame_interval * size
+            try:
+                if size == 1:
+                    batch = [await loop.run_in_executor(self.executor, self.camera.capture_and_detect)]
+                else:
+                    batch = await loop.run_in_executor(self.executor, self.camera.burst_detect, size)
+            except Exception as e:
+                batch = [e] * size
+            for result in batch:
+                if burst_id != self._burst_id:
+                    break
+                await self.results.put((burst_id, result))
+
+    async def run_in_executor(self, func, *args):
+        """
+        Runs a blocking call on the capture thread, serialized with capture and inference.
+
+        Args:
+            func: The callable to run.
+            *args: Arguments passed to the callable.
+
+        Returns:
+            The return value of the callable.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def frames(self, count: int) -> AsyncIterator[Tuple]:
+        """
+        Requests a burst of detections and yields them as they complete.
+
+        Breaking out of the loop early abandons the rest of the burst.
+
+        Args:
+            count (int): Number of frames to capture and detect.
+
+        Yields:
+            tuple: The result of Camera.capture_and_detect for each frame.
+
+        Raises:
+            RuntimeError: Re-raised from the worker if capture or detection failed.
+        """
+        self._burst_id += 1
+        burst_id = self._burst_id
+
+        try:
+            received = 0
+            requested = 0
+            while received < count:
+                if received == requested:
+                    size = 1 if requested == 0 else min(self.batch_size, count - requested)
+                    await self._requests.put((burst_id, size))
+                    requested += size
+
+                result_burst_id, result = await self.results.get()
+                if result_burst_id != burst_id:
+                    continue
+                received += 1
+                if isinstance(result, Exception):
+                    raise result
+                yield result
+        finally:
+            # Invalidate the burst so the worker stops and stale results get dropped.
+            self._burst_id += 1
+            while not self.results.empty():
+                self.results.get_nowait()
+
+    def shutdown(self):
+        """
+        Shuts down the worker thread.
+        """
+        logging.info("Shutting down detection worker...")
+        self.executor.shutdown(wait=False)
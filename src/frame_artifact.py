@@ -0,0 +1,114 @@
+import cv2
+import time
+import threading
+import weakref
+import numpy as np
+from typing import Callable, Dict, Optional
+from src.detection import CatDetector
+from src.metrics import METRICS
+
+
+VARIANTS = ("original", "annotated", "thumbnail")
+
+
+class FrameArtifact:
+    """
+    A captured frame and its detections, shared by everything that stores or sends it.
+
+    Each JPEG variant (original, annotated and thumbnail) is encoded lazily on first
+    use and cached, so the archive, the notifier and any later consumer reuse the same
+    bytes. The frame itself is never modified: the annotated variant is drawn on the
+    single copy that is converted to BGR for encoding.
+
+    A frame taken from a capture ring slot holds that slot until the artifact is
+    released, explicitly with release() or when the artifact is garbage collected,
+    so consumers keep the artifact rather than its image.
+
+    Attributes:
+        image (np.ndarray): The RGB frame.
+        detection_type (str): 'cat', 'person', 'none' or 'no motion'.
+        detections (np.ndarray): Detections of shape (N, 6) in frame coordinates, sorted by score.
+        timestamp (float): Capture time as a UNIX timestamp.
+        jpeg_quality (int): JPEG quality of every variant.
+        thumbnail_width (int): Width of the thumbnail variant.
+        source_id (Optional[str]): The camera the frame came from, None with a single camera.
+    """
+    def __init__(self, image: np.ndarray, detection_type: str = "none", detections: Optional[np.ndarray] = None,
+                 timestamp: Optional[float] = None, jpeg_quality: int = 90, thumbnail_width: int = 320,
+                 source_id: Optional[str] = None, release: Optional[Callable[[], None]] = None):
+        self.image = image
+        self.detection_type = detection_type
+        self.detections = detections if detections is not None else np.zeros((0, 6), dtype=np.float32)
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        self.jpeg_quality = jpeg_quality
+        self.thumbnail_width = thumbnail_width
+        self.source_id = source_id
+        self._encoded: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+        self._release = weakref.finalize(self, release) if release is not None else None
+
+    def release(self):
+        """
+        Gives the frame's ring slot back. The image must not be used afterwards,
+        encoded variants stay available.
+        """
+        if self._release is not None:
+            self._release()
+
+    @property
+    def has_box(self) -> bool:
+        """
+        Whether the annotated variant differs from the original.
+        """
+        return self.detection_type in ("cat", "person") and len(self.detections) > 0
+
+    def jpeg(self, variant: str = "original") -> bytes:
+        """
+        Returns the JPEG bytes of a variant, encoding it on first use.
+
+        Args:
+            variant (str): 'original', 'annotated' or 'thumbnail'.
+
+        Returns:
+            bytes: The encoded image.
+        """
+        if variant not in VARIANTS:
+            raise ValueError(f"Unknown frame variant: {variant}")
+        with self._lock:
+            if variant not in self._encoded:
+                with METRICS.timer("encode"):
+                    self._encoded[variant] = self._encode(variant)
+            return self._encoded[variant]
+
+    def original_jpeg(self) -> bytes:
+        return self.jpeg("original")
+
+    def annotated_jpeg(self) -> bytes:
+        return self.jpeg("annotated")
+
+    def thumbnail_jpeg(self) -> bytes:
+        return self.jpeg("thumbnail")
+
+    def _encode(self, variant: str) -> bytes:
+        """
+        Renders and encodes a variant. The RGB to BGR conversion produces the only copy.
+        """
+        if variant == "thumbnail":
+            scale = min(1.0, self.thumbnail_width / self.image.shape[1])
+            size = (round(self.image.shape[1] * scale), round(self.image.shape[0] * scale))
+            bgr = cv2.resize(self.image, size, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(bgr, cv2.COLOR_RGB2BGR, dst=bgr)
+            draw = self.has_box
+        else:
+            scale = 1.0
+            bgr = cv2.cvtColor(self.image, cv2.COLOR_RGB2BGR)
+            draw = variant == "annotated" and self.has_box
+
+        if draw:
+            CatDetector.draw_box(bgr, self.detections[0, :4] * scale, self.detection_type, bgr=True,
+                                 thickness=3 if scale == 1.0 else 1)
+
+        success, encoded = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not success:
+            raise IOError(f"Failed to encode {variant} frame")
+        return encoded.tobytes()
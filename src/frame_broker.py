@@ -0,0 +1,376 @@
+import time
+import logging
+import threading
+import numpy as np
+from collections import deque
+from typing import Callable, List, Optional
+from src.frame_source import CapturedFrame, FrameSource
+
+
+class BrokerFrame:
+    """
+    A frame published by the broker.
+
+    The broker holds the capture of its newest frame until it captures the next
+    one, and every subscriber that got the frame from latest() or next() holds it
+    until it calls release(). While the capture is held, main() reads the main
+    image out of the same capture as the lores image. Once it is released there is
+    no main image anymore, rather than one of another frame.
+
+    Attributes:
+        index (int): Position in the capture sequence, increasing by one per frame.
+        timestamp (float): Capture time as a UNIX timestamp.
+        lores (np.ndarray): The lores image.
+    """
+    def __init__(self, index: int, timestamp: float, lores: np.ndarray, captured: Optional[CapturedFrame] = None,
+                 release_lores: Optional[Callable[[], None]] = None):
+        self.index = index
+        self.timestamp = timestamp
+        self.lores = lores
+        self._captured = captured
+        self._release_lores = release_lores
+        self._holders = 1 if captured is not None else 0
+        self._lock = threading.Lock()
+
+    def main(self) -> np.ndarray:
+        """
+        Returns the main image of the frame's own capture, read on first use.
+
+        Raises:
+            RuntimeError: If the capture was already released.
+        """
+        with self._lock:
+            if self._captured is None:
+                raise RuntimeError(f"Capture of frame {self.index} was released, its main image is gone")
+            return self._captured.main()
+
+    def _hold(self) -> bool:
+        """
+        Adds a holder of the capture, unless it was already released.
+        """
+        with self._lock:
+            if self._holders == 0:
+                return False
+            self._holders += 1
+            return True
+
+    def release(self):
+        """
+        Gives back a hold of the capture, the last one releases it.
+        """
+        with self._lock:
+            if self._holders == 0:
+                return
+            self._holders -= 1
+            if self._holders:
+                return
+            captured, self._captured = self._captured, None
+        captured.release()
+
+    def _drop(self):
+        """
+        Gives the lores image's ring slot back once the broker dropped the frame from its history.
+        """
+        if self._release_lores is not None:
+            self._release_lores()
+            self._release_lores = None
+
+
+class FrameBroker:
+    """
+    Owns a frame source in a single capture thread and publishes its frames to any number of subscribers.
+
+    Detection, /test and clip recording used to capture from the camera themselves,
+    from different threads and without coordination. The broker is the only reader
+    of the source instead: subscribers ask for the latest frame, the next frame or
+    the frames since a time, and are served from what the thread already captured.
+
+    The thread captures at most `fps` frames per second, and only while someone is
+    interested: it pauses once no subscriber asked for `idle_timeout` seconds and
+    no listener is registered. Listeners are called with every captured frame on
+    the capture thread, which is how a pre-roll buffer follows the camera
+    continuously instead of only seeing the frames detection looked at.
+
+    A main image is only copied out of a capture when a subscriber asks the frame
+    for it, which is why frames keep their capture while someone holds them, see
+    BrokerFrame. The broker itself holds the newest frame until the next one is
+    published, so it holds up to two captures while capturing. The kept lores
+    images hold references to the source's ring slots, so `history` should stay
+    below the ring size. A subscriber that keeps an image retains its slot in the
+    source's rings.
+
+    Attributes:
+        source (FrameSource): The device or file the frames come from.
+        history (int): Number of recent frames kept for since().
+        fps (Optional[float]): Maximum capture rate, None to capture as fast as the source delivers.
+        idle_timeout (float): Seconds without requests after which capture pauses.
+        frames_captured (int): Number of frames captured so far.
+    """
+    def __init__(self, source: FrameSource, history: int = 4, fps: Optional[float] = None,
+                 idle_timeout: float = 5.0):
+        self.source = source
+        self.history = history
+        self.fps = fps
+        self.idle_timeout = idle_timeout
+        self.frames_captured = 0
+        self._frames = deque(maxlen=history)
+        self._condition = threading.Condition()
+        self._held: Optional[BrokerFrame] = None
+        self._last_request = float("-inf")
+        self._listeners: List[Callable[[BrokerFrame], None]] = []
+        self._error: Optional[Exception] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "FrameBroker":
+        """
+        Starts the capture thread.
+        """
+        self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the capture thread and closes the source.
+        """
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        # Subscribers still holding the newest frame keep its capture.
+        if self._held is not None:
+            self._held.release()
+            self._held = None
+        for frame in self._frames:
+            frame._drop()
+        self._frames.clear()
+        self.source.close()
+
+    def _run(self):
+        """
+        Captures and publishes frames until stopped or the source is exhausted.
+        """
+        while True:
+            with self._condition:
+                while not self._stopping and not self._listeners \
+                        and time.monotonic() - self._last_request > self.idle_timeout:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+
+            start = time.monotonic()
+            try:
+                captured = self.source.capture()
+                try:
+                    lores, release_lores = captured.take("lores")
+                except Exception:
+                    captured.release()
+                    raise
+            except Exception as e:
+                logging.error(f"Capture thread error: {e}")
+                with self._condition:
+                    self._error = e
+                    self._condition.notify_all()
+                if isinstance(e, EOFError):
+                    return
+                time.sleep(1.0)
+                continue
+
+            with self._condition:
+                frame = BrokerFrame(self.frames_captured, time.time(), lores, captured, release_lores)
+                dropped = self._frames[0] if len(self._frames) == self.history else None
+                self._frames.append(frame)
+                if dropped is not None:
+                    dropped._drop()
+                previous, self._held = self._held, frame
+                self.frames_captured += 1
+                self._error = None
+                self._condition.notify_all()
+                listeners = list(self._listeners)
+            if previous is not None:
+                previous.release()
+
+            for listener in listeners:
+                try:
+                    listener(frame)
+                except Exception as e:
+                    logging.error(f"Frame listener error: {e}")
+
+            if self.fps:
+                time.sleep(max(0.0, 1.0 / self.fps - (time.monotonic() - start)))
+
+    def add_listener(self, listener: Callable[[BrokerFrame], None]):
+        """
+        Registers a callback that receives every captured frame on the capture thread.
+
+        Capture runs continuously while a listener is registered. The broker holds
+        the frame during the call, so the callback may read its main image, but it
+        must be quick and copy what it keeps, since the frame references the source's ring.
+
+        Args:
+            listener (Callable[[BrokerFrame], None]): The callback.
+        """
+        with self._condition:
+            self._listeners.append(listener)
+            self._condition.notify_all()
+
+    def remove_listener(self, listener: Callable[[BrokerFrame], None]):
+        """
+        Unregisters a callback registered with add_listener.
+        """
+        with self._condition:
+            self._listeners.remove(listener)
+
+    def _request(self):
+        """
+        Records a subscriber request, waking the capture thread if it was idle. Called with the condition held.
+        """
+        self._last_request = time.monotonic()
+        self._condition.notify_all()
+
+    def _wait(self, after: int, timeout: float, max_age: float = float("inf")) -> BrokerFrame:
+        """
+        Waits for the newest frame after index `after` and at most `max_age` seconds old, and holds it.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            self._request()
+            while True:
+                oldest = time.time() - max_age
+                candidates = [f for f in self._frames if f.index > after and f.timestamp >= oldest]
+                # Only the newest frame can still be held by the broker, an older one counts as missed.
+                if candidates and candidates[-1]._hold():
+                    return candidates[-1]
+                if self._error is not None:
+                    if isinstance(self._error, EOFError):
+                        raise EOFError(str(self._error))
+                    raise RuntimeError(f"Capture failed: {self._error}")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No frame within {timeout} s")
+                self._condition.wait(remaining)
+                self._last_request = time.monotonic()
+
+    def latest(self, max_age: float = 1.0, timeout: float = 5.0) -> BrokerFrame:
+        """
+        Returns the most recent frame without waiting, unless there is no recent one,
+        as after the capture thread was idle.
+
+        Args:
+            max_age (float): Seconds after which a frame is too old to count as the latest.
+            timeout (float): Seconds to wait for a frame.
+
+        Returns:
+            BrokerFrame: The frame, held until the caller releases it.
+        """
+        return self._wait(-1, timeout, max_age)
+
+    def next(self, after: Optional[int] = None, max_age: float = float("inf"), timeout: float = 5.0) -> BrokerFrame:
+        """
+        Waits for a frame newer than the given one.
+
+        Args:
+            after (Optional[int]): Index of the last frame the subscriber saw, the current latest if None.
+            max_age (float): Seconds after which a frame is too old to be returned.
+            timeout (float): Seconds to wait for a frame.
+
+        Returns:
+            BrokerFrame: The newest frame after `after`, so a slow subscriber skips frames instead of
+                         lagging. It is held until the caller releases it.
+        """
+        if after is None:
+            with self._condition:
+                after = self._frames[-1].index if self._frames else -1
+        return self._wait(after, timeout, max_age)
+
+    def since(self, timestamp: float) -> List[BrokerFrame]:
+        """
+        Returns copies of the kept frames captured after a time, oldest first, without waiting.
+
+        Args:
+            timestamp (float): UNIX timestamp.
+
+        Returns:
+            List[BrokerFrame]: The frames, at most `history` of them. They have no main image.
+        """
+        with self._condition:
+            self._request()
+            return [BrokerFrame(f.index, f.timestamp, f.lores.copy()) for f in self._frames if f.timestamp > timestamp]
+
+
+class BrokerSource(FrameSource):
+    """
+    A subscriber of a FrameBroker with the FrameSource interface, so Camera reads from the broker unchanged.
+
+    Every capture returns a recent frame the subscriber has not seen yet and holds
+    it until the capture is released, so its main image comes from the same capture
+    as its lores image. The broker holds up to two captures of the source itself,
+    which is why a subscriber can hold two captures less than the source.
+
+    Attributes:
+        broker (FrameBroker): The broker the frames come from.
+        max_age (float): Seconds after which a kept frame is too old to be returned, such as one
+                         captured for another subscriber before the thread went idle.
+        timeout (float): Seconds to wait for a frame.
+    """
+    def __init__(self, broker: FrameBroker, max_age: float = 1.0, timeout: float = 5.0):
+        self.broker = broker
+        self.max_age = max_age
+        self.timeout = timeout
+        self._last_index = -1
+
+    @property
+    def frame_size(self):
+        return self.broker.source.frame_size
+
+    @property
+    def main_size(self):
+        return self.broker.source.main_size
+
+    @property
+    def rings(self):
+        return self.broker.source.rings
+
+    @property
+    def max_held(self):
+        held = self.broker.source.max_held
+        return max(1, held - 2) if held else None
+
+    def capture(self) -> CapturedFrame:
+        frame = self.broker.next(self._last_index, max_age=self.max_age, timeout=self.timeout)
+        self._last_index = frame.index
+        rings = self.rings
+
+        def retained(image: np.ndarray) -> np.ndarray:
+            # The capture gives one reference per image back on release, like a source capture.
+            for ring in rings:
+                ring.retain(image)
+            return image
+
+        return CapturedFrame(lambda: retained(frame.lores), lambda: retained(frame.main()), frame.release, rings)
+
+    def capture_main(self) -> np.ndarray:
+        frame = self.broker.latest(max_age=self.max_age, timeout=self.timeout)
+        try:
+            return frame.main().copy()
+        finally:
+            frame.release()
+
+    def close(self):
+        self.broker.stop()
+
+
+def brokered(source: FrameSource, **options) -> BrokerSource:
+    """
+    Starts a broker on a source and returns a subscriber of it.
+
+    Args:
+        source (FrameSource): The source the broker's thread captures from.
+        **options: Keyword arguments passed to FrameBroker.
+
+    Returns:
+        BrokerSource: A subscriber of the running broker.
+    """
+    return BrokerSource(FrameBroker(source, **options).start())
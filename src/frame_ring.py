@@ -0,0 +1,129 @@
+import logging
+import threading
+import numpy as np
+from typing import List, Optional, Tuple
+
+
+class FrameRing:
+    """
+    A fixed number of preallocated uint8 frame slots that captures are written into.
+
+    Slots are handed out round robin and consumers keep plain views of them, so a
+    running camera stops allocating a new array per frame. Ownership is explicit:
+    acquire() hands out a slot with one reference, every holder that keeps the
+    frame adds one with retain(), and the slot is only reused once every reference
+    was given back with release(). A view that outlives the references of its slot
+    may see the slot overwritten, so anything that keeps a frame must hold a
+    reference, as frame artifacts do, or copy it.
+
+    When every slot is held a temporary array is allocated instead and counted in
+    `overflows`, which means the ring is too small for the workload or a holder
+    never released its frame. retain() and release() of a temporary array do nothing.
+
+    Attributes:
+        size (int): Number of slots.
+        shape (Optional[Tuple[int, ...]]): Shape of every slot, set on first use.
+        slots (List[np.ndarray]): The preallocated slots.
+        overflows (int): Number of frames that did not fit into a free slot.
+    """
+    def __init__(self, size: int, shape: Optional[Tuple[int, ...]] = None):
+        self.size = size
+        self.shape = None
+        self.slots: List[np.ndarray] = []
+        self.overflows = 0
+        self._next = 0
+        self._references: List[int] = []
+        self._lock = threading.Lock()
+        if shape is not None:
+            self._allocate(tuple(shape))
+
+    def _allocate(self, shape: Tuple[int, ...]):
+        """
+        (Re)allocates every slot for a new frame shape. Held slots of the old shape
+        stay valid for their holders and are simply dropped once released.
+        """
+        self.shape = shape
+        self.slots = [np.empty(shape, dtype=np.uint8) for _ in range(self.size)]
+        self._references = [0] * self.size
+        self._next = 0
+
+    def _index(self, frame: np.ndarray) -> Optional[int]:
+        """
+        Returns the slot index of a frame, None if the frame is not a slot of the ring.
+        """
+        for index, slot in enumerate(self.slots):
+            if slot is frame:
+                return index
+        return None
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        """
+        Returns the next free slot with one reference, to be overwritten by the caller.
+
+        Args:
+            shape (Tuple[int, ...]): The frame shape. A different shape than before reallocates the ring.
+
+        Returns:
+            np.ndarray: A free slot, or a new array if every slot is held.
+        """
+        shape = tuple(shape)
+        with self._lock:
+            if shape != self.shape:
+                self._allocate(shape)
+
+            for _ in range(self.size):
+                index = self._next
+                self._next = (self._next + 1) % self.size
+                if self._references[index] == 0:
+                    self._references[index] = 1
+                    return self.slots[index]
+
+            self.overflows += 1
+            overflows = self.overflows
+        if overflows == 1 or overflows % 100 == 0:
+            logging.warning(f"Frame ring of {self.size} slots is full, allocated a temporary frame "
+                            f"({overflows} so far)")
+        return np.empty(shape, dtype=np.uint8)
+
+    def retain(self, frame: np.ndarray) -> bool:
+        """
+        Adds a reference to the slot of a frame.
+
+        Args:
+            frame (np.ndarray): A frame returned by acquire().
+
+        Returns:
+            bool: Whether the frame is a slot of the ring.
+        """
+        with self._lock:
+            index = self._index(frame)
+            if index is None:
+                return False
+            self._references[index] += 1
+            return True
+
+    def release(self, frame: np.ndarray) -> bool:
+        """
+        Gives back a reference to the slot of a frame, freeing the slot with the last one.
+
+        Args:
+            frame (np.ndarray): A frame returned by acquire().
+
+        Returns:
+            bool: Whether the frame is a slot of the ring.
+        """
+        with self._lock:
+            index = self._index(frame)
+            if index is None:
+                return False
+            if self._references[index] == 0:
+                raise RuntimeError("Frame ring slot released more often than acquired")
+            self._references[index] -= 1
+            return True
+
+    def in_use(self) -> int:
+        """
+        Returns the number of slots currently held.
+        """
+        with self._lock:
+            return sum(count > 0 for count in self._references)
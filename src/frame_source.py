@@ -0,0 +1,390 @@
+import cv2
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+from src.frame_ring import FrameRing
+
+# picamera2 pulls in libcamera and is only needed on the Pi, so it is imported
+# when the first camera is opened rather than with this module.
+MappedArray = Picamera2 = None
+
+
+def _import_picamera2():
+    """
+    Imports picamera2 on first use.
+
+    Raises:
+        RuntimeError: If picamera2 is not installed.
+    """
+    global MappedArray, Picamera2
+    if Picamera2 is not None:
+        return
+    try:
+        from picamera2 import MappedArray, Picamera2
+    except ImportError:
+        raise RuntimeError("picamera2 is not installed")
+
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+class CapturedFrame:
+    """
+    A single capture whose lores and main images are only materialized on request,
+    at most once each.
+
+    The capture holds one reference to the ring slots its images were written
+    into and gives them back on release(), so the images must not be used after
+    it. An image that has to outlive the capture, like the frame of an artifact,
+    is kept with take(), which adds a reference of its own.
+    """
+    def __init__(self, lores: Callable[[], np.ndarray], main: Callable[[], np.ndarray],
+                 release: Optional[Callable[[], None]] = None, rings: Sequence[FrameRing] = ()):
+        self._lores = lores
+        self._main = main
+        self._release = release
+        self._rings = rings
+        self._images = {}
+
+    def _get(self, name: str, read: Callable[[], np.ndarray]) -> np.ndarray:
+        if name not in self._images:
+            self._images[name] = read()
+        return self._images[name]
+
+    def lores(self) -> np.ndarray:
+        """
+        Returns the 3-channel uint8 lores image used for motion gating and detection.
+        """
+        return self._get("lores", self._lores)
+
+    def main(self) -> np.ndarray:
+        """
+        Returns the 3-channel uint8 full-resolution image used for snapshots.
+        """
+        return self._get("main", self._main)
+
+    def take(self, name: str) -> Tuple[np.ndarray, Callable[[], None]]:
+        """
+        Keeps an image beyond the release of the capture.
+
+        Args:
+            name (str): 'lores' or 'main'.
+
+        Returns:
+            Tuple[np.ndarray, Callable[[], None]]: The image and the function that gives
+                its slot back, to be called once the image is no longer used.
+        """
+        image = self.lores() if name == "lores" else self.main()
+        rings = [ring for ring in self._rings if ring.retain(image)]
+
+        def release():
+            for ring in rings:
+                ring.release(image)
+
+        return image, release
+
+    def release(self):
+        """
+        Hands the capture buffers and the capture's references to its ring slots back to the source.
+        """
+        if self._release is not None:
+            self._release()
+            self._release = None
+        images, self._images = self._images, {}
+        # A lores image can be the main image itself, which holds one reference.
+        for image in {id(image): image for image in images.values()}.values():
+            for ring in self._rings:
+                ring.release(image)
+
+
+def release_all(captures: Iterable[CapturedFrame]):
+    """
+    Releases every capture of a burst.
+    """
+    for captured in captures:
+        captured.release()
+
+
+class FrameSource:
+    """
+    Base class for anything Camera can capture frames from.
+
+    Frames are RGB ordered, like the Picamera2 'BGR888' main stream.
+
+    Attributes:
+        frame_size (Tuple[int, int]): Width and height of the lores images.
+        main_size (Tuple[int, int]): Width and height of the main images.
+        max_held (Optional[int]): Number of captures that can be held unreleased at once, None if unlimited.
+        rings (Sequence[FrameRing]): The rings the captured images are written into.
+    """
+    frame_size: Tuple[int, int]
+    main_size: Tuple[int, int]
+    max_held: Optional[int] = None
+    rings: Sequence[FrameRing] = ()
+
+    def capture(self) -> CapturedFrame:
+        """
+        Captures the next frame. The caller must release() it.
+
+        Returns:
+            CapturedFrame: The capture.
+        """
+        raise NotImplementedError
+
+    def capture_lores(self) -> np.ndarray:
+        """
+        Captures the next frame and returns a copy of its lores image, owned by the caller.
+        """
+        frame = self.capture()
+        try:
+            return frame.lores().copy()
+        finally:
+            frame.release()
+
+    def capture_main(self) -> np.ndarray:
+        """
+        Captures the next frame and returns a copy of its main image, owned by the caller.
+        """
+        frame = self.capture()
+        try:
+            return frame.main().copy()
+        finally:
+            frame.release()
+
+    def close(self):
+        """
+        Releases the underlying device or file.
+        """
+
+
+class Picamera2Source(FrameSource):
+    """
+    Frames from a Raspberry Pi camera with a full-resolution main and a lores stream.
+
+    Frames are copied straight from the mapped camera buffers into preallocated
+    ring slots, so steady capture allocates no new arrays. A held capture keeps
+    one of the `buffer_count` camera buffers, and one buffer always has to stay
+    with the camera, so at most `buffer_count - 1` captures can be held at once.
+
+    Attributes:
+        picam2 (Picamera2): PiCamera instance for capturing images.
+        lores_ring (FrameRing): Slots the lores frames are written into.
+        main_ring (FrameRing): Slots the main frames are written into.
+    """
+    def __init__(self, frame_size: Tuple[int, int] = (640, 360), main_size: Tuple[int, int] = (1920, 1080),
+                 camera_num: int = 0, ring_size: int = 8, main_ring_size: int = 4, buffer_count: int = 6):
+        _import_picamera2()
+
+        self.frame_size = frame_size
+        self.main_size = main_size
+        self.max_held = buffer_count - 1
+        self.lores_ring = FrameRing(ring_size, (frame_size[1], frame_size[0], 3))
+        self.main_ring = FrameRing(main_ring_size, (main_size[1], main_size[0], 3))
+        self.rings = (self.lores_ring, self.main_ring)
+        self.picam2 = Picamera2(camera_num)
+        try:
+            camera_config = self.picam2.create_still_configuration(main={"size": self.main_size},
+                                                                   lores={"size": self.frame_size},
+                                                                   buffer_count=buffer_count)
+            self.picam2.configure(camera_config)
+            self.picam2.start()
+        except Exception as e:
+            logging.error(f"Camera initialization failed: {e}")
+            raise
+
+    def _lores_to_rgb(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Converts a lores frame to a 3-channel image matching the main stream,
+        written into a lores ring slot.
+
+        The lores stream is YUV420 on most sensors, which Picamera2 returns as a
+        single (height * 3 / 2, stride) plane.
+
+        Args:
+            frame (np.ndarray): The lores frame.
+
+        Returns:
+            np.ndarray: The 3-channel lores frame.
+        """
+        width, height = self.frame_size
+        out = self.lores_ring.acquire((height, width, 3))
+        if frame.ndim == 2:
+            if frame.shape == (height * 3 // 2, width):
+                cv2.cvtColor(frame, cv2.COLOR_YUV420p2RGB, dst=out)
+            else:
+                # Rows are padded to the stride, convert and crop.
+                np.copyto(out, cv2.cvtColor(frame, cv2.COLOR_YUV420p2RGB)[:height, :width])
+        else:
+            np.copyto(out, frame[:height, :width, :3])
+        return out
+
+    def _main_to_rgb(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Copies a main frame into a main ring slot, dropping the padding and any 4th channel.
+        """
+        width, height = self.main_size
+        out = self.main_ring.acquire((height, width, 3))
+        np.copyto(out, frame[:height, :width, :3])
+        return out
+
+    def _read(self, request, stream: str, convert: Callable[[np.ndarray], np.ndarray]) -> np.ndarray:
+        """
+        Converts a stream of a capture request without an intermediate copy.
+        """
+        with MappedArray(request, stream) as mapped:
+            return convert(mapped.array)
+
+    def capture(self) -> CapturedFrame:
+        request = self.picam2.capture_request()
+        return CapturedFrame(lambda: self._read(request, "lores", self._lores_to_rgb),
+                             lambda: self._read(request, "main", self._main_to_rgb),
+                             request.release, self.rings)
+
+    def close(self):
+        self.picam2.stop()
+        self.picam2.close()
+
+
+class _DecodedFrameSource(FrameSource):
+    """
+    Shared lores handling for sources that decode full frames from files.
+    """
+    def __init__(self, frame_size: Optional[Tuple[int, int]], ring_size: int = 8):
+        self._requested_frame_size = frame_size
+        self.frame_size = frame_size
+        self.main_size = None
+        self.lores_ring = FrameRing(ring_size)
+        self.rings = (self.lores_ring,)
+
+    def _set_main_size(self, width: int, height: int):
+        """
+        Records the main size and derives a lores size of 640 pixels wide if none was given.
+        """
+        self.main_size = (width, height)
+        if self._requested_frame_size is None:
+            lores_width = min(640, width)
+            self.frame_size = (lores_width, int(round(height * lores_width / width / 2)) * 2)
+
+    def _wrap(self, main: np.ndarray) -> CapturedFrame:
+        """
+        Wraps a decoded BGR frame into a capture with a lazily resized lores image.
+
+        The capture owns the lores slot it writes, and the main frame's slot if it
+        was decoded into one of the source's rings.
+        """
+        cv2.cvtColor(main, cv2.COLOR_BGR2RGB, dst=main)
+        if self.main_size is None:
+            self._set_main_size(main.shape[1], main.shape[0])
+
+        def lores():
+            width, height = self.frame_size
+            if main.shape[:2] == (height, width):
+                return main
+            out = self.lores_ring.acquire((height, width, 3))
+            return cv2.resize(main, self.frame_size, dst=out, interpolation=cv2.INTER_AREA)
+
+        capture = CapturedFrame(lores, lambda: main, rings=self.rings)
+        # The decoded frame already holds its slot, the capture takes that reference over.
+        capture.main()
+        return capture
+
+
+class ImageDirectorySource(_DecodedFrameSource):
+    """
+    Replays the images of a directory in file name order.
+
+    Attributes:
+        paths (List[Path]): The images being replayed.
+        loop (bool): Whether to start over after the last image.
+    """
+    def __init__(self, directory: str, frame_size: Optional[Tuple[int, int]] = None, loop: bool = False):
+        super().__init__(frame_size)
+        self.paths: List[Path] = sorted(p for p in Path(directory).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+        if not self.paths:
+            raise FileNotFoundError(f"No images found in {directory}")
+        self.loop = loop
+        self._index = 0
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def capture(self) -> CapturedFrame:
+        if self._index >= len(self.paths):
+            if not self.loop:
+                raise EOFError("Image directory exhausted")
+            self._index = 0
+        path = self.paths[self._index]
+        self._index += 1
+
+        image = cv2.imread(str(path))
+        if image is None:
+            raise IOError(f"Failed to read image: {path}")
+        return self._wrap(image)
+
+
+class VideoFileSource(_DecodedFrameSource):
+    """
+    Replays the frames of a recorded video file, decoded into preallocated ring slots.
+
+    Attributes:
+        path (str): The video file.
+        loop (bool): Whether to rewind at the end of the file.
+        main_ring (FrameRing): Slots the decoded frames are written into.
+    """
+    def __init__(self, path: str, frame_size: Optional[Tuple[int, int]] = None, loop: bool = False,
+                 main_ring_size: int = 8):
+        super().__init__(frame_size)
+        self.main_ring = FrameRing(main_ring_size)
+        self.rings = (self.lores_ring, self.main_ring)
+        self.path = path
+        self.loop = loop
+        self.capture_device = cv2.VideoCapture(path)
+        if not self.capture_device.isOpened():
+            raise IOError(f"Failed to open video: {path}")
+        self._set_main_size(int(self.capture_device.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                            int(self.capture_device.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def __len__(self) -> int:
+        return int(self.capture_device.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def capture(self) -> CapturedFrame:
+        width, height = self.main_size
+        slot = self.main_ring.acquire((height, width, 3))
+        success, frame = self.capture_device.read(slot)
+        if not success and self.loop:
+            self.capture_device.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            success, frame = self.capture_device.read(slot)
+        if not success or frame is not slot:
+            self.main_ring.release(slot)
+        if not success:
+            raise EOFError("Video file exhausted")
+        return self._wrap(frame)
+
+    def close(self):
+        self.capture_device.release()
+
+
+def open_source(spec: str, frame_size: Optional[Tuple[int, int]] = None,
+                main_size: Tuple[int, int] = (1920, 1080), loop: bool = False) -> FrameSource:
+    """
+    Opens a frame source from a specification string.
+
+    'picamera2' or 'picamera2:N' opens camera N, a directory replays its images
+    and any other path is opened as a video file.
+
+    Args:
+        spec (str): The source specification.
+        frame_size (Optional[Tuple[int, int]]): Lores size, derived from the file if None.
+        main_size (Tuple[int, int]): Main stream size for cameras.
+        loop (bool): Whether file sources start over at the end.
+
+    Returns:
+        FrameSource: The opened source.
+    """
+    if spec.startswith("picamera2"):
+        camera_num = int(spec.split(":")[1]) if ":" in spec else 0
+        return Picamera2Source(frame_size or (640, 360), main_size, camera_num)
+    if Path(spec).is_dir():
+        return ImageDirectorySource(spec, frame_size, loop)
+    return VideoFileSource(spec, frame_size, loop)
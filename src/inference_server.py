@@ -0,0 +1,348 @@
+import copy
+import time
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import Future
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from src.detection import CatDetector
+from src.metrics import METRICS
+from src.postprocess import CAT_CLASS_ID, PERSON_CLASS_ID
+from src.roi import RegionOfInterest
+
+
+def serve(detector_factory: Callable[[], CatDetector], slot_names: Sequence[str], requests, responses,
+          max_batch: int, batch_window: float):
+    """
+    Runs in the server process: loads the model and answers requests until it receives None.
+
+    A request is (request_id, [(slot, shape), ...], input_scale), with the frames in
+    the shared memory slots. Requests arriving within `batch_window` of each other
+    are inferred together, up to `max_batch` frames, in one detect_batch call per
+    frame size and input scale. The response is (request_id, counts, payload, error)
+    with the detections of all frames as float32 bytes, `counts` rows per frame.
+    """
+    slots = [SharedMemory(name=name) for name in slot_names]
+    detector = detector_factory()
+    stopping = False
+
+    while not stopping:
+        message = requests.get()
+        if message is None:
+            break
+        batch = [message]
+        frames = len(message[1])
+        deadline = time.monotonic() + batch_window
+        while frames < max_batch:
+            try:
+                message = requests.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if message is None:
+                stopping = True
+                break
+            batch.append(message)
+            frames += len(message[1])
+
+        groups: Dict[Tuple, List[Tuple[int, int]]] = {}
+        for index, (_, frame_slots, input_scale) in enumerate(batch):
+            for position, (_, shape) in enumerate(frame_slots):
+                groups.setdefault((tuple(shape), input_scale), []).append((index, position))
+
+        detections: List[List[Optional[np.ndarray]]] = [[None] * len(m[1]) for m in batch]
+        errors: Dict[int, str] = {}
+        for (shape, input_scale), members in groups.items():
+            images = [np.ndarray(shape, dtype=np.uint8, buffer=slots[batch[i][1][p][0]].buf) for i, p in members]
+            try:
+                detector.input_scale = input_scale
+                for (i, p), d in zip(members, detector.detect_batch(images)):
+                    detections[i][p] = np.asarray(d, dtype=np.float32).reshape(-1, 6)
+            except Exception as e:
+                for i, _ in members:
+                    errors[i] = str(e)
+            del images
+
+        for index, (request_id, _, _) in enumerate(batch):
+            if index in errors:
+                responses.put((request_id, None, None, errors[index]))
+                continue
+            counts = [len(d) for d in detections[index]]
+            responses.put((request_id, counts, np.concatenate(detections[index]).tobytes(), None))
+
+    for slot in slots:
+        slot.close()
+
+
+class InferenceServer:
+    """
+    Holds the model in a separate process and serves detection requests from several clients.
+
+    Inference in the bot process competes with the asyncio loop and Telegram for the
+    GIL, and a slow call delays every reply. The server process owns the only
+    detector instead. Clients copy their frames into preallocated shared memory
+    slots and only pass slot numbers and shapes through the request queue, so no
+    pixel data is pickled; the answer is the detections as a compact float32 buffer.
+    Requests from the detection loop, /test and any other client arriving close
+    together are inferred as one batch.
+
+    A supervisor thread restarts the server process when it dies and resubmits the
+    requests that were in flight. A request that was in flight during
+    `max_attempts` crashes fails instead, so a frame that crashes the model cannot
+    keep the server restarting.
+
+    Clients run in the process that owns the server, see InferenceClient.
+
+    Attributes:
+        detector_factory (Callable[[], CatDetector]): Creates the detector in the server process, must be picklable.
+        slot_bytes (int): Size of one shared memory slot, the largest frame a client can send.
+        max_batch (int): Maximum frames inferred together.
+        batch_window (float): Seconds the server waits for more requests to join a batch.
+        restart_delay (float): Seconds before a dead server process is restarted.
+        max_attempts (int): Times a request is sent before a crash fails it.
+        slots (int): Number of shared memory slots, the most frames in flight.
+        restarts (int): Number of times the server process was restarted.
+    """
+    def __init__(self, detector_factory: Callable[[], CatDetector], slots: int = 8,
+                 max_frame_shape: Tuple[int, int, int] = (1080, 1920, 3), max_batch: int = 8,
+                 batch_window: float = 0.005, restart_delay: float = 1.0, max_attempts: int = 2):
+        self.detector_factory = detector_factory
+        self.slot_bytes = int(np.prod(max_frame_shape))
+        self.max_batch = max_batch
+        self.batch_window = batch_window
+        self.restart_delay = restart_delay
+        self.max_attempts = max_attempts
+        self.slots = slots
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._segments = [SharedMemory(create=True, size=self.slot_bytes) for _ in range(slots)]
+        self._free = queue.Queue()
+        for index in range(slots):
+            self._free.put(index)
+        self._acquire_lock = threading.Lock()
+        self._requests = None
+        self._responses = None
+        self._pending: Dict[int, list] = {}
+        self._pending_lock = threading.Lock()
+        self._ids = itertools.count()
+        self._process = None
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """
+        Starts the server process and the supervisor and dispatcher threads.
+        """
+        self._spawn()
+        for target, name in ((self._supervise, "inference-supervisor"), (self._dispatch, "inference-dispatcher")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _spawn(self):
+        """
+        Starts a server process. A process killed while it waits on a queue can leave
+        the queue's lock held, so every process gets new queues.
+        """
+        self._requests = self._context.Queue()
+        self._responses = self._context.Queue()
+        self._process = self._context.Process(
+            target=serve, name="inference-server", daemon=True,
+            args=(self.detector_factory, [slot.name for slot in self._segments], self._requests, self._responses,
+                  self.max_batch, self.batch_window))
+        self._process.start()
+        logging.info(f"Inference server started with pid {self._process.pid}")
+
+    def _supervise(self):
+        """
+        Restarts the server process when it dies, and resends or fails the requests it held.
+        """
+        while not self._stopping.is_set():
+            self._process.join(timeout=0.2)
+            if self._stopping.is_set() or self._process.exitcode is None:
+                continue
+            logging.error(f"Inference server exited with code {self._process.exitcode}, restarting")
+            self.restarts += 1
+            METRICS.inc("inference_restarts")
+            time.sleep(self.restart_delay)
+            if self._stopping.is_set():
+                break
+            self._spawn()
+            with self._pending_lock:
+                pending = list(self._pending.items())
+            for request_id, entry in pending:
+                future, message, attempts = entry
+                if attempts >= self.max_attempts:
+                    self._finish(request_id, error=f"Inference server crashed {attempts} times on this request")
+                    continue
+                entry[2] += 1
+                self._requests.put(message)
+
+    def _dispatch(self):
+        """
+        Hands the responses of the server process to the waiting clients.
+        """
+        while not self._stopping.is_set():
+            try:
+                request_id, counts, payload, error = self._responses.get(timeout=0.2)
+            except (queue.Empty, OSError, EOFError):
+                continue
+            if error is not None:
+                self._finish(request_id, error=error)
+                continue
+            rows = np.frombuffer(payload, dtype=np.float32).reshape(-1, 6).copy()
+            self._finish(request_id, np.split(rows, np.cumsum(counts)[:-1]))
+
+    def _finish(self, request_id: int, detections: Optional[List[np.ndarray]] = None, error: Optional[str] = None):
+        """
+        Releases the slots of a request and resolves its future. Late duplicates are ignored.
+        """
+        with self._pending_lock:
+            entry = self._pending.pop(request_id, None)
+        if entry is None:
+            return
+        future, message, _ = entry
+        for slot, _ in message[1]:
+            self._free.put(slot)
+        if error is not None:
+            future.set_exception(RuntimeError(error))
+        else:
+            future.set_result(detections)
+
+    def submit(self, frames: Sequence[np.ndarray], input_scale: float = 1.0) -> Future:
+        """
+        Copies frames into shared memory slots and queues them for inference.
+
+        Blocks while all slots are in use.
+
+        Args:
+            frames (Sequence[np.ndarray]): uint8 frames, at most as many as there are slots.
+            input_scale (float): Factor the frames are shrunk by before inference.
+
+        Returns:
+            Future: Resolves to the per-frame (N, 6) detections.
+        """
+        if len(frames) > self.slots:
+            raise ValueError(f"Cannot submit {len(frames)} frames with {self.slots} slots")
+        for frame in frames:
+            if frame.dtype != np.uint8 or frame.nbytes > self.slot_bytes:
+                raise ValueError(f"Frame of {frame.shape} {frame.dtype} does not fit a {self.slot_bytes} byte slot")
+
+        # One client at a time takes its slots, so two clients cannot each hold half of the slots they need.
+        with self._acquire_lock:
+            slots = [self._free.get() for _ in frames]
+        for slot, frame in zip(slots, frames):
+            np.copyto(np.ndarray(frame.shape, dtype=np.uint8, buffer=self._segments[slot].buf), frame)
+
+        future = Future()
+        request_id = next(self._ids)
+        message = (request_id, [(slot, frame.shape) for slot, frame in zip(slots, frames)], input_scale)
+        with self._pending_lock:
+            self._pending[request_id] = [future, message, 1]
+        self._requests.put(message)
+        return future
+
+    def client(self, roi: Optional[RegionOfInterest] = None, timeout: float = 30.0) -> "InferenceClient":
+        """
+        Returns a new client of this server.
+        """
+        return InferenceClient(self, roi, timeout)
+
+    def stop(self):
+        """
+        Stops the server process and frees the shared memory. Pending requests fail.
+        """
+        self._stopping.set()
+        if self._process is not None and self._process.is_alive():
+            self._requests.put(None)
+            self._process.join(timeout=5)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+        for thread in self._threads:
+            thread.join()
+        with self._pending_lock:
+            request_ids = list(self._pending)
+        for request_id in request_ids:
+            self._finish(request_id, error="Inference server stopped")
+        for slot in self._segments:
+            slot.close()
+            slot.unlink()
+
+
+class InferenceClient:
+    """
+    A detector backed by an InferenceServer, with the detect/detect_batch/classify/scores
+    interface of CatDetector, so cameras, the tiler and /test use it unchanged.
+
+    The region of interest is applied on the client, so clients with and without
+    one share the server's detector.
+
+    Attributes:
+        server (InferenceServer): The server the frames are sent to.
+        roi (Optional[RegionOfInterest]): Regions that images are cropped to before inference.
+        input_scale (float): Factor images are shrunk by before inference, lowered by the thermal governor.
+        timeout (float): Seconds to wait for an answer.
+    """
+    def __init__(self, server: InferenceServer, roi: Optional[RegionOfInterest] = None, timeout: float = 30.0):
+        self.server = server
+        self.roi = roi
+        self.input_scale = 1.0
+        self.timeout = timeout
+        self.cat_class_id = CAT_CLASS_ID
+        self.person_class_id = PERSON_CLASS_ID
+
+    # Pure functions of the detections and of detect_batch, shared with CatDetector.
+    classify = CatDetector.classify
+    scores = CatDetector.scores
+    warmup = CatDetector.warmup
+
+    def derive(self, input_scale: Optional[float] = None) -> "InferenceClient":
+        """
+        Returns a client of the same server with its own input scale.
+        """
+        derived = copy.copy(self)
+        if input_scale is not None:
+            derived.input_scale = input_scale
+        return derived
+
+    def detect(self, image: np.ndarray) -> np.ndarray:
+        """
+        Detects cats and persons in an image.
+
+        Returns:
+            np.ndarray: Array of shape (N, 6) holding x1, y1, x2, y2, score and class ID, sorted by score.
+        """
+        return self.detect_batch([image])[0]
+
+    def detect_batch(self, images) -> List[np.ndarray]:
+        """
+        Sends a batch of images to the server, in chunks of at most the number of slots.
+
+        Args:
+            images: Sequence or (N, H, W, C) array of images.
+
+        Returns:
+            List[np.ndarray]: Per-image detections as returned by detect().
+        """
+        try:
+            images = list(images)
+            crops = [self.roi.crop(image) for image in images] if self.roi is not None else None
+            frames = [crop for crop, _ in crops] if crops is not None else images
+            chunk = self.server.slots
+            detections = []
+            with METRICS.timer("inference"):
+                futures = [self.server.submit(frames[i:i + chunk], self.input_scale)
+                           for i in range(0, len(frames), chunk)]
+                for future in futures:
+                    detections.extend(future.result(timeout=self.timeout))
+            if crops is None:
+                return detections
+            return [self.roi.to_frame(d, offset, image.shape[:2])
+                    for d, (_, offset), image in zip(detections, crops, images)]
+        except Exception as e:
+            logging.error(f"Object Detection Error: {e}")
+            raise RuntimeError("ObjectDetectionError")
@@ -0,0 +1,237 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional, Sequence
+
+
+# Upper bounds in seconds, from sub-millisecond preprocessing to slow Telegram uploads.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGES = ("capture", "motion", "preprocess", "inference", "postprocess", "encode", "disk_write", "telegram_send")
+COUNTERS = ("frames_gated", "frames_inferred", "frames_screened", "frames_confirmed", "notifications_sent",
+            "quality_level_changes", "tiles_inferred", "tiles_skipped",
+            "inference_restarts")
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram, cheap enough to update on every frame.
+
+    Attributes:
+        buckets (Sequence[float]): Upper bounds of the buckets in seconds.
+        counts (list): Observations per bucket, the last entry counting values above every bound.
+        sum (float): Sum of all observations.
+        count (int): Number of observations.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        """
+        Records one observation.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimates a quantile by interpolating within its bucket.
+
+        Args:
+            q (float): The quantile between 0 and 1.
+
+        Returns:
+            float: The estimated value, the largest bound if it falls above every bucket.
+        """
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if count == 0:
+            return 0.0
+
+        rank = q * count
+        cumulative = 0
+        for index, bucket_count in enumerate(counts[:-1]):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+
+class Metrics:
+    """
+    Latency histograms per pipeline stage and event counters.
+
+    Attributes:
+        histograms (Dict[str, Histogram]): Latency per stage.
+        counters (Dict[str, int]): Event counts.
+        gauges (Dict[str, float]): Values that are set rather than accumulated, like startup times.
+        started (float): Monotonic time the metrics were created.
+    """
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.histograms: Dict[str, Histogram] = {stage: Histogram(buckets) for stage in STAGES}
+        self.counters: Dict[str, int] = dict.fromkeys(COUNTERS, 0)
+        self.gauges: Dict[str, float] = {}
+        self.started = time.monotonic()
+        self._buckets = buckets
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float):
+        """
+        Records the latency of a stage.
+        """
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(stage, Histogram(self._buckets))
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        """
+        Times the enclosed block with the monotonic performance counter.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def inc(self, counter: str, value: int = 1):
+        """
+        Increments an event counter.
+        """
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def set(self, gauge: str, value: float):
+        """
+        Sets a gauge.
+        """
+        self.gauges[gauge] = value
+
+    def render_prometheus(self, prefix: str = "catbot") -> str:
+        """
+        Renders all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics page.
+        """
+        lines = [f"# TYPE {prefix}_stage_seconds histogram"]
+        for stage, histogram in self.histograms.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {histogram.count}')
+        for counter, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{counter}_total counter")
+            lines.append(f"{prefix}_{counter}_total {value}")
+        for gauge, value in self.gauges.items():
+            lines.append(f"# TYPE {prefix}_{gauge} gauge")
+            lines.append(f"{prefix}_{gauge} {value:.6g}")
+        lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+        lines.append(f"{prefix}_uptime_seconds {time.monotonic() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        Summarizes the metrics as a short human readable text, used by /stats.
+
+        Returns:
+            str: One line per stage with samples and p50/p95 latency, then the counters.
+        """
+        uptime = int(time.monotonic() - self.started)
+        lines = [f"Uptime {uptime // 3600}h {uptime % 3600 // 60}m"]
+        for stage, histogram in self.histograms.items():
+            if histogram.count:
+                lines.append(f"{stage}: {histogram.count} samples, p50 {histogram.quantile(0.5) * 1000:.1f} ms, "
+                             f"p95 {histogram.quantile(0.95) * 1000:.1f} ms")
+        lines.append(", ".join(f"{counter.replace('_', ' ')} {value}" for counter, value in self.counters.items()))
+        if self.gauges:
+            lines.append(", ".join(f"{gauge.replace('_', ' ')} {value:.2f}" for gauge, value in self.gauges.items()))
+        return "\n".join(lines)
+
+
+METRICS = Metrics()
+
+
+def process_uptime() -> float:
+    """
+    Returns the seconds since the process was started, including interpreter
+    startup and imports. Falls back to the time since this module was imported
+    where /proc is not available.
+    """
+    try:
+        with open(f"/proc/{os.getpid()}/stat") as f:
+            # The process name may contain spaces, the fields after it do not.
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            system_uptime = float(f.read().split()[0])
+        return system_uptime - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.monotonic() - METRICS.started
+
+
+class MetricsServer:
+    """
+    Serves the metrics in the Prometheus text format from a background thread.
+
+    Attributes:
+        metrics (Metrics): The metrics to serve.
+        server (ThreadingHTTPServer): The HTTP server, bound to localhost by default.
+    """
+    def __init__(self, metrics: Metrics = METRICS, port: int = 9108, host: str = "127.0.0.1"):
+        self.metrics = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path not in ("/", "/metrics"):
+                    handler.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode()
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/plain; version=0.0.4")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def start(self) -> "MetricsServer":
+        """
+        Starts serving in a daemon thread.
+        """
+        self._thread = threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True)
+        self._thread.start()
+        logging.info(f"Serving metrics on http://{self.server.server_address[0]}:{self.port}/metrics")
+        return self
+
+    def close(self):
+        """
+        Stops the server.
+        """
+        self.server.shutdown()
+        self.server.server_close()
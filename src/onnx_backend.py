@@ -0,0 +1,299 @@
+import os
+import cv2
+import glob
+import hashlib
+import logging
+import platform
+import numpy as np
+import onnxruntime as ort
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from src.metrics import METRICS
+from src.postprocess import DEFAULT_CLASS_THRESHOLDS, decode_predictions
+
+
+GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+class OnnxBackend:
+    """
+    Runs an exported YOLOv8 ONNX model directly through onnxruntime.
+
+    Attributes:
+        session (ort.InferenceSession): The onnxruntime session holding the model.
+        input_name (str): Name of the model input tensor.
+        input_size (Tuple[int, int]): The model input width and height, the upper bound for dynamic models.
+        dynamic_input (bool): Whether the model accepts any input size that is a multiple of the stride.
+        max_batch_size (Optional[int]): Fixed batch size of the model, None if the batch axis is dynamic.
+        class_thresholds (Dict[int, float]): Minimum score per class ID, other classes are dropped.
+        iou_threshold (float): IoU threshold used for non-maximum suppression.
+        cache_path (Optional[Path]): The cached optimized graph, None if caching is disabled.
+    """
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 graph_optimization_level: str = "all",
+                 class_thresholds: Optional[Dict[int, float]] = None, iou_threshold: float = 0.45,
+                 cache_dir: Optional[str] = None):
+        try:
+            self.cache_path = None
+            if cache_dir and graph_optimization_level != "disable":
+                self.cache_path = self.cached_model_path(model_path, graph_optimization_level, cache_dir)
+            self.session = self._create_session(model_path, intra_op_threads, inter_op_threads,
+                                                graph_optimization_level)
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            self.input_size = self._static_input_size(model_input.shape)
+            self.dynamic_input = not all(isinstance(axis, int) for axis in model_input.shape[2:])
+            batch_axis = model_input.shape[0]
+            self.max_batch_size = batch_axis if isinstance(batch_axis, int) else None
+            self.class_thresholds = dict(class_thresholds or DEFAULT_CLASS_THRESHOLDS)
+            self.iou_threshold = iou_threshold
+        except Exception as e:
+            logging.error(f"OnnxBackend initialization failed: {e}")
+            raise
+
+    @staticmethod
+    def cached_model_path(model_path: str, graph_optimization_level: str, cache_dir: str) -> Path:
+        """
+        Returns where the optimized graph of a model is cached.
+
+        The file name holds three digests: of the model's path, of its size and
+        modification time, and of the optimization level, onnxruntime version and CPU
+        architecture. A new model or an upgrade never loads a stale graph, and the
+        graphs of older versions of the same model file built the same way can be
+        told apart from those of other models, levels or onnxruntime builds.
+
+        Args:
+            model_path (str): The ONNX model.
+            graph_optimization_level (str): The optimization level the graph is built with.
+            cache_dir (str): Folder of the cached graphs.
+
+        Returns:
+            Path: The cached graph file.
+        """
+        model = Path(model_path).resolve()
+        stat = model.stat()
+        keys = (str(model), f"{stat.st_size}:{stat.st_mtime_ns}",
+                f"{graph_optimization_level}:{ort.__version__}:{platform.machine()}")
+        digests = ".".join(hashlib.sha1(key.encode()).hexdigest()[:8] for key in keys)
+        return Path(cache_dir) / f"{model.stem}.{digests}.optimized.onnx"
+
+    def _remove_stale_caches(self):
+        """
+        Deletes the cached graphs of older versions of the model file with the same build
+        key. Graphs of other models, optimization levels and onnxruntime builds are kept.
+        """
+        model_key, _, build_key = self.cache_path.name[:-len(".optimized.onnx")].rsplit(".", 2)
+        for stale in self.cache_path.parent.glob(f"{glob.escape(model_key)}.*.{build_key}.optimized.onnx"):
+            if stale != self.cache_path:
+                stale.unlink()
+
+    def _create_session(self, model_path: str, intra_op_threads: int, inter_op_threads: int,
+                        graph_optimization_level: str) -> ort.InferenceSession:
+        """
+        Creates the session, from the cached optimized graph when there is one.
+
+        Without a cached graph the model is optimized as usual and the result is saved
+        for the next start. A cached graph is loaded with optimizations disabled,
+        which skips the graph transformations on every boot after the first.
+        """
+        def session(path, level, optimized_path=None):
+            options = ort.SessionOptions()
+            options.intra_op_num_threads = intra_op_threads
+            options.inter_op_num_threads = inter_op_threads
+            options.graph_optimization_level = GRAPH_OPTIMIZATION_LEVELS[level]
+            if optimized_path:
+                options.optimized_model_filepath = optimized_path
+            return ort.InferenceSession(str(path), sess_options=options, providers=["CPUExecutionProvider"])
+
+        if self.cache_path is None:
+            return session(model_path, graph_optimization_level)
+
+        if self.cache_path.exists():
+            try:
+                loaded = session(self.cache_path, "disable")
+                logging.info(f"Loaded optimized model from {self.cache_path}")
+                return loaded
+            except Exception as e:
+                logging.warning(f"Ignoring unreadable optimized model {self.cache_path}: {e}")
+
+        partial = self.cache_path.with_suffix(f".{os.getpid()}.partial")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            created = session(model_path, graph_optimization_level, str(partial))
+            os.replace(partial, self.cache_path)
+            self._remove_stale_caches()
+            logging.info(f"Cached optimized model at {self.cache_path}")
+            return created
+        except Exception as e:
+            logging.warning(f"Could not cache the optimized model in {self.cache_path.parent}: {e}")
+            partial.unlink(missing_ok=True)
+            self.cache_path = None
+            return session(model_path, graph_optimization_level)
+
+    @staticmethod
+    def _static_input_size(shape, default: int = 640) -> Tuple[int, int]:
+        """
+        Reads the input width and height from the model input shape.
+
+        Args:
+            shape: The NCHW input shape reported by onnxruntime.
+            default (int): Size used for dynamic axes.
+
+        Returns:
+            Tuple[int, int]: The input width and height.
+        """
+        height, width = shape[2], shape[3]
+        height = height if isinstance(height, int) else default
+        width = width if isinstance(width, int) else default
+        return width, height
+
+    def target_size(self, image_shape: Tuple[int, int], stride: int = 32) -> Tuple[int, int]:
+        """
+        Picks the input size for an image.
+
+        Static models always use their input size. Dynamic models use the image size
+        rounded up to the stride, capped at the input size, so small crops run on
+        correspondingly small inputs.
+
+        Args:
+            image_shape (Tuple[int, int]): The image (height, width).
+            stride (int): The model stride.
+
+        Returns:
+            Tuple[int, int]: The input width and height.
+        """
+        if not self.dynamic_input:
+            return self.input_size
+
+        input_w, input_h = self.input_size
+        h, w = image_shape
+        ratio = min(input_w / w, input_h / h, 1.0)
+        return (int(np.ceil(w * ratio / stride) * stride),
+                int(np.ceil(h * ratio / stride) * stride))
+
+    def letterbox(self, image: np.ndarray, size: Optional[Tuple[int, int]] = None) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+        """
+        Resizes the image to the model input size keeping the aspect ratio and pads the rest.
+
+        Args:
+            image (np.ndarray): The RGB image to resize.
+            size (Optional[Tuple[int, int]]): Target width and height, defaults to the input size.
+
+        Returns:
+            tuple: The letterboxed image, the scale ratio and the (x, y) padding.
+        """
+        input_w, input_h = size or self.input_size
+        h, w = image.shape[:2]
+        ratio = min(input_w / w, input_h / h)
+        if self.dynamic_input:
+            # The target size was already rounded up from the image, only pad it.
+            ratio = min(ratio, 1.0)
+        new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+
+        if (new_w, new_h) != (w, h):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+        pad_x, pad_y = (input_w - new_w) / 2, (input_h - new_h) / 2
+        top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+        left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+        image = cv2.copyMakeBorder(image, top, bottom, left, right, cv2.BORDER_CONSTANT,
+                                   value=(114, 114, 114))
+        return image, ratio, (left, top)
+
+    def preprocess(self, image: np.ndarray) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+        """
+        Converts an RGB image into the NCHW float32 blob expected by the model.
+
+        Frames are RGB throughout, which is the channel order the model was trained
+        on, so the channels are passed through unchanged.
+
+        Args:
+            image (np.ndarray): The RGB image to process.
+
+        Returns:
+            tuple: The input blob, the scale ratio and the (x, y) padding.
+        """
+        if image.ndim == 3 and image.shape[2] == 4:
+            image = image[:, :, :3]
+        padded, ratio, pad = self.letterbox(image, self.target_size(image.shape[:2]))
+        blob = cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=False)
+        return blob, ratio, pad
+
+    def infer(self, blob: np.ndarray) -> np.ndarray:
+        """
+        Runs the model on a preprocessed blob.
+
+        Args:
+            blob (np.ndarray): The NCHW float32 input.
+
+        Returns:
+            np.ndarray: The raw model output of shape (batch, 4 + classes, anchors).
+        """
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def postprocess(self, output: np.ndarray, ratio: float, pad: Tuple[float, float],
+                    image_shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Decodes the raw output of a single image into boxes in original image coordinates.
+
+        Args:
+            output (np.ndarray): Raw model output of shape (4 + classes, anchors).
+            ratio (float): The letterbox scale ratio.
+            pad (Tuple[float, float]): The letterbox (x, y) padding.
+            image_shape (Optional[Tuple[int, int]]): Original (height, width) used to clip boxes.
+
+        Returns:
+            np.ndarray: Array of shape (N, 6) holding x1, y1, x2, y2, score, class_id.
+        """
+        return decode_predictions(output, self.class_thresholds, self.iou_threshold,
+                                  ratio, pad, image_shape)
+
+    def predict(self, image: np.ndarray) -> np.ndarray:
+        """
+        Runs preprocessing, inference and postprocessing on a single image.
+
+        Args:
+            image (np.ndarray): The RGB image to process.
+
+        Returns:
+            np.ndarray: Array of shape (N, 6) holding x1, y1, x2, y2, score, class_id.
+        """
+        with METRICS.timer("preprocess"):
+            blob, ratio, pad = self.preprocess(image)
+        with METRICS.timer("inference"):
+            output = self.infer(blob)
+        with METRICS.timer("postprocess"):
+            return self.postprocess(output[0], ratio, pad, image.shape[:2])
+
+    def predict_batch(self, images: List[np.ndarray]) -> List[np.ndarray]:
+        """
+        Runs several images through the model in as few inference calls as the model allows.
+
+        Models exported with a dynamic batch axis run all images in one call, models
+        with a fixed batch size run in chunks of that size.
+
+        Args:
+            images (List[np.ndarray]): The RGB images to process.
+
+        Returns:
+            List[np.ndarray]: Per-image arrays of shape (N, 6) holding x1, y1, x2, y2, score, class_id.
+        """
+        if len(images) == 0:
+            return []
+
+        with METRICS.timer("preprocess"):
+            prepared = [self.preprocess(image) for image in images]
+            blob = np.concatenate([blob for blob, _, _ in prepared])
+
+        with METRICS.timer("inference"):
+            chunk = self.max_batch_size or len(images)
+            outputs = np.concatenate([self.infer(blob[i:i + chunk]) for i in range(0, len(images), chunk)])
+
+        with METRICS.timer("postprocess"):
+            return [self.postprocess(output, ratio, pad, image.shape[:2])
+                    for output, (_, ratio, pad), image in zip(outputs, prepared, images)]
@@ -0,0 +1,116 @@
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+CAT_CLASS_ID = 15
+PERSON_CLASS_ID = 0
+DEFAULT_CLASS_THRESHOLDS = {CAT_CLASS_ID: 0.25, PERSON_CLASS_ID: 0.25}
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """
+    Greedy non-maximum suppression over xyxy boxes.
+
+    Args:
+        boxes (np.ndarray): Array of shape (N, 4) holding x1, y1, x2, y2.
+        scores (np.ndarray): Array of shape (N,) holding the box scores.
+        iou_threshold (float): Boxes overlapping a kept box above this IoU are dropped.
+
+    Returns:
+        np.ndarray: Indices of the kept boxes, sorted by descending score.
+    """
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+
+        order = rest[iou <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.int64)
+
+
+def filter_detections(detections: np.ndarray, class_thresholds: Dict[int, float]) -> np.ndarray:
+    """
+    Keeps only detections of the given classes scoring above their class threshold.
+
+    Args:
+        detections (np.ndarray): Array of shape (N, 6) holding x1, y1, x2, y2, score, class_id.
+        class_thresholds (Dict[int, float]): Minimum score per class ID.
+
+    Returns:
+        np.ndarray: The kept detections, sorted by descending score.
+    """
+    class_ids = np.fromiter(class_thresholds.keys(), dtype=np.float32)
+    thresholds = np.fromiter(class_thresholds.values(), dtype=np.float32)
+
+    matches = detections[:, 5:6] == class_ids
+    keep = matches.any(axis=1)
+    keep[keep] = detections[keep, 4] >= thresholds[matches[keep].argmax(axis=1)]
+
+    detections = detections[keep]
+    return detections[detections[:, 4].argsort()[::-1]]
+
+
+def decode_predictions(output: np.ndarray, class_thresholds: Dict[int, float] = DEFAULT_CLASS_THRESHOLDS,
+                       iou_threshold: float = 0.45, ratio: float = 1.0,
+                       pad: Tuple[float, float] = (0, 0),
+                       image_shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Decodes a raw YOLOv8 output for one image into class-filtered, NMS-ed detections.
+
+    Only the score rows of the requested classes are read, so the remaining classes
+    never take part in thresholding or NMS.
+
+    Args:
+        output (np.ndarray): Raw model output of shape (4 + classes, anchors).
+        class_thresholds (Dict[int, float]): Minimum score per class ID to keep.
+        iou_threshold (float): IoU threshold for per-class NMS.
+        ratio (float): The letterbox scale ratio.
+        pad (Tuple[float, float]): The letterbox (x, y) padding.
+        image_shape (Optional[Tuple[int, int]]): Original (height, width) used to clip boxes.
+
+    Returns:
+        np.ndarray: Array of shape (N, 6) holding x1, y1, x2, y2, score, class_id,
+                    sorted by descending score.
+    """
+    class_ids = np.fromiter(class_thresholds.keys(), dtype=np.int64)
+    thresholds = np.fromiter(class_thresholds.values(), dtype=np.float32)
+
+    scores = output[4 + class_ids]
+    best = scores.argmax(axis=0)
+    confidences = np.take_along_axis(scores, best[None, :], axis=0)[0]
+
+    keep = confidences >= thresholds[best]
+    if not np.any(keep):
+        return np.empty((0, 6), dtype=np.float32)
+
+    cx, cy, w, h = output[:4, keep]
+    confidences = confidences[keep]
+    labels = class_ids[best[keep]]
+
+    boxes = np.stack((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2), axis=1)
+
+    # Offsetting each class by more than the image size makes one NMS pass class-aware.
+    offsets = labels[:, None] * (boxes.max() + 1)
+    indices = nms(boxes + offsets, confidences, iou_threshold)
+
+    boxes = boxes[indices]
+    boxes[:, [0, 2]] = (boxes[:, [0, 2]] - pad[0]) / ratio
+    boxes[:, [1, 3]] = (boxes[:, [1, 3]] - pad[1]) / ratio
+
+    if image_shape is not None:
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, image_shape[1])
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, image_shape[0])
+
+    return np.column_stack((boxes, confidences[indices], labels[indices])).astype(np.float32)
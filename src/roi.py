@@ -0,0 +1,132 @@
+import cv2
+import numpy as np
+from typing import List, Sequence, Tuple
+
+
+class RegionOfInterest:
+    """
+    One or more polygons in frame coordinates that detection is restricted to.
+
+    Frames are cropped to the bounding box of all regions before inference, boxes
+    are mapped back to full-frame coordinates, and boxes whose center falls
+    outside every region are dropped.
+
+    Attributes:
+        polygons (List[np.ndarray]): The regions as (N, 2) int32 point arrays.
+        bounds (Tuple[int, int, int, int]): The x1, y1, x2, y2 crop covering all regions.
+    """
+    def __init__(self, regions: Sequence[Sequence]):
+        """
+        Args:
+            regions (Sequence[Sequence]): Rectangles given as (x1, y1, x2, y2) or
+                                          polygons given as a sequence of (x, y) points.
+        """
+        if not regions:
+            raise ValueError("A region of interest needs at least one region")
+
+        self.polygons = [self._to_polygon(region) for region in regions]
+        points = np.concatenate(self.polygons)
+        x1, y1 = points.min(axis=0)
+        x2, y2 = points.max(axis=0)
+        self.bounds = (int(x1), int(y1), int(x2), int(y2))
+        self._mask = None
+
+    @staticmethod
+    def _to_polygon(region) -> np.ndarray:
+        """
+        Converts a rectangle or polygon to an (N, 2) int32 point array.
+        """
+        region = np.asarray(region, dtype=np.float32)
+        if region.ndim == 1 and len(region) == 4:
+            x1, y1, x2, y2 = region
+            region = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+        if region.ndim != 2 or region.shape[1] != 2 or len(region) < 3:
+            raise ValueError(f"Invalid region of interest: {region.tolist()}")
+        return np.round(region).astype(np.int32)
+
+    @classmethod
+    def parse(cls, spec: str) -> "RegionOfInterest":
+        """
+        Parses regions from a string such as "100,50,400,300;10,10 200,10 200,200".
+
+        Regions are separated by ';'. A region of four comma-separated numbers is a
+        rectangle, otherwise it is a space-separated list of x,y points.
+
+        Args:
+            spec (str): The region specification.
+
+        Returns:
+            RegionOfInterest: The parsed regions.
+        """
+        regions = []
+        for region in filter(None, (part.strip() for part in spec.split(";"))):
+            if " " in region:
+                regions.append([tuple(map(float, point.split(","))) for point in region.split()])
+            else:
+                regions.append(tuple(map(float, region.split(","))))
+        return cls(regions)
+
+    def crop(self, image: np.ndarray) -> Tuple[np.ndarray, Tuple[int, int]]:
+        """
+        Crops the image to the bounding box of all regions.
+
+        Args:
+            image (np.ndarray): The full frame.
+
+        Returns:
+            tuple: A view of the cropped image and its (x, y) offset in the frame.
+        """
+        h, w = image.shape[:2]
+        x1, y1, x2, y2 = self.bounds
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        return image[y1:y2, x1:x2], (x1, y1)
+
+    def _region_mask(self, frame_shape: Tuple[int, int]) -> np.ndarray:
+        """
+        Returns a cached boolean mask of the regions for the given frame size.
+        """
+        if self._mask is None or self._mask.shape != frame_shape:
+            mask = np.zeros(frame_shape, dtype=np.uint8)
+            cv2.fillPoly(mask, self.polygons, 1)
+            self._mask = mask.astype(bool)
+        return self._mask
+
+    def to_frame(self, detections: np.ndarray, offset: Tuple[int, int],
+                 frame_shape: Tuple[int, int]) -> np.ndarray:
+        """
+        Maps detections from crop to frame coordinates and drops those outside the regions.
+
+        Args:
+            detections (np.ndarray): Array of shape (N, 6) in crop coordinates.
+            offset (Tuple[int, int]): The (x, y) offset returned by crop().
+            frame_shape (Tuple[int, int]): The full frame (height, width).
+
+        Returns:
+            np.ndarray: The detections inside the regions, in frame coordinates.
+        """
+        if len(detections) == 0:
+            return detections
+
+        detections = detections.copy()
+        detections[:, [0, 2]] += offset[0]
+        detections[:, [1, 3]] += offset[1]
+
+        mask = self._region_mask(frame_shape)
+        cx = ((detections[:, 0] + detections[:, 2]) / 2).astype(np.int64).clip(0, frame_shape[1] - 1)
+        cy = ((detections[:, 1] + detections[:, 3]) / 2).astype(np.int64).clip(0, frame_shape[0] - 1)
+        return detections[mask[cy, cx]]
+
+    def draw(self, image: np.ndarray, color: Tuple[int, int, int] = (0, 255, 0)) -> np.ndarray:
+        """
+        Draws the region outlines on the image in place, useful for setting up the regions.
+
+        Args:
+            image (np.ndarray): The image to draw on.
+            color (Tuple[int, int, int]): The outline color.
+
+        Returns:
+            np.ndarray: The same image.
+        """
+        cv2.polylines(image, self.polygons, True, color, 2)
+        return image
@@ -0,0 +1,165 @@
+import math
+import datetime
+import numpy as np
+from typing import Iterable, Optional
+
+
+class VisitHistogram:
+    """
+    How likely a visit is at each time of day, learned from past visit timestamps.
+
+    Attributes:
+        bins (int): Number of time-of-day bins, 48 gives half-hour bins.
+        counts (np.ndarray): Visits per bin.
+    """
+    def __init__(self, bins: int = 48):
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.float64)
+
+    @classmethod
+    def from_timestamps(cls, timestamps: Iterable[float], bins: int = 48) -> "VisitHistogram":
+        """
+        Builds a histogram from UNIX timestamps of past visits.
+        """
+        histogram = cls(bins)
+        for timestamp in timestamps:
+            histogram.add(timestamp)
+        return histogram
+
+    def _bin(self, timestamp: float) -> int:
+        moment = datetime.datetime.fromtimestamp(timestamp)
+        seconds = moment.hour * 3600 + moment.minute * 60 + moment.second
+        return seconds * self.bins // 86400
+
+    def add(self, timestamp: float):
+        """
+        Records a visit.
+        """
+        self.counts[self._bin(timestamp)] += 1
+
+    def likelihood(self, timestamp: float) -> float:
+        """
+        Relative visit likelihood at a time of day, 1 in the busiest bin.
+
+        Counts are smoothed with the neighbouring bins so that a visit shortly
+        before or after the usual time is still expected. Without any history
+        every time of day is 0.5.
+
+        Args:
+            timestamp (float): UNIX timestamp.
+
+        Returns:
+            float: Likelihood between 0 and 1.
+        """
+        if not self.counts.any():
+            return 0.5
+        smoothed = 0.5 * self.counts + 0.25 * np.roll(self.counts, 1) + 0.25 * np.roll(self.counts, -1)
+        return float(smoothed[self._bin(timestamp)] / smoothed.max())
+
+
+class Scheduler:
+    """
+    Base class for deciding how long to wait before the next detection cycle.
+
+    Every scheduler pauses for `cooldown` seconds after a confirmed visit, so the
+    same visit is not notified twice.
+
+    Attributes:
+        cooldown (float): Seconds without detection cycles after a visit.
+        last_visit (float): Timestamp of the last confirmed visit.
+    """
+    def __init__(self, cooldown: float = 7200):
+        self.cooldown = cooldown
+        self.last_visit = -math.inf
+
+    def record_cycle(self, now: float, motion: bool, decision: Optional[str]):
+        """
+        Reports the outcome of a detection cycle.
+
+        Args:
+            now (float): UNIX timestamp at the end of the cycle.
+            motion (bool): Whether any frame of the cycle showed motion.
+            decision (Optional[str]): 'cat' or 'person' if a visit was confirmed and notified.
+        """
+        if decision in ("cat", "person"):
+            self.last_visit = now
+
+    def update_visits(self, timestamps: Iterable[float]):
+        """
+        Replaces the visit history the scheduler learns from. Ignored by default.
+        """
+
+    def next_delay(self, now: float) -> float:
+        """
+        Returns the number of seconds to wait before the next cycle.
+        """
+        return max(0.0, self.last_visit + self.cooldown - now)
+
+
+class FixedScheduler(Scheduler):
+    """
+    Runs a cycle every `interval` seconds, like the original detection loop.
+
+    Attributes:
+        interval (float): Seconds between cycles.
+    """
+    def __init__(self, interval: float = 30, cooldown: float = 7200):
+        super().__init__(cooldown)
+        self.interval = interval
+
+    def next_delay(self, now: float) -> float:
+        return max(self.interval, super().next_delay(now))
+
+
+class AdaptiveScheduler(Scheduler):
+    """
+    Samples quickly when a visit is likely and backs off when it is not.
+
+    The likelihood is 1 while motion was seen within `motion_window` seconds and
+    otherwise comes from the time-of-day visit histogram. The interval moves
+    geometrically from `max_interval` at likelihood 0 to `min_interval` at
+    likelihood 1, so busy times get the short interval and quiet nights the long one.
+
+    Attributes:
+        min_interval (float): Shortest interval between cycles.
+        max_interval (float): Longest interval between cycles.
+        motion_window (float): Seconds after motion during which the shortest interval is used.
+        histogram (VisitHistogram): The learned visit times.
+        last_motion (float): Timestamp of the last cycle with motion.
+    """
+    def __init__(self, min_interval: float = 10, max_interval: float = 300, motion_window: float = 300,
+                 cooldown: float = 7200, histogram: Optional[VisitHistogram] = None):
+        super().__init__(cooldown)
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(f"Invalid scheduler bounds: {min_interval} to {max_interval} s")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.motion_window = motion_window
+        self.histogram = histogram or VisitHistogram()
+        self.last_motion = -math.inf
+
+    def record_cycle(self, now: float, motion: bool, decision: Optional[str]):
+        super().record_cycle(now, motion, decision)
+        if motion:
+            self.last_motion = now
+
+    def update_visits(self, timestamps: Iterable[float]):
+        self.histogram = VisitHistogram.from_timestamps(timestamps, self.histogram.bins)
+
+    def likelihood(self, now: float) -> float:
+        """
+        Returns how likely a visit is right now, between 0 and 1.
+        """
+        if now - self.last_motion <= self.motion_window:
+            return 1.0
+        return self.histogram.likelihood(now)
+
+    def next_delay(self, now: float) -> float:
+        interval = self.max_interval * (self.min_interval / self.max_interval) ** self.likelihood(now)
+        return max(interval, super().next_delay(now))
+
+
+SCHEDULERS = {
+    "fixed": FixedScheduler,
+    "adaptive": AdaptiveScheduler,
+}
@@ -1,81 +1,299 @@
-import cv2
 import logging
-import telegram
-import numpy as np
 import asyncio
-from typing import Optional
-from src.camera import Camera
+import datetime
+import numpy as np
+from concurrent.futures import Executor
+from typing import TYPE_CHECKING, List, Optional, Sequence, Union
+from telegram import InputMediaPhoto
+from telegram.error import NetworkError, RetryAfter, TelegramError
+from src.frame_artifact import FrameArtifact
+from src.metrics import METRICS
+
+if TYPE_CHECKING:
+    # Only for annotations, importing the camera at runtime would load picamera2.
+    from src.camera import Camera
+
+# Telegram accepts at most 10 photos per album.
+MAX_ALBUM_SIZE = 10
 
 
 class TelegramNotifier:
     """
     Class to handle Telegram notifications.
 
+    Sending never blocks the caller: notifications are put on a bounded queue and
+    sent by run(), which shares the application's bot and its connection pool.
+    Notifications that arrive within `coalesce_window` of each other are merged,
+    consecutive photos into one album and consecutive messages into one text.
+    Calls are spaced by at least `min_interval` and retried with exponential
+    backoff on network errors, or after the delay Telegram asks for when rate limited.
+
     Attributes:
-        bot (telegram.Bot): Telegram bot instance.
-        bhat_id (str): The chat ID for sending notifications.
+        bot (telegram.Bot): The shared bot instance.
+        chat_id (str): The chat ID for sending notifications.
+        min_interval (float): Minimum seconds between two API calls.
+        coalesce_window (float): Seconds to wait for more notifications to merge.
+        max_retries (int): Retries per API call before the notification is dropped.
+        backoff (float): Delay before the first retry, doubled on every further retry.
+        stats (dict): Number of sent, dropped and retried API calls.
     """
-    def __init__(self, bot_token: str, chat_id: str):
+    def __init__(self, bot, chat_id: str, maxsize: int = 32, min_interval: float = 1.0,
+                 coalesce_window: float = 1.0, max_retries: int = 3, backoff: float = 2.0):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.min_interval = min_interval
+        self.coalesce_window = coalesce_window
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.stats = {"sent": 0, "dropped": 0, "retries": 0}
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._last_call = float("-inf")
+
+
+    def _enqueue(self, kind: str, photos: List[tuple], text: Optional[str]) -> bool:
+        """
+        Queues a notification without waiting.
+
+        Returns:
+            bool: False if the notification was dropped because the queue is full.
+        """
         try:
-            self.bot = telegram.Bot(token=bot_token)
-            self.chat_id = chat_id
-        except Exception as e:
-            logging.error(f"TelegramNotifier initialization failed: {e}")
-            raise
+            self._queue.put_nowait((kind, photos, text))
+            return True
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logging.warning(f"Telegram queue full, dropped {kind}")
+            return False
 
 
-    def send_message(self, message: str):
+    def send_message(self, message: str) -> bool:
         """
-        Sends a text message via Telegram.
+        Queues a text message.
 
         Args:
             message (str): The message to send.
+
+        Returns:
+            bool: False if the message was dropped because the queue is full.
         """
-        try:
-            self.bot.send_message(chat_id=self.chat_id, text=message)
-        except Exception as e:
-            logging.error(f"Error sending message: {e}")
+        return self._enqueue("message", [], message)
 
 
-    def send_photo(self, image: np.ndarray, caption: Optional[str] = None):
+    def send_photo(self, image: Union[FrameArtifact, np.ndarray], caption: Optional[str] = None,
+                   variant: str = "annotated") -> bool:
         """
-        Sends a photo via Telegram.
+        Queues a photo. It is encoded on the executor when sent, reusing the
+        frame's JPEG bytes if they were already encoded.
 
         Args:
-            image (np.ndarray): The image to send.
+            image (Union[FrameArtifact, np.ndarray]): The frame or RGB image to send.
             caption (Optional[str]): The caption for the photo.
+            variant (str): The FrameArtifact variant to send.
+
+        Returns:
+            bool: False if the photo was dropped because the queue is full.
         """
-        try:
-            _, img_encoded = cv2.imencode(".jpg", image)
-            self.bot.send_photo(chat_id=self.chat_id, photo=img_encoded.tobytes(), caption=caption)
-        except Exception as e:
-            logging.error(f"Error sending photo: {e}")
+        if not isinstance(image, FrameArtifact):
+            image = FrameArtifact(image)
+        return self._enqueue("photo", [(image, variant)], caption)
 
 
-    async def send_error_message(self, error_message: str):
+    def send_album(self, frames: Sequence[FrameArtifact], caption: Optional[str] = None) -> bool:
         """
-        Sends an error message via Telegram.
+        Queues several annotated frames to be sent as one album.
+
+        Args:
+            frames (Sequence[FrameArtifact]): The frames, best first.
+            caption (Optional[str]): The caption of the album.
+
+        Returns:
+            bool: False if the album was dropped because the queue is full.
+        """
+        return self._enqueue("photo", [(frame, "annotated") for frame in frames[:MAX_ALBUM_SIZE]], caption)
+
+
+    def send_video(self, path: str, caption: Optional[str] = None) -> bool:
+        """
+        Queues a video file, such as an event clip. Videos are never merged with other notifications.
+
+        Args:
+            path (str): The video file.
+            caption (Optional[str]): The caption for the video.
+
+        Returns:
+            bool: False if the video was dropped because the queue is full.
+        """
+        return self._enqueue("video", [path], caption)
+
+
+    def send_error_message(self, error_message: str) -> bool:
+        """
+        Queues an error message.
 
         Args:
             error_message (str): The error message to send.
         """
-        try:
-            await self.bot.send_message(chat_id=self.chat_id, text=error_message)
-        except Exception as e:
-            logging.error(f"Error sending error message via Telegram: {e}")
+        return self.send_message(error_message)
 
 
-    async def send_current_frame(self, camera: Camera):
+    async def send_current_frame(self, camera: "Camera", executor: Optional[Executor] = None, detector=None):
         """
         Captures the current frame from the camera and sends it as a photo.
         Meant to be a test function.
 
         Args:
             camera (Camera): The camera object to capture the frame.
+            executor (Optional[Executor]): Executor to capture on, so the capture does not
+                                           block the event loop. Defaults to the loop's executor.
+            detector (Optional[CatDetector]): If given, the frame is also run through it and sent
+                                              with its boxes and scores.
         """
         try:
-            img = camera.capture_frame()
-            await asyncio.get_running_loop().run_in_executor(None, lambda: self.send_photo(img, "Current Frame"))
+            loop = asyncio.get_running_loop()
+            img = await loop.run_in_executor(executor, camera.capture_frame)
+            if detector is None:
+                self.send_photo(img, "Current Frame", variant="original")
+                return
+
+            # Runs on the default executor, so /test does not wait for the detection loop.
+            detections = await loop.run_in_executor(None, detector.detect, img)
+            scores = detector.scores(detections)
+            caption = f"Current Frame (cat {scores['cat']:.2f}, person {scores['person']:.2f})"
+            self.send_photo(FrameArtifact(img, detector.classify(detections), detections), caption)
         except Exception as e:
             logging.error(f"Error in capturing/sending current frame: {e}")
-            await self.send_message("Error: Unable to capture and send current frame")
+            self.send_message("Error: Unable to capture and send current frame")
+
+
+    async def run(self):
+        """
+        Sends queued notifications until cancelled.
+        """
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                await self._collect(batch)
+                for kind, photos, text in self._coalesce(batch):
+                    if kind == "message":
+                        await self._call(self.bot.send_message, chat_id=self.chat_id, text=text)
+                    elif kind == "video":
+                        await self._send_video(photos[0], text)
+                    else:
+                        await self._send_photos(photos, text)
+            except Exception as e:
+                logging.error(f"Error sending Telegram notification: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+
+    async def flush(self):
+        """
+        Waits until every queued notification has been sent or dropped.
+        """
+        await self._queue.join()
+
+
+    async def _collect(self, batch: list):
+        """
+        Adds notifications arriving within the coalesce window to the batch.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.coalesce_window
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                return
+
+
+    @staticmethod
+    def _coalesce(batch: list) -> list:
+        """
+        Merges consecutive photos into albums of up to MAX_ALBUM_SIZE and consecutive messages into one.
+        """
+        merged = []
+        for kind, photos, text in batch:
+            if (merged and kind != "video" and merged[-1][0] == kind
+                    and len(merged[-1][1]) + len(photos) <= MAX_ALBUM_SIZE):
+                _, previous_photos, previous_text = merged[-1]
+                texts = [t for t in (previous_text, text) if t]
+                merged[-1] = (kind, previous_photos + photos, "\n".join(dict.fromkeys(texts)) or None)
+            else:
+                merged.append((kind, list(photos), text))
+        return merged
+
+
+    async def _send_photos(self, photos: list, caption: Optional[str]):
+        """
+        Encodes photos off the event loop and sends them as one photo or album.
+        """
+        loop = asyncio.get_running_loop()
+        encoded = [await loop.run_in_executor(None, frame.jpeg, variant) for frame, variant in photos]
+        if len(encoded) == 1:
+            await self._call(self.bot.send_photo, chat_id=self.chat_id, photo=encoded[0], caption=caption)
+        else:
+            media = [InputMediaPhoto(media=data, caption=caption if i == 0 else None) for i, data in enumerate(encoded)]
+            await self._call(self.bot.send_media_group, chat_id=self.chat_id, media=media)
+
+
+    async def _send_video(self, path: str, caption: Optional[str]):
+        """
+        Reads a video file off the event loop and sends it.
+        """
+        with open(path, "rb") as f:
+            data = await asyncio.get_running_loop().run_in_executor(None, f.read)
+        await self._call(self.bot.send_video, chat_id=self.chat_id, video=data, caption=caption,
+                         supports_streaming=True)
+
+
+    async def _call(self, method, **kwargs):
+        """
+        Calls a bot method with rate limiting and retries.
+
+        Returns:
+            The method's result, or None if it failed for good.
+        """
+        loop = asyncio.get_running_loop()
+        name = getattr(method, "__name__", "call")
+        for attempt in range(self.max_retries + 1):
+            wait = self._last_call + self.min_interval - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._last_call = loop.time()
+
+            try:
+                with METRICS.timer("telegram_send"):
+                    result = await method(**kwargs)
+                self.stats["sent"] += 1
+                METRICS.inc("notifications_sent")
+                return result
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                delay = retry_after.total_seconds() if isinstance(retry_after, datetime.timedelta) else float(retry_after)
+                error = e
+            except NetworkError as e:
+                delay = self.backoff * 2 ** attempt
+                error = e
+            except TelegramError as e:
+                logging.error(f"Telegram rejected {name}: {e}")
+                self.stats["dropped"] += 1
+                return None
+
+            if attempt == self.max_retries:
+                break
+            self.stats["retries"] += 1
+            logging.warning(f"Telegram {name} failed ({error}), retrying in {delay:.1f} s")
+            await asyncio.sleep(delay)
+
+        logging.error(f"Giving up on Telegram {name} after {self.max_retries + 1} attempts: {error}")
+        self.stats["dropped"] += 1
+        return None
@@ -0,0 +1,156 @@
+import os
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+from src.metrics import METRICS
+
+
+# From full quality to the lightest setting. input_scale shrinks the frames passed
+# to the detector, which only has an effect with ultralytics and dynamic ONNX models,
+# batch_size caps the burst size and frame_interval is the minimum number of seconds
+# between two captured frames.
+QUALITY_LEVELS = (
+    {"input_scale": 1.0, "batch_size": 5, "frame_interval": 0.0},
+    {"input_scale": 0.75, "batch_size": 3, "frame_interval": 0.25},
+    {"input_scale": 0.5, "batch_size": 2, "frame_interval": 0.5},
+    {"input_scale": 0.5, "batch_size": 1, "frame_interval": 1.0},
+)
+
+# SoC temperatures in degrees Celsius at which each level above the first starts.
+# The Pi 5 firmware starts throttling at 80 and caps hard at 85.
+DEFAULT_THRESHOLDS = (65.0, 72.0, 78.0)
+
+
+class ThermalGovernor:
+    """
+    Steps the detection quality down as the Pi heats up, before the firmware throttles it.
+
+    The level is chosen from the SoC temperature, with a hysteresis so it does not
+    flap around a threshold. A CPU clock capped well below the hardware maximum
+    means the kernel is already throttling, and a load average above the number of
+    cores means the pipeline falls behind; both raise the level by one on top of
+    the temperature. The cap is used rather than the current clock, which also
+    drops whenever the cpufreq governor idles the CPU.
+
+    All readings come from files below `root`, so tests can point it at a fake sysfs tree.
+
+    Attributes:
+        levels (Sequence[dict]): Quality settings, from full quality to the lightest.
+        thresholds (Sequence[float]): Temperatures at which the levels above the first start.
+        hysteresis (float): Degrees below a threshold before its level is left again.
+        max_batch_size (int): Configured burst size, which the levels only ever reduce.
+        throttled_ratio (float): Clock cap, as a fraction of the maximum, below which the CPU counts as throttled.
+        max_load (float): Load average per core above which the CPU counts as overloaded.
+        thermal_zone (int): The thermal zone of the SoC.
+        level (int): The current level.
+    """
+    def __init__(self, root: str = "/", levels: Sequence[dict] = QUALITY_LEVELS,
+                 thresholds: Sequence[float] = DEFAULT_THRESHOLDS, hysteresis: float = 3.0,
+                 max_batch_size: int = 5, throttled_ratio: float = 0.8, max_load: float = 1.0,
+                 thermal_zone: int = 0):
+        if len(thresholds) != len(levels) - 1:
+            raise ValueError(f"Expected {len(levels) - 1} thresholds for {len(levels)} levels, got {len(thresholds)}")
+        self.root = Path(root)
+        self.levels = levels
+        self.thresholds = thresholds
+        self.hysteresis = hysteresis
+        self.max_batch_size = max_batch_size
+        self.throttled_ratio = throttled_ratio
+        self.max_load = max_load
+        self.thermal_zone = thermal_zone
+        self.level = 0
+        self._temperature_level = 0
+
+    def _read(self, relative_path: str) -> Optional[str]:
+        try:
+            return (self.root / relative_path).read_text().strip()
+        except OSError:
+            return None
+
+    def read_temperature(self) -> Optional[float]:
+        """
+        Returns the SoC temperature in degrees Celsius, None if it cannot be read.
+        """
+        value = self._read(f"sys/class/thermal/thermal_zone{self.thermal_zone}/temp")
+        return int(value) / 1000 if value else None
+
+    def read_frequency(self) -> Optional[float]:
+        """
+        Returns the current CPU clock in MHz, None if it cannot be read.
+        """
+        value = self._read("sys/devices/system/cpu/cpu0/cpufreq/scaling_cur_freq")
+        return int(value) / 1000 if value else None
+
+    def read_frequency_ratio(self) -> Optional[float]:
+        """
+        Returns the allowed CPU clock as a fraction of the hardware maximum, None if it cannot be read.
+        """
+        allowed = self._read("sys/devices/system/cpu/cpu0/cpufreq/scaling_max_freq")
+        maximum = self._read("sys/devices/system/cpu/cpu0/cpufreq/cpuinfo_max_freq")
+        if not allowed or not maximum:
+            return None
+        return int(allowed) / int(maximum)
+
+    def read_load(self) -> Optional[float]:
+        """
+        Returns the one minute load average per CPU core, None if it cannot be read.
+        """
+        value = self._read("proc/loadavg")
+        return float(value.split()[0]) / (os.cpu_count() or 1) if value else None
+
+    def update(self) -> int:
+        """
+        Reads the sensors and moves to the matching level.
+
+        Returns:
+            int: The new level.
+        """
+        temperature = self.read_temperature()
+        frequency_ratio = self.read_frequency_ratio()
+        load = self.read_load()
+
+        if temperature is not None:
+            level = self._temperature_level
+            while level < len(self.thresholds) and temperature >= self.thresholds[level]:
+                level += 1
+            while level > 0 and temperature < self.thresholds[level - 1] - self.hysteresis:
+                level -= 1
+            self._temperature_level = level
+            METRICS.set("soc_temperature_celsius", temperature)
+        frequency = self.read_frequency()
+        if frequency is not None:
+            METRICS.set("cpu_frequency_mhz", frequency)
+
+        stressed = ((frequency_ratio is not None and frequency_ratio < self.throttled_ratio)
+                    or (load is not None and load > self.max_load))
+        level = min(self._temperature_level + int(stressed), len(self.levels) - 1)
+
+        if level != self.level:
+            logging.warning(f"Quality level {self.level} -> {level} (temperature {temperature} C, "
+                            f"clock ratio {frequency_ratio}, load {load})")
+            METRICS.inc("quality_level_changes")
+            self.level = level
+        METRICS.set("quality_level", level)
+        return level
+
+    @property
+    def settings(self) -> Dict[str, float]:
+        """
+        The settings of the current level, with the burst size capped by the configured one.
+        """
+        settings = dict(self.levels[self.level])
+        settings["batch_size"] = max(1, min(self.max_batch_size, settings["batch_size"]))
+        return settings
+
+    def apply(self, detector, worker):
+        """
+        Applies the current level to the detector and the detection worker.
+
+        Args:
+            detector (CatDetector): Gets the input scale.
+            worker (DetectionWorker): Gets the burst size and the frame interval.
+        """
+        settings = self.settings
+        detector.input_scale = settings["input_scale"]
+        worker.batch_size = settings["batch_size"]
+        worker.frame_interval = settings["frame_interval"]
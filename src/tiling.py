@@ -0,0 +1,211 @@
+import cv2
+import logging
+import numpy as np
+from typing import List, Optional, Sequence, Tuple
+from src.metrics import METRICS
+from src.postprocess import nms
+
+
+def tile_grid(frame_shape: Tuple[int, int], tile_size: int = 640, overlap: float = 0.2) -> List[Tuple[int, int, int, int]]:
+    """
+    Splits a frame into overlapping square tiles of one size.
+
+    The last row and column are aligned to the frame edge, so every tile lies
+    completely inside the frame and all tiles can be inferred as one batch.
+
+    Args:
+        frame_shape (Tuple[int, int]): The frame (height, width).
+        tile_size (int): Edge length of the tiles, clipped to the frame size.
+        overlap (float): Fraction of a tile shared with its neighbour.
+
+    Returns:
+        List[Tuple[int, int, int, int]]: The tiles as x1, y1, x2, y2, row by row.
+    """
+    if not 0.0 <= overlap < 1.0:
+        raise ValueError(f"Tile overlap must be in [0, 1), got {overlap}")
+
+    def starts(length: int) -> Tuple[List[int], int]:
+        size = min(tile_size, length)
+        stride = max(1, int(size * (1.0 - overlap)))
+        positions = list(range(0, length - size + 1, stride))
+        if positions[-1] != length - size:
+            positions.append(length - size)
+        return positions, size
+
+    ys, tile_h = starts(frame_shape[0])
+    xs, tile_w = starts(frame_shape[1])
+    return [(x, y, x + tile_w, y + tile_h) for y in ys for x in xs]
+
+
+def tiles_with_motion(tiles: Sequence[Tuple[int, int, int, int]], frame_shape: Tuple[int, int],
+                      motion_mask: np.ndarray) -> List[int]:
+    """
+    Selects the tiles that contain motion.
+
+    Args:
+        tiles (Sequence[Tuple[int, int, int, int]]): Tiles in frame coordinates.
+        frame_shape (Tuple[int, int]): The frame (height, width) the tiles refer to.
+        motion_mask (np.ndarray): Threshold mask of the motion detector covering the
+                                  whole frame, at any resolution.
+
+    Returns:
+        List[int]: Indices of the tiles overlapping a nonzero mask pixel.
+    """
+    sy = motion_mask.shape[0] / frame_shape[0]
+    sx = motion_mask.shape[1] / frame_shape[1]
+    selected = []
+    for i, (x1, y1, x2, y2) in enumerate(tiles):
+        region = motion_mask[int(y1 * sy):int(np.ceil(y2 * sy)), int(x1 * sx):int(np.ceil(x2 * sx))]
+        if region.any():
+            selected.append(i)
+    return selected
+
+
+def merge_detections(detections: Sequence[np.ndarray], offsets: Sequence[Tuple[float, float]],
+                     iou_threshold: float = 0.5) -> np.ndarray:
+    """
+    Moves per-tile detections into frame coordinates and merges duplicates across tile seams.
+
+    Args:
+        detections (Sequence[np.ndarray]): Per-tile (N, 6) detections in tile coordinates.
+        offsets (Sequence[Tuple[float, float]]): The (x, y) position of each tile in the frame.
+        iou_threshold (float): Boxes of one class overlapping a higher scoring box above this IoU are dropped.
+
+    Returns:
+        np.ndarray: The merged (N, 6) detections in frame coordinates, sorted by score.
+    """
+    shifted = []
+    for d, (x, y) in zip(detections, offsets):
+        if len(d):
+            d = d.copy()
+            d[:, [0, 2]] += x
+            d[:, [1, 3]] += y
+            shifted.append(d)
+    if not shifted:
+        return np.empty((0, 6), dtype=np.float32)
+
+    merged = np.concatenate(shifted)
+    # Shifting every class by more than the frame size keeps NMS from suppressing across classes.
+    boxes = merged[:, :4] + merged[:, 5:6] * (merged[:, :4].max() + 1)
+    return merged[nms(boxes, merged[:, 4], iou_threshold)]
+
+
+class TiledDetector:
+    """
+    Detects small, distant objects on the full-resolution frame by inferring overlapping tiles.
+
+    A cat at the far end of the path is only a few pixels tall once the frame is
+    shrunk to the model's input size. The main frame is split into overlapping
+    tiles at the model's input size instead, and all tiles go through the
+    detector as one batch. A shrunk copy of the whole frame is added to the
+    batch, so a cat close to the camera that spans several tiles is still found
+    in one piece. Boxes are merged across the tile seams with NMS.
+
+    Tiles in which the motion detector saw nothing are skipped, so the extra
+    recall costs one inference per moving tile instead of one per tile.
+
+    The detector, a CatDetector, CascadeDetector or InferenceClient, is derived at
+    full input scale, since shrinking the tiles would undo the tiling. Its region
+    of interest is given in lores frame pixels and is applied to the merged boxes
+    rather than to every tile.
+
+    Attributes:
+        detector: The detector the tiles are run through.
+        tile_size (int): Edge length of the tiles in main frame pixels.
+        overlap (float): Fraction of a tile shared with its neighbour.
+        iou_threshold (float): IoU above which boxes from different tiles are merged.
+        full_frame (bool): Whether the shrunk whole frame is inferred along with the tiles.
+        roi (Optional[RegionOfInterest]): The detector's region of interest, in lores frame pixels.
+    """
+    def __init__(self, detector, tile_size: int = 640, overlap: float = 0.2, iou_threshold: float = 0.5,
+                 full_frame: bool = True):
+        self.roi = detector.roi
+        self.detector = detector.derive(input_scale=1.0)
+        self.detector.roi = None
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.iou_threshold = iou_threshold
+        self.full_frame = full_frame
+        self._grid_shape = None
+        self._grid: List[Tuple[int, int, int, int]] = []
+
+    def tiles(self, frame_shape: Tuple[int, int]) -> List[Tuple[int, int, int, int]]:
+        """
+        Returns the tiles of a frame size, computed once per size.
+        """
+        if self._grid_shape != frame_shape:
+            self._grid = tile_grid(frame_shape, self.tile_size, self.overlap)
+            self._grid_shape = frame_shape
+        return self._grid
+
+    def _select(self, frame_shape: Tuple[int, int], motion_mask: Optional[np.ndarray],
+                lores_shape: Optional[Tuple[int, int]]) -> List[int]:
+        """
+        Returns the indices of the tiles worth inferring: those with motion and inside the region of interest.
+        """
+        tiles = self.tiles(frame_shape)
+        selected = tiles_with_motion(tiles, frame_shape, motion_mask) if motion_mask is not None \
+            else list(range(len(tiles)))
+        if self.roi is not None and lores_shape is not None:
+            sx, sy = frame_shape[1] / lores_shape[1], frame_shape[0] / lores_shape[0]
+            rx1, ry1, rx2, ry2 = self.roi.bounds
+            selected = [i for i in selected if tiles[i][0] < rx2 * sx and tiles[i][2] > rx1 * sx
+                        and tiles[i][1] < ry2 * sy and tiles[i][3] > ry1 * sy]
+        return selected
+
+    def _shrink(self, frame: np.ndarray, tile_shape: Tuple[int, int]) -> Tuple[np.ndarray, float]:
+        """
+        Letterboxes the whole frame into the tile shape, so it can join the tile batch.
+        """
+        ratio = min(tile_shape[0] / frame.shape[0], tile_shape[1] / frame.shape[1])
+        size = (round(frame.shape[1] * ratio), round(frame.shape[0] * ratio))
+        canvas = np.full(tile_shape + frame.shape[2:], 114, dtype=frame.dtype)
+        canvas[:size[1], :size[0]] = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        return canvas, ratio
+
+    def detect(self, frame: np.ndarray, motion_mask: Optional[np.ndarray] = None,
+               lores_shape: Optional[Tuple[int, int]] = None) -> np.ndarray:
+        """
+        Runs the tiles of a frame with motion through the detector as one batch.
+
+        Args:
+            frame (np.ndarray): The full-resolution frame.
+            motion_mask (Optional[np.ndarray]): Threshold mask of the motion detector, all tiles are inferred if None.
+            lores_shape (Optional[Tuple[int, int]]): The lores (height, width) the region of interest refers to.
+
+        Returns:
+            np.ndarray: Array of shape (N, 6) in frame coordinates, sorted by score.
+        """
+        tiles = self.tiles(frame.shape[:2])
+        selected = self._select(frame.shape[:2], motion_mask, lores_shape)
+        METRICS.inc("tiles_inferred", len(selected))
+        METRICS.inc("tiles_skipped", len(tiles) - len(selected))
+        logging.debug(f"Inferring {len(selected)} of {len(tiles)} tiles")
+
+        batch = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in (tiles[i] for i in selected)]
+        offsets = [tiles[i][:2] for i in selected]
+        ratio = None
+        if self.full_frame:
+            shrunk, ratio = self._shrink(frame, (tiles[0][3] - tiles[0][1], tiles[0][2] - tiles[0][0]))
+            batch.append(shrunk)
+        if not batch:
+            return np.empty((0, 6), dtype=np.float32)
+
+        batch_detections = self.detector.detect_batch(batch)
+        if ratio is not None:
+            whole = batch_detections.pop().copy()
+            whole[:, :4] /= ratio
+            batch_detections.append(whole)
+            offsets.append((0, 0))
+        detections = merge_detections(batch_detections, offsets, self.iou_threshold)
+
+        if self.roi is not None and lores_shape is not None and len(detections):
+            sx, sy = frame.shape[1] / lores_shape[1], frame.shape[0] / lores_shape[0]
+            lores = detections.copy()
+            lores[:, [0, 2]] /= sx
+            lores[:, [1, 3]] /= sy
+            inside = self.roi.to_frame(lores, (0, 0), lores_shape)
+            inside[:, [0, 2]] *= sx
+            inside[:, [1, 3]] *= sy
+            detections = inside
+        return detections
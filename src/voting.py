@@ -0,0 +1,164 @@
+import math
+import logging
+from typing import Dict, Optional, Sequence, Tuple
+
+
+class DecisionEngine:
+    """
+    Base class for deciding what is at the door from a sequence of per-frame detections.
+
+    Subclasses implement update(), which is fed one frame at a time and returns a
+    decision ('cat', 'person' or 'none') once the evidence is decisive.
+
+    Attributes:
+        max_frames (int): Maximum number of frames before a decision is forced.
+        frames_used (int): Number of frames seen since the last reset.
+    """
+    def __init__(self, max_frames: int = 5):
+        self.max_frames = max_frames
+        self.frames_used = 0
+
+    def reset(self):
+        """
+        Clears the evidence before a new detection cycle.
+        """
+        self.frames_used = 0
+
+    def update(self, detection_type: str, scores: Dict[str, float]) -> Optional[str]:
+        """
+        Adds the evidence of one frame.
+
+        Args:
+            detection_type (str): The detection type of the frame.
+            scores (Dict[str, float]): Highest confidence per class in the frame.
+
+        Returns:
+            Optional[str]: The decision, or None if more frames are needed.
+        """
+        raise NotImplementedError
+
+
+class MajorityVote(DecisionEngine):
+    """
+    Decides once more than `min_votes` frames agree on a cat or person, like the
+    original fixed voting loop. Gives 'none' when max_frames is reached.
+
+    Attributes:
+        min_votes (int): Number of votes that must be exceeded for a decision.
+    """
+    def __init__(self, max_frames: int = 5, min_votes: int = 3):
+        super().__init__(max_frames)
+        self.min_votes = min_votes
+        self.votes = {}
+
+    def reset(self):
+        super().reset()
+        self.votes = {}
+
+    def update(self, detection_type: str, scores: Dict[str, float]) -> Optional[str]:
+        self.frames_used += 1
+        self.votes[detection_type] = self.votes.get(detection_type, 0) + 1
+
+        for label in ("cat", "person"):
+            if self.votes.get(label, 0) > self.min_votes:
+                return label
+        if self.frames_used >= self.max_frames:
+            return "none"
+        return None
+
+
+class SequentialProbabilityRatioTest(DecisionEngine):
+    """
+    Wald's sequential probability ratio test over per-frame confidences, run
+    separately for cats and persons.
+
+    The highest confidence of a class in a frame falls into one of a few bins, and
+    each bin has a probability under "present" and under "absent". A frame below
+    the class threshold, the same test the detector uses to report a box, is a
+    miss. The log-likelihood ratio of the bin is accumulated until it crosses the
+    upper bound (class present) or every class crosses the lower bound (nothing
+    there). With the default bins a cat at 0.9 is confirmed after two frames, one
+    at 0.55 after three and one just above the threshold after four.
+
+    The raw confidence is not used as a hit probability: a cat seen steadily at
+    0.5 would then add almost no evidence per frame and never be confirmed.
+
+    Attributes:
+        bins (List[Tuple[float, float, float]]): Lowest confidence of each bin, with its probability
+                                                 when the class is present and when it is absent.
+        thresholds (Dict[str, float]): Confidence per class from which a frame is not a miss.
+        upper (float): Log-likelihood ratio above which a class is accepted.
+        lower (float): Log-likelihood ratio below which a class is rejected.
+        llr (Dict[str, float]): Accumulated log-likelihood ratio per class.
+    """
+    labels = ("cat", "person")
+
+    def __init__(self, max_frames: int = 5,
+                 bins: Sequence[Tuple[float, float, float]] = ((0.0, 0.12, 0.035), (0.5, 0.25, 0.03),
+                                                               (0.7, 0.55, 0.01)),
+                 alpha: float = 0.01, beta: float = 0.1, thresholds: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            max_frames (int): Maximum number of frames before a decision is forced.
+            bins (Sequence[Tuple[float, float, float]]): Lowest confidence of each bin, with the
+                probability of a frame's confidence falling into it when the class is present and
+                when it is absent. The first bin starts at the class threshold whatever its edge,
+                and the probabilities left over go to the misses.
+            alpha (float): Accepted rate of false alarms.
+            beta (float): Accepted rate of missed visits.
+            thresholds (Optional[Dict[str, float]]): Miss confidence per class, 0.25 like the
+                                                     detector's default class thresholds if None.
+
+        Raises:
+            ValueError: If the bin probabilities leave nothing for a miss.
+        """
+        super().__init__(max_frames)
+        self.bins = sorted(bins)
+        present = sum(p for _, p, _ in self.bins)
+        absent = sum(q for _, _, q in self.bins)
+        if present >= 1.0 or absent >= 1.0:
+            raise ValueError(f"Bin probabilities must sum to less than 1, got {present} and {absent}")
+        self.thresholds = dict.fromkeys(self.labels, 0.25)
+        self.thresholds.update(thresholds or {})
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+        self._bin_llr = [(edge, math.log(p / q)) for edge, p, q in self.bins]
+        self._miss_llr = math.log((1 - present) / (1 - absent))
+        self.llr = dict.fromkeys(self.labels, 0.0)
+
+    def reset(self):
+        super().reset()
+        self.llr = dict.fromkeys(self.labels, 0.0)
+
+    def _frame_llr(self, label: str, score: float) -> float:
+        """
+        Returns the log-likelihood ratio of a frame in which the class scored `score`.
+        """
+        if score < self.thresholds[label]:
+            return self._miss_llr
+        llr = self._bin_llr[0][1]
+        for edge, bin_llr in self._bin_llr[1:]:
+            if score >= edge:
+                llr = bin_llr
+        return llr
+
+    def update(self, detection_type: str, scores: Dict[str, float]) -> Optional[str]:
+        self.frames_used += 1
+        for label in self.labels:
+            self.llr[label] += self._frame_llr(label, scores.get(label, 0.0))
+
+        accepted = [label for label in self.labels if self.llr[label] >= self.upper]
+        if accepted:
+            return max(accepted, key=self.llr.get)
+        if all(self.llr[label] <= self.lower for label in self.labels):
+            return "none"
+        if self.frames_used >= self.max_frames:
+            logging.info(f"Sequential test undecided after {self.frames_used} frames: {self.llr}")
+            return "none"
+        return None
+
+
+DECISION_ENGINES = {
+    "majority": MajorityVote,
+    "sprt": SequentialProbabilityRatioTest,
+}
@@ -0,0 +1,117 @@
+import datetime
+import sqlite3
+import numpy as np
+import pytest
+
+from src.archive import DetectionArchive
+from src.frame_artifact import FrameArtifact
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = DetectionArchive(str(tmp_path), flush_interval=0.05)
+    yield archive
+    archive.close()
+
+
+def timestamp(day, hour=12):
+    return datetime.datetime(2024, 1, day, hour).timestamp()
+
+
+def frame(detection_type='cat', day=3, hour=12, detections=None):
+    return FrameArtifact(np.zeros((8, 8, 3), dtype=np.uint8), detection_type, detections, timestamp=timestamp(day, hour))
+
+
+def test_submit_writes_image_and_index(archive, tmp_path):
+    boxes = np.array([[1, 2, 30, 20, 0.9, 15]], dtype=np.float32)
+
+    assert archive.submit(frame(detections=boxes), 0.9, index=2, cycle_id=1)
+    archive.flush()
+
+    [detection] = archive.last_detections()
+    assert detection['detection_type'] == 'cat'
+    assert detection['confidence'] == pytest.approx(0.9)
+    assert detection['boxes'] == [[1.0, 2.0, 30.0, 20.0, 0.9, 15.0]]
+    assert detection['file_path'].startswith(str(tmp_path / '20240103' / 'cat_20240103_120000_2'))
+    assert (tmp_path / '20240103' / 'cat_20240103_120000_2.jpg').exists()
+
+
+def test_batch_is_written_in_one_transaction(tmp_path):
+    archive = DetectionArchive(str(tmp_path), batch_size=4, flush_interval=0.5)
+    for i in range(4):
+        archive.submit(frame(), 0.8, index=i)
+    archive.flush()
+    archive.close()
+
+    with sqlite3.connect(tmp_path / 'detections.db') as connection:
+        assert connection.execute("SELECT COUNT(*) FROM detections").fetchone()[0] == 4
+
+
+def test_visits_per_day_counts_cycles(archive):
+    archive.submit(frame(hour=8), 0.8, index=0, cycle_id=1)
+    archive.submit(frame(hour=8), 0.9, index=1, cycle_id=1)
+    archive.submit(frame(hour=18), 0.9, index=0, cycle_id=2)
+    archive.submit(frame(day=4), 0.7, index=0, cycle_id=3)
+    archive.submit(frame('person', day=4), 0.7, index=0, cycle_id=4)
+    archive.flush()
+
+    assert archive.visits_per_day('cat') == [('20240103', 2), ('20240104', 1)]
+    assert archive.visits_per_day('person') == [('20240104', 1)]
+
+
+def test_last_detections_newest_first(archive):
+    for day in (3, 5, 4):
+        archive.submit(frame(day=day), 0.8)
+    archive.submit(frame('person', day=6), 0.8)
+    archive.flush()
+
+    detections = archive.last_detections(2, 'cat')
+    assert [d['timestamp'] for d in detections] == [timestamp(5), timestamp(4)]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    archive = DetectionArchive(str(tmp_path), maxsize=1)
+    archive.close()
+
+    assert archive.submit(frame(), 0.8)
+    assert not archive.submit(frame(), 0.8)
+    assert archive.dropped == 1
+
+
+def test_visit_times_one_per_cycle(archive):
+    archive.submit(frame(hour=7), 0.9, index=0, cycle_id=1)
+    archive.submit(frame(hour=8), 0.9, index=1, cycle_id=1)
+    archive.submit(frame(hour=18), 0.8, index=0, cycle_id=2)
+    archive.submit(frame('person', hour=9), 0.8, index=0, cycle_id=3)
+    archive.flush()
+
+    assert archive.visit_times(days=None) == [timestamp(3, 7), timestamp(3, 18)]
+
+
+def test_source_id_is_stored_and_old_index_is_migrated(tmp_path):
+    with sqlite3.connect(tmp_path / 'detections.db') as connection:
+        connection.execute("CREATE TABLE detections (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL NOT NULL, "
+                           "day TEXT NOT NULL, detection_type TEXT NOT NULL, confidence REAL NOT NULL, "
+                           "boxes TEXT NOT NULL, file_path TEXT NOT NULL, cycle_id INTEGER)")
+    connection.close()
+    archive = DetectionArchive(str(tmp_path), flush_interval=0.05)
+    artifact = frame()
+    artifact.source_id = 'garden'
+
+    archive.submit(artifact, 0.9)
+    archive.close()
+
+    [detection] = archive.last_detections()
+    assert detection['source_id'] == 'garden'
+    assert detection['file_path'] == str(tmp_path / '20240103' / 'cat_garden_20240103_120000_0.jpg')
+
+
+def test_clips_are_indexed(archive, tmp_path):
+    path = archive.clip_path(timestamp(3, 7), 'cat', 'front')
+    archive.add_clip(str(path), [timestamp(3, 7), timestamp(3, 7) + 4.0], 'cat', cycle_id=5, source_id='front')
+
+    assert path == tmp_path / '20240103' / 'cat_front_20240103_070000.mp4'
+    [clip] = archive.last_clips()
+    assert clip['file_path'] == str(path)
+    assert clip['frames'] == 2
+    assert clip['duration'] == pytest.approx(4.0)
@@ -5,13 +5,15 @@ from unittest.mock import Mock, patch
 
 from src.camera import Camera
 from src.detection import CatDetector
+from src.frame_source import CapturedFrame, FrameSource
+from src.roi import RegionOfInterest
 from utils.motion_detection import MotionDetector
 
 
 def test_camera_initialization():
     detector_mock = Mock(spec=CatDetector)
 
-    with patch('src.camera.Picamera2') as picam_mock:
+    with patch('src.frame_source.Picamera2') as picam_mock:
         camera = Camera(detector_mock)
 
         assert camera.detector == detector_mock
@@ -27,7 +29,7 @@ def test_update_motion_detector():
     # Resized frame for cv2.resize, now 3-channel
     resized_frame = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
 
-    with patch('src.camera.Picamera2') as picam_mock, \
+    with patch('src.frame_source.Picamera2') as picam_mock, \
             patch('cv2.resize', return_value=resized_frame) as resize_mock:
         picam_mock.return_value.capture_array.return_value = dummy_frame
 
@@ -46,7 +48,7 @@ def test_update_motion_detector():
 def test_is_motion_detected():
     detector_mock = Mock(spec=CatDetector)
     motion_detector_mock = Mock(spec=MotionDetector)
-    with patch('src.camera.Picamera2'), \
+    with patch('src.frame_source.Picamera2'), \
             patch('src.camera.MotionDetector', return_value=motion_detector_mock):
 
         camera = Camera(detector_mock)
@@ -55,14 +57,241 @@ def test_is_motion_detected():
         motion_detector_mock.is_motion_detected.assert_called_once()
 
 
+class FakeMappedArray:
+    """Maps a mocked capture request stream like picamera2.MappedArray."""
+    def __init__(self, request, stream):
+        self.array = request.make_array(stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture(autouse=True)
+def mapped_array():
+    with patch('src.frame_source.MappedArray', FakeMappedArray):
+        yield
+
+
+def mock_request(picam_mock, lores, main=None):
+    request = picam_mock.return_value.capture_request.return_value
+    request.make_array.side_effect = lambda stream: lores if stream == 'lores' else main
+    return request
+
+
+def cat_detector_mock(detections=None):
+    detector_mock = Mock(spec=CatDetector)
+    detector_mock.detect.return_value = np.empty((0, 6), dtype=np.float32) if detections is None else detections
+    detector_mock.classify.side_effect = lambda d: 'cat' if len(d) else 'none'
+    detector_mock.scores.side_effect = lambda d: {'cat': float(d[0, 4]), 'person': 0.0}
+    return detector_mock
+
+
 def test_capture_and_detect():
+    detector_mock = cat_detector_mock()
+    dummy_frame = np.zeros((360, 640, 3), dtype=np.uint8)
+    with patch('src.frame_source.Picamera2') as picam_mock:
+        request = mock_request(picam_mock, dummy_frame)
+
+        camera = Camera(detector_mock, motion_gating=False)
+        result = camera.capture_and_detect()
+
+        request.make_array.assert_called_once_with('lores')
+        request.release.assert_called_once()
+        detector_mock.detect.assert_called_once()
+        assert result[0] == 'none'
+        assert result[1].image is camera.source.lores_ring.slots[0]
+        assert result[2] == {'cat': 0.0, 'person': 0.0}
+
+
+def test_capture_and_detect_pulls_main_frame_on_detection():
+    detector_mock = cat_detector_mock(np.array([[10, 20, 110, 120, 0.8, 15]], dtype=np.float32))
+    lores = np.zeros((360, 640, 3), dtype=np.uint8)
+    main = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    with patch('src.frame_source.Picamera2') as picam_mock:
+        request = mock_request(picam_mock, lores, main)
+
+        camera = Camera(detector_mock, motion_gating=False)
+        detection_type, frame, scores = camera.capture_and_detect()
+
+        assert detection_type == 'cat'
+        assert scores['cat'] == np.float32(0.8)
+        assert frame.image is camera.source.main_ring.slots[0]
+        assert frame.detections[0, :4].tolist() == [30, 60, 330, 360]
+        annotated = cv2.imdecode(np.frombuffer(frame.annotated_jpeg(), np.uint8), cv2.IMREAD_COLOR)
+        assert annotated.shape == main.shape
+        assert not np.any(main)
+        assert np.any(annotated[60, 40:320])
+        request.release.assert_called_once()
+
+
+def test_lores_yuv420_is_converted():
     detector_mock = Mock(spec=CatDetector)
-    with patch('src.camera.Picamera2') as picam_mock, \
-            patch.object(detector_mock, 'detect_cat_or_person', return_value=('none', None, None)):
+    with patch('src.frame_source.Picamera2'):
+        camera = Camera(detector_mock, frame_size=(640, 360))
+        frame = camera.source._lores_to_rgb(np.zeros((540, 640), dtype=np.uint8))
+
+        assert frame.shape == (360, 640, 3)
+
+
+def test_capture_and_detect_skips_inference_without_motion():
+    detector_mock = Mock(spec=CatDetector)
+    motion_detector_mock = Mock(spec=MotionDetector)
+    motion_detector_mock.detect_motion.return_value = (False, None)
+    with patch('src.frame_source.Picamera2') as picam_mock, \
+            patch('src.camera.MotionDetector', return_value=motion_detector_mock):
+        mock_request(picam_mock, np.zeros((360, 640, 3), dtype=np.uint8))
 
         camera = Camera(detector_mock)
-        result = camera.capture_and_detect()
+        detection_type, frame, _ = camera.capture_and_detect()
 
-        picam_mock.return_value.capture_array.assert_called_once()
-        detector_mock.detect_cat_or_person.assert_called_once()
-        assert result == ('none', None, None)
+        detector_mock.detect.assert_not_called()
+        assert detection_type == 'no motion'
+        assert not frame.has_box
+        assert camera.gating_stats() == {'gated': 1, 'inferred': 0}
+
+
+def test_capture_and_detect_keeps_inferring_within_hold_time():
+    detector_mock = cat_detector_mock()
+    motion_detector_mock = Mock(spec=MotionDetector)
+    motion_detector_mock.detect_motion.side_effect = [(True, None), (False, None)]
+    with patch('src.frame_source.Picamera2') as picam_mock, \
+            patch('src.camera.MotionDetector', return_value=motion_detector_mock):
+        mock_request(picam_mock, np.zeros((360, 640, 3), dtype=np.uint8))
+
+        camera = Camera(detector_mock, motion_hold_time=60)
+        camera.capture_and_detect()
+        camera.capture_and_detect()
+
+        assert detector_mock.detect.call_count == 2
+        assert camera.gating_stats() == {'gated': 0, 'inferred': 2}
+
+
+def test_motion_detector_on_downscaled_frames():
+    motion_detector = MotionDetector(min_area=500, scale=0.25)
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    moved = frame.copy()
+    moved[100:200, 100:200] = 255
+
+    assert motion_detector.detect_motion(frame) == (False, None)
+    motion_detected, thresh = motion_detector.detect_motion(moved)
+
+    assert motion_detected
+    assert thresh.shape == (120, 160)
+
+
+def test_burst_detect_runs_one_batch():
+    detector_mock = cat_detector_mock()
+    detector_mock.detect_batch.return_value = [
+        np.empty((0, 6), dtype=np.float32),
+        np.array([[10, 20, 110, 120, 0.9, 15]], dtype=np.float32),
+        np.empty((0, 6), dtype=np.float32),
+    ]
+    lores = np.zeros((360, 640, 3), dtype=np.uint8)
+    main = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    with patch('src.frame_source.Picamera2') as picam_mock:
+        request = mock_request(picam_mock, lores, main)
+        # The requests are still held while the batch is inferred.
+        detector_mock.detect_batch.side_effect = lambda frames: (
+            request.release.assert_not_called(), detector_mock.detect_batch.return_value)[1]
+
+        camera = Camera(detector_mock, motion_gating=False)
+        results = camera.burst_detect(3)
+
+        detector_mock.detect_batch.assert_called_once()
+        assert len(detector_mock.detect_batch.call_args.args[0]) == 3
+        assert [r[0] for r in results] == ['none', 'cat', 'none']
+        # Only the frame with a detection copies its main image, out of its own capture request.
+        assert [c.args[0] for c in request.make_array.call_args_list].count('main') == 1
+        assert results[1][1].image is camera.source.main_ring.slots[0]
+        assert results[0][1].image is camera.source.lores_ring.slots[0]
+        assert results[2][1].image is camera.source.lores_ring.slots[2]
+        assert request.release.call_count == 3
+        # The artifacts hold their ring slots, the lores frame of the detection was given back.
+        assert (camera.source.lores_ring.in_use(), camera.source.main_ring.in_use()) == (2, 1)
+        del results
+        assert (camera.source.lores_ring.in_use(), camera.source.main_ring.in_use()) == (0, 0)
+        picam_mock.return_value.capture_array.assert_not_called()
+
+
+def test_burst_keeps_main_frame_of_each_detection():
+    detector_mock = cat_detector_mock()
+    detector_mock.detect_batch.return_value = [
+        np.array([[10, 20, 110, 120, 0.9, 15]], dtype=np.float32),
+        np.empty((0, 6), dtype=np.float32),
+        np.array([[30, 40, 130, 140, 0.8, 15]], dtype=np.float32),
+    ]
+    source = Mock(spec=FrameSource)
+    source.max_held = None
+    captures = []
+
+    def capture():
+        value = len(captures)
+        captures.append(Mock(lores=Mock(return_value=np.full((360, 640, 3), value, dtype=np.uint8)),
+                             main=Mock(return_value=np.full((1080, 1920, 3), value, dtype=np.uint8)),
+                             release=Mock()))
+        return CapturedFrame(captures[-1].lores, captures[-1].main, captures[-1].release)
+
+    source.capture.side_effect = capture
+    camera = Camera(detector_mock, motion_gating=False, source=source)
+
+    results = camera.burst_detect(3)
+
+    assert [r[0] for r in results] == ['cat', 'none', 'cat']
+    assert results[0][1].image[0, 0, 0] == 0
+    assert results[2][1].image[0, 0, 0] == 2
+    assert results[2][1].detections[0, :4].tolist() == [90, 120, 390, 420]
+    assert all(c.release.call_count == 1 for c in captures)
+    assert captures[1].main.call_count == 0
+    source.capture_main.assert_not_called()
+
+
+def test_burst_is_split_into_chunks_the_source_can_hold():
+    detector_mock = cat_detector_mock()
+    detector_mock.detect_batch.side_effect = lambda frames: [np.empty((0, 6), dtype=np.float32)] * len(frames)
+    source = Mock(spec=FrameSource)
+    source.max_held = 2
+    held = []
+
+    def capture():
+        assert len(held) < 2
+        captured = CapturedFrame(lambda: np.zeros((36, 64, 3), dtype=np.uint8), Mock(),
+                                 lambda: held.remove(captured))
+        held.append(captured)
+        return captured
+
+    source.capture.side_effect = capture
+    camera = Camera(detector_mock, motion_gating=False, source=source)
+
+    results = camera.burst_detect(5)
+
+    assert [r[0] for r in results] == ['none'] * 5
+    assert [len(c.args[0]) for c in detector_mock.detect_batch.call_args_list] == [2, 2, 1]
+    assert held == []
+
+
+def test_detector_crops_to_region_of_interest():
+    with patch('src.onnx_backend.OnnxBackend') as backend_mock:
+        backend_mock.return_value.predict_batch.return_value = [
+            np.array([[10, 10, 50, 50, 0.9, 15]], dtype=np.float32)]
+
+        detector = CatDetector("model.onnx", roi=RegionOfInterest([(100, 50, 400, 300)]))
+        detections = detector.detect(np.zeros((360, 640, 3), dtype=np.uint8))
+
+        crop = backend_mock.return_value.predict_batch.call_args.args[0][0]
+        assert crop.shape == (250, 300, 3)
+        assert detections.tolist() == [[110, 60, 150, 100, np.float32(0.9), 15]]
+
+
+def test_detector_warmup_runs_each_batch_size_once():
+    with patch('src.onnx_backend.OnnxBackend') as backend_mock:
+        backend_mock.return_value.predict_batch.side_effect = lambda images: [np.empty((0, 6))] * len(images)
+
+        detector = CatDetector("model.onnx", cache_dir="cache")
+        detector.warmup((360, 640), batch_sizes=(1, 5, 5))
+
+        assert backend_mock.call_args.kwargs['cache_dir'] == "cache"
+        sizes = [len(call.args[0]) for call in backend_mock.return_value.predict_batch.call_args_list]
+        assert sizes == [1, 5]
@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+
+from src.camera import Camera
+from src.camera_manager import CameraManager, open_sources
+from src.detection import CatDetector
+from src.frame_source import CapturedFrame, FrameSource
+
+
+def detector_mock():
+    detector = Mock(spec=CatDetector)
+    detector.classify.side_effect = lambda d: 'cat' if len(d) else 'none'
+    detector.scores.side_effect = lambda d: {'cat': float(d[0, 4]), 'person': 0.0}
+    return detector
+
+
+def camera(detector, source_id, value, lores_shape=(36, 64, 3)):
+    source = Mock(spec=FrameSource)
+    source.max_held = None
+    source.released = Mock()
+    source.capture.side_effect = lambda: CapturedFrame(lambda: np.full(lores_shape, value, dtype=np.uint8),
+                                                       lambda: np.full((108, 192, 3), value, dtype=np.uint8),
+                                                       source.released)
+    return Camera(detector, motion_gating=False, source=source, source_id=source_id)
+
+
+def test_burst_from_all_cameras_runs_one_batch():
+    detector = detector_mock()
+    detector.detect_batch.side_effect = lambda frames: [
+        np.array([[1, 2, 10, 20, 0.8, 15]], dtype=np.float32) if frame[0, 0, 0] == 2 else np.empty((0, 6))
+        for frame in frames]
+    manager = CameraManager([camera(detector, 'front', 1), camera(detector, 'garden', 2)])
+
+    results = manager.burst_detect(5)
+
+    detector.detect_batch.assert_called_once()
+    assert len(detector.detect_batch.call_args.args[0]) == 5
+    assert [r[1].source_id for r in results] == ['front', 'garden', 'front', 'garden', 'front']
+    assert [r[0] for r in results] == ['none', 'cat', 'none', 'cat', 'none']
+    assert results[1][1].image.shape == (108, 192, 3)
+    assert results[1][1].detections[0, :4].tolist() == [3, 6, 30, 60]
+    manager.camera('garden').source.capture_main.assert_not_called()
+    assert manager.camera('garden').source.released.call_count == 2
+    assert manager.gating_stats() == {'gated': 0, 'inferred': 5}
+
+    # The next burst continues with the camera after the last one used.
+    assert [r[1].source_id for r in manager.burst_detect(2)] == ['garden', 'front']
+
+
+def test_burst_is_chunked_by_the_cameras_that_hold_fewest_captures():
+    detector = detector_mock()
+    detector.detect_batch.side_effect = lambda frames: [np.empty((0, 6))] * len(frames)
+    front, garden = camera(detector, 'front', 1), camera(detector, 'garden', 2)
+    garden.source.max_held = 1
+    manager = CameraManager([front, garden])
+
+    results = manager.burst_detect(5)
+
+    assert [len(c.args[0]) for c in detector.detect_batch.call_args_list] == [2, 2, 1]
+    assert [r[1].source_id for r in results] == ['front', 'garden', 'front', 'garden', 'front']
+    assert garden.source.released.call_count == 2
+
+
+def test_burst_from_cameras_of_different_resolutions_runs_one_call_per_shape():
+    with patch('src.onnx_backend.OnnxBackend') as backend_mock:
+        def predict_batch(images):
+            assert len({image.shape for image in images}) == 1
+            return [np.array([[1, 2, 10, 20, 0.9, 15]], dtype=np.float32) if image[0, 0, 0] == 2
+                    else np.empty((0, 6), dtype=np.float32) for image in images]
+
+        backend_mock.return_value.predict_batch.side_effect = predict_batch
+        detector = CatDetector("model.onnx")
+        manager = CameraManager([camera(detector, 'front', 1), camera(detector, 'garden', 2, (48, 64, 3))])
+
+        results = manager.burst_detect(4)
+
+    shapes = [{image.shape for image in c.args[0]} for c in backend_mock.return_value.predict_batch.call_args_list]
+    assert shapes == [{(36, 64, 3)}, {(48, 64, 3)}]
+    assert [r[0] for r in results] == ['none', 'cat', 'none', 'cat']
+    assert results[1][1].detections[0, :4].tolist() == [3, 4.5, 30, 45]
+
+
+def test_capture_and_detect_alternates_cameras():
+    detector = detector_mock()
+    detector.detect.return_value = np.empty((0, 6))
+    front, garden = camera(detector, 'front', 1), camera(detector, 'garden', 2)
+    manager = CameraManager([front, garden])
+
+    assert [manager.capture_and_detect()[1].source_id for _ in range(3)] == ['front', 'garden', 'front']
+
+
+def test_from_spec_and_validation(tmp_path):
+    detector = detector_mock()
+    for name in ('front', 'garden'):
+        (tmp_path / name).mkdir()
+        cv2.imwrite(str(tmp_path / name / 'frame.png'), np.zeros((36, 64, 3), dtype=np.uint8))
+
+    manager = CameraManager.from_spec(detector, f"front={tmp_path / 'front'}; garden={tmp_path / 'garden'}",
+                                      motion_gating=False)
+
+    assert manager.source_ids == ['front', 'garden']
+    assert manager.camera() is manager.camera('front')
+    with pytest.raises(ValueError):
+        CameraManager.from_spec(detector, str(tmp_path / 'front'))
+    with pytest.raises(ValueError):
+        CameraManager([camera(detector, 'front', 1), camera(detector, 'front', 2)])
+    with pytest.raises(ValueError):
+        CameraManager([camera(detector, 'front', 1), camera(detector_mock(), 'garden', 2)])
+
+
+def test_open_sources_knows_video_sizes_before_the_first_capture(tmp_path):
+    writer = cv2.VideoWriter(str(tmp_path / 'garden.avi'), cv2.VideoWriter_fourcc(*'MJPG'), 5, (96, 48))
+    writer.write(np.zeros((48, 96, 3), dtype=np.uint8))
+    writer.release()
+    (tmp_path / 'front').mkdir()
+    cv2.imwrite(str(tmp_path / 'front' / 'frame.png'), np.zeros((36, 64, 3), dtype=np.uint8))
+
+    sources = open_sources(f"front={tmp_path / 'front'};garden={tmp_path / 'garden.avi'}")
+
+    assert [source_id for source_id, _ in sources] == ['front', 'garden']
+    assert [source.main_size for _, source in sources] == [None, (96, 48)]
+    for _, source in sources:
+        source.close()
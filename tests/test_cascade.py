@@ -0,0 +1,58 @@
+import numpy as np
+from unittest.mock import Mock, patch
+
+from src.cascade import CascadeDetector
+from src.detection import CatDetector
+
+
+def stage(detections_per_frame):
+    detector = Mock(spec=CatDetector)
+    detector.detect_batch.side_effect = lambda images: [detections_per_frame[int(image[0, 0, 0])] for image in images]
+    detector.input_scale = 1.0
+    return detector
+
+
+def frame(index):
+    return np.full((36, 64, 3), index, dtype=np.uint8)
+
+
+def test_only_candidates_go_to_stage_two():
+    candidate = np.array([[1, 2, 3, 4, 0.15, 15]], dtype=np.float32)
+    confirmed = np.array([[1, 2, 3, 4, 0.8, 15]], dtype=np.float32)
+    screen = stage({0: np.zeros((0, 6)), 1: candidate, 2: np.zeros((0, 6)), 3: candidate})
+    confirm = stage({1: confirmed, 3: np.zeros((0, 6))})
+    cascade = CascadeDetector(screen, confirm)
+
+    results = cascade.detect_batch([frame(i) for i in range(4)])
+
+    confirm.detect_batch.assert_called_once()
+    assert [int(image[0, 0, 0]) for image in confirm.detect_batch.call_args.args[0]] == [1, 3]
+    assert [len(r) for r in results] == [0, 1, 0, 0]
+    assert results[1] is confirmed
+    assert cascade.frames_screened == 4
+    assert cascade.confirm_rate == 0.5
+
+
+def test_frames_without_candidates_skip_stage_two():
+    screen = stage({0: np.zeros((0, 6))})
+    confirm = stage({})
+    cascade = CascadeDetector(screen, confirm)
+
+    assert len(cascade.detect(frame(0))) == 0
+    confirm.detect_batch.assert_not_called()
+
+    cascade.input_scale = 0.5
+    assert confirm.input_scale == 0.5
+    assert screen.input_scale == 1.0
+
+
+def test_derived_screen_shares_the_session():
+    with patch('src.onnx_backend.OnnxBackend') as backend_mock:
+        detector = CatDetector("model.onnx", class_thresholds={15: 0.5, 0: 0.5})
+        screen = detector.derive({15: 0.1, 0: 0.1}, input_scale=0.5)
+
+        backend_mock.assert_called_once()
+        assert screen.model.session is detector.model.session
+        assert screen.model.class_thresholds == {15: 0.1, 0: 0.1}
+        assert detector.model.class_thresholds != screen.model.class_thresholds
+        assert (screen.input_scale, detector.input_scale) == (0.5, 1.0)
@@ -0,0 +1,89 @@
+import cv2
+import time
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import Mock
+
+from src.camera import Camera
+from src.clip_recorder import ClipRecorder, PreRollBuffer, clip_fps
+from src.detection import CatDetector
+from src.frame_broker import BrokerSource, FrameBroker
+from src.frame_source import CapturedFrame, FrameSource
+
+
+def frame(value):
+    return np.full((36, 64, 3), value, dtype=np.uint8)
+
+
+def test_preroll_keeps_latest_frames_in_order():
+    buffer = PreRollBuffer(size=3)
+    for i in range(5):
+        buffer.push(frame(i), timestamp=float(i))
+
+    frames, timestamps = buffer.snapshot()
+
+    assert len(buffer) == 3
+    assert [f[0, 0, 0] for f in frames] == [2, 3, 4]
+    assert timestamps.tolist() == [2.0, 3.0, 4.0]
+
+    buffer.push(np.zeros((10, 10, 3), dtype=np.uint8))
+    assert len(buffer) == 1
+
+
+def test_clip_fps_from_timestamps():
+    assert clip_fps(np.array([0.0, 0.5, 1.0])) == pytest.approx(2.0)
+    assert clip_fps(np.array([0.0])) == 5.0
+    assert clip_fps(np.array([0.0, 0.001])) == 30.0
+
+
+def test_camera_records_preroll_and_post_roll():
+    source = Mock(spec=FrameSource)
+    source.capture.return_value.lores.side_effect = [frame(i) for i in range(5)]
+    camera = Camera(Mock(spec=CatDetector), motion_gating=False, source=source, preroll_frames=4)
+    camera.preroll.push = Mock(wraps=camera.preroll.push)
+
+    camera.capture_burst(3)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        clip = executor.submit(camera.record_clip_frames, post_roll=0.3, fps=20)
+        # Detection keeps capturing while the post-roll is collected.
+        for _ in range(2):
+            time.sleep(0.1)
+            camera.capture_burst(1)
+        frames, timestamps = clip.result()
+
+    assert camera.preroll.push.call_count == 5
+    assert [f[0, 0, 0] for f in frames] == [0, 1, 2, 3, 4]
+    assert np.all(np.diff(timestamps) >= 0)
+    source.capture_lores.assert_not_called()
+
+
+def test_broker_feeds_preroll_continuously():
+    source = Mock(spec=FrameSource)
+    source.frame_size = (64, 36)
+    source.capture.side_effect = lambda: CapturedFrame(lambda: frame(1), lambda: None)
+    broker = FrameBroker(source, fps=50, idle_timeout=0.0).start()
+    camera = Camera(Mock(spec=CatDetector), source=BrokerSource(broker), preroll_frames=4)
+
+    try:
+        time.sleep(0.2)
+        assert camera.continuous_preroll
+        assert len(camera.preroll) == 4
+        frames, _ = camera.record_clip_frames(post_roll=0.2, fps=10)
+        assert 5 <= len(frames) <= 7
+    finally:
+        broker.stop()
+
+
+def test_recorder_writes_playable_mp4(tmp_path):
+    recorder = ClipRecorder(ThreadPoolExecutor(max_workers=1))
+    frames = np.stack([frame(i * 20) for i in range(6)])
+    path = str(tmp_path / 'clip.mp4')
+
+    assert recorder.submit(frames, np.arange(6) / 5.0, path).result() == path
+    recorder.close()
+
+    capture = cv2.VideoCapture(path)
+    assert capture.get(cv2.CAP_PROP_FRAME_COUNT) == 6
+    assert capture.get(cv2.CAP_PROP_FPS) == pytest.approx(5.0)
+    capture.release()
@@ -0,0 +1,46 @@
+import cv2
+import numpy as np
+from unittest.mock import Mock
+
+from src.onnx_backend import OnnxBackend
+from utils.convert_to_onnx import FrameCalibrationReader, find_images, recall
+
+
+def test_find_images_spreads_limit_over_folder(tmp_path):
+    for day in ("20240101", "20240102"):
+        (tmp_path / day).mkdir()
+        for i in range(5):
+            cv2.imwrite(str(tmp_path / day / f"cat_{i}.jpg"), np.zeros((8, 8, 3), dtype=np.uint8))
+    (tmp_path / "20240101" / "cat_0.json").write_text("{}")
+
+    images = find_images(str(tmp_path), limit=3)
+
+    assert [p.parent.name + "/" + p.name for p in images] == [
+        "20240101/cat_0.jpg", "20240101/cat_4.jpg", "20240102/cat_4.jpg"]
+
+
+def test_calibration_reader_preprocesses_and_rewinds(tmp_path):
+    red = np.zeros((8, 8, 3), dtype=np.uint8)
+    red[..., 2] = 255  # red in OpenCV's BGR order
+    cv2.imwrite(str(tmp_path / "a.png"), red)
+    backend = Mock(spec=OnnxBackend)
+    backend.input_name = "images"
+    backend.preprocess.return_value = (np.ones((1, 3, 640, 640), dtype=np.float32), 1.0, (0, 0))
+
+    reader = FrameCalibrationReader(backend, find_images(str(tmp_path)))
+
+    assert reader.get_next()["images"].shape == (1, 3, 640, 640)
+    # Calibration frames are RGB like the camera frames.
+    assert backend.preprocess.call_args.args[0][0, 0].tolist() == [255, 0, 0]
+    assert reader.get_next() is None
+    reader.rewind()
+    assert reader.get_next() is not None
+
+
+def test_recall_per_label():
+    predictions = {"cat": ["cat", "none", "cat", "cat"], "person": [], "none": ["none", "cat"]}
+
+    assert recall(predictions) == {
+        "cat": {"images": 4, "recall": 0.75},
+        "none": {"images": 2, "recall": 0.5},
+    }
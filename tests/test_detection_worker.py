@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import pytest
+from contextlib import aclosing
+from unittest.mock import Mock
+
+from src.camera import Camera
+from src.detection_worker import DetectionWorker
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_frames_runs_capture_off_the_event_loop():
+    camera_mock = Mock(spec=Camera)
+    threads = []
+
+    def capture_and_detect():
+        threads.append(threading.current_thread())
+        return ('none', None, None, {})
+
+    camera_mock.capture_and_detect.side_effect = capture_and_detect
+
+    async def scenario():
+        worker = DetectionWorker(camera_mock)
+        task = asyncio.create_task(worker.run())
+        results = [result async for result in worker.frames(3)]
+        task.cancel()
+        worker.shutdown()
+        return results
+
+    results = run(scenario())
+
+    assert results == [('none', None, None, {})] * 3
+    assert all(thread is not threading.main_thread() for thread in threads)
+
+
+def test_abandoned_burst_stops_the_worker():
+    camera_mock = Mock(spec=Camera)
+    camera_mock.capture_and_detect.return_value = ('cat', None, None, {})
+
+    async def scenario():
+        worker = DetectionWorker(camera_mock, maxsize=1)
+        task = asyncio.create_task(worker.run())
+        async with aclosing(worker.frames(10)) as frames:
+            async for _ in frames:
+                break
+        await asyncio.sleep(0.05)
+        task.cancel()
+        worker.shutdown()
+
+    run(scenario())
+
+    camera_mock.capture_and_detect.assert_called_once()
+
+
+def test_worker_errors_are_raised_to_the_consumer():
+    camera_mock = Mock(spec=Camera)
+    camera_mock.capture_and_detect.side_effect = RuntimeError("CameraError")
+
+    async def scenario():
+        worker = DetectionWorker(camera_mock)
+        task = asyncio.create_task(worker.run())
+        try:
+            async for _ in worker.frames(2):
+                pass
+        finally:
+            task.cancel()
+            worker.shutdown()
+
+    with pytest.raises(RuntimeError, match="CameraError"):
+        run(scenario())
+
+
+def test_batched_worker_uses_burst_detect():
+    camera_mock = Mock(spec=Camera)
+    camera_mock.capture_and_detect.return_value = ('none', None, None, {})
+    camera_mock.burst_detect.side_effect = lambda n: [('none', None, None, {})] * n
+
+    async def scenario():
+        worker = DetectionWorker(camera_mock, batch_size=5)
+        task = asyncio.create_task(worker.run())
+        results = [result async for result in worker.frames(5)]
+        task.cancel()
+        worker.shutdown()
+        return results
+
+    results = run(scenario())
+
+    camera_mock.capture_and_detect.assert_called_once()
+    camera_mock.burst_detect.assert_called_once_with(4)
+    assert len(results) == 5
+
+
+def test_batched_burst_requests_next_chunk_on_demand():
+    camera_mock = Mock(spec=Camera)
+    camera_mock.capture_and_detect.return_value = ('none', None, None, {})
+
+    async def scenario():
+        worker = DetectionWorker(camera_mock, batch_size=4)
+        task = asyncio.create_task(worker.run())
+        async with aclosing(worker.frames(5)) as frames:
+            async for _ in frames:
+                break
+        await asyncio.sleep(0.05)
+        task.cancel()
+        worker.shutdown()
+
+    run(scenario())
+
+    camera_mock.capture_and_detect.assert_called_once()
+    camera_mock.burst_detect.assert_not_called()
+
+
+def test_frame_interval_paces_captures():
+    camera_mock = Mock(spec=Camera)
+    camera_mock.capture_and_detect.return_value = ('none', None, {})
+
+    async def scenario():
+        worker = DetectionWorker(camera_mock)
+        worker.frame_interval = 0.05
+        task = asyncio.create_task(worker.run())
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        async with aclosing(worker.frames(3)) as frames:
+            async for _ in frames:
+                pass
+        elapsed = loop.time() - start
+        task.cancel()
+        worker.shutdown()
+        return elapsed
+
+    assert run(scenario()) >= 0.1
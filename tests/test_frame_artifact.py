@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+from unittest.mock import patch
+
+from src.frame_artifact import FrameArtifact
+
+
+def decode(data):
+    return cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+
+
+def cat_frame():
+    image = np.zeros((360, 640, 3), dtype=np.uint8)
+    image[:, :, 0] = 200  # red in RGB
+    return FrameArtifact(image, 'cat', np.array([[100, 100, 300, 300, 0.9, 15]], dtype=np.float32))
+
+
+def test_each_variant_is_encoded_once():
+    frame = cat_frame()
+    with patch('src.frame_artifact.cv2.imencode', wraps=cv2.imencode) as imencode:
+        first = frame.original_jpeg()
+        second = frame.original_jpeg()
+        frame.annotated_jpeg()
+        frame.annotated_jpeg()
+
+    assert first is second
+    assert imencode.call_count == 2
+
+
+def test_variants_keep_colours_and_leave_the_frame_untouched():
+    frame = cat_frame()
+    before = frame.image.copy()
+
+    original = decode(frame.original_jpeg())
+    annotated = decode(frame.annotated_jpeg())
+
+    assert np.array_equal(frame.image, before)
+    assert original[50, 50, 2] > 150 and original[50, 50, 0] < 50
+    assert np.array_equal(original[50, 50], annotated[50, 50])
+    assert not np.allclose(annotated[100, 150], original[100, 150], atol=30)
+
+
+def test_thumbnail_is_downscaled():
+    thumbnail = decode(cat_frame().thumbnail_jpeg())
+
+    assert thumbnail.shape == (180, 320, 3)
+
+
+def test_jpeg_quality_is_configurable():
+    image = np.random.default_rng(0).integers(0, 255, (120, 160, 3), dtype=np.uint8)
+
+    low = FrameArtifact(image, jpeg_quality=30).original_jpeg()
+    high = FrameArtifact(image, jpeg_quality=95).original_jpeg()
+
+    assert len(low) < len(high)
@@ -0,0 +1,117 @@
+import time
+import numpy as np
+import pytest
+
+from src.frame_broker import BrokerSource, FrameBroker
+from src.frame_source import CapturedFrame, FrameSource
+
+
+class CountingSource(FrameSource):
+    """Frames whose pixels hold the capture number; counts captures, main copies and releases."""
+    frame_size = (8, 4)
+    main_size = (16, 8)
+
+    def __init__(self, limit=None):
+        self.captures = 0
+        self.mains = 0
+        self.released = 0
+        self.limit = limit
+
+    def capture(self):
+        if self.limit is not None and self.captures >= self.limit:
+            raise EOFError("exhausted")
+        self.captures += 1
+        value = self.captures
+
+        def main():
+            self.mains += 1
+            return np.full((8, 16, 3), value, dtype=np.uint8)
+
+        def release():
+            self.released += 1
+
+        return CapturedFrame(lambda: np.full((4, 8, 3), value, dtype=np.uint8), main, release)
+
+
+@pytest.fixture
+def broker():
+    broker = FrameBroker(CountingSource(), history=4, fps=100, idle_timeout=0.2).start()
+    yield broker
+    broker.stop()
+
+
+def test_latest_next_and_since(broker):
+    first = broker.latest()
+    second = broker.next(first.index)
+
+    assert second.index > first.index
+    assert second.lores[0, 0, 0] == second.index + 1
+    assert broker.source.mains == 0
+    assert [f.index for f in broker.since(first.timestamp)][0] > first.index
+    assert len(broker.since(0)) <= 4
+
+    # A held frame reads the main image of its own capture, however many frames followed.
+    broker.next(second.index).release()
+    assert first.main().shape == (8, 16, 3)
+    assert first.main()[0, 0, 0] == first.lores[0, 0, 0]
+    assert broker.source.mains == 1
+    first.release()
+    second.release()
+    with pytest.raises(RuntimeError):
+        first.main()
+
+
+def test_frames_are_released_once_nobody_holds_them(broker):
+    frame = broker.latest()
+    broker.next(frame.index).release()
+    assert broker.source.released < broker.frames_captured
+
+    frame.release()
+    broker.stop()
+    assert broker.source.released == broker.frames_captured
+
+
+def test_capture_pauses_without_subscribers(broker):
+    broker.latest()
+    time.sleep(0.4)
+    captured = broker.frames_captured
+    time.sleep(0.2)
+
+    assert broker.frames_captured == captured
+    assert broker.next().index >= captured
+
+
+def test_subscribers_share_captures(broker):
+    detection, test = BrokerSource(broker), BrokerSource(broker)
+
+    frames = [detection.capture_lores() for _ in range(3)]
+    snapshot = test.capture_main()
+
+    assert len({int(f[0, 0, 0]) for f in frames}) == 3
+    assert snapshot.shape == (8, 16, 3)
+    assert broker.source.captures == broker.frames_captured
+    assert detection.frame_size == (8, 4)
+
+
+def test_end_of_source_reaches_subscribers():
+    broker = FrameBroker(CountingSource(limit=2)).start()
+    source = BrokerSource(broker, max_age=60)
+    source.capture_lores()
+    with pytest.raises(EOFError):
+        for _ in range(3):
+            source.capture_lores()
+    broker.stop()
+
+
+def test_every_capture_pairs_lores_and_main_of_the_same_frame(broker):
+    source = BrokerSource(broker)
+
+    # Like a burst: the captures are held while later frames are published, mains are read afterwards.
+    captures = [source.capture() for _ in range(4)]
+    time.sleep(0.05)
+    indices = [(int(c.lores()[0, 0, 0]), int(c.main()[0, 0, 0])) for c in captures]
+    for captured in captures:
+        captured.release()
+
+    assert [lores for lores, _ in indices] == sorted(set(lores for lores, _ in indices))
+    assert all(lores == main for lores, main in indices)
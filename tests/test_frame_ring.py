@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from src.frame_artifact import FrameArtifact
+from src.frame_ring import FrameRing
+from src.frame_source import CapturedFrame
+
+
+def test_slots_are_reused_once_released():
+    ring = FrameRing(2, (4, 4, 3))
+    first = ring.acquire((4, 4, 3))
+    assert ring.release(first)
+
+    second = ring.acquire((4, 4, 3))
+    third = ring.acquire((4, 4, 3))
+
+    assert third is first
+    assert second is ring.slots[1]
+    assert ring.overflows == 0
+
+
+def test_retained_slot_is_kept_until_every_reference_is_released():
+    ring = FrameRing(2, (4, 4, 3))
+    frame = ring.acquire((4, 4, 3))
+    assert ring.retain(frame)
+    ring.release(frame)
+    ring.acquire((4, 4, 3))
+
+    assert ring.acquire((4, 4, 3)) is not frame
+    assert ring.in_use() == 2
+    ring.release(frame)
+    assert ring.in_use() == 1
+    with pytest.raises(RuntimeError):
+        ring.release(frame)
+
+
+def test_views_do_not_hold_a_slot():
+    ring = FrameRing(1, (4, 4, 3))
+    frame = ring.acquire((4, 4, 3))
+    view = frame[1:3]
+    ring.release(frame)
+
+    assert ring.in_use() == 0
+    assert ring.acquire((4, 4, 3)) is view.base
+
+
+def test_full_ring_allocates_a_temporary_frame():
+    ring = FrameRing(2, (4, 4, 3))
+    held = [ring.acquire((4, 4, 3)) for _ in range(2)]
+
+    extra = ring.acquire((4, 4, 3))
+
+    assert all(extra is not slot for slot in held)
+    assert ring.overflows == 1
+    assert not ring.retain(extra)
+    assert not ring.release(extra)
+
+
+def test_new_shape_reallocates():
+    ring = FrameRing(2)
+    frame = ring.acquire((8, 6, 3))
+
+    assert frame.shape == (8, 6, 3)
+    assert frame.dtype == np.uint8
+    assert ring.acquire((4, 4, 3)).shape == (4, 4, 3)
+
+
+def test_taken_image_outlives_its_capture_until_the_artifact_is_released():
+    ring = FrameRing(1, (4, 4, 3))
+    release = []
+    captured = CapturedFrame(lambda: ring.acquire((4, 4, 3)), lambda: None, lambda: release.append(1), (ring,))
+    image, give_back = captured.take("lores")
+    artifact = FrameArtifact(image, release=give_back)
+    captured.release()
+
+    assert release == [1]
+    assert ring.in_use() == 1
+    artifact.release()
+    assert ring.in_use() == 0
+
+
+def test_dropped_artifact_gives_its_slot_back():
+    ring = FrameRing(1, (4, 4, 3))
+    captured = CapturedFrame(lambda: ring.acquire((4, 4, 3)), lambda: None, rings=(ring,))
+    image, release = captured.take("lores")
+    artifact = FrameArtifact(image, release=release)
+    captured.release()
+    assert ring.in_use() == 1
+
+    del artifact
+    assert ring.in_use() == 0
@@ -0,0 +1,93 @@
+import sys
+import cv2
+import subprocess
+import numpy as np
+import pytest
+from pathlib import Path
+from unittest.mock import Mock
+
+from src.camera import Camera
+from src.detection import CatDetector
+from src.frame_source import ImageDirectorySource, VideoFileSource, open_source
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    for i in range(3):
+        image = np.zeros((720, 1280, 3), dtype=np.uint8)
+        image[:, :, 0] = 255    # blue in BGR
+        cv2.imwrite(str(tmp_path / f"frame_{i}.png"), image)
+    return tmp_path
+
+
+@pytest.fixture
+def video_file(tmp_path):
+    path = str(tmp_path / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (640, 480))
+    for i in range(4):
+        writer.write(np.full((480, 640, 3), i * 60, dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def test_image_directory_source(image_dir):
+    source = ImageDirectorySource(str(image_dir))
+
+    frame = source.capture()
+
+    assert source.main_size == (1280, 720)
+    assert source.frame_size == (640, 360)
+    assert frame.main().shape == (720, 1280, 3)
+    assert frame.lores().shape == (360, 640, 3)
+    assert frame.main()[0, 0].tolist() == [0, 0, 255]   # RGB ordered
+    source.capture()
+    source.capture()
+    with pytest.raises(EOFError):
+        source.capture()
+
+
+def test_image_directory_source_loops(image_dir):
+    source = ImageDirectorySource(str(image_dir), frame_size=(320, 180), loop=True)
+
+    frames = [source.capture_lores() for _ in range(5)]
+
+    assert all(frame.shape == (180, 320, 3) for frame in frames)
+
+
+def test_video_file_source(video_file):
+    source = open_source(video_file)
+
+    frames = []
+    with pytest.raises(EOFError):
+        while True:
+            frames.append(source.capture_lores())
+
+    assert isinstance(source, VideoFileSource)
+    assert len(frames) == 4
+    assert frames[0].shape == (480, 640, 3)
+    source.close()
+
+
+def test_camera_runs_on_a_file_source(image_dir):
+    detector_mock = Mock(spec=CatDetector)
+    detector_mock.detect.return_value = np.array([[10, 20, 110, 120, 0.9, 15]], dtype=np.float32)
+    detector_mock.classify.return_value = 'cat'
+    detector_mock.scores.return_value = {'cat': 0.9, 'person': 0.0}
+
+    camera = Camera(detector_mock, motion_gating=False, source=ImageDirectorySource(str(image_dir)))
+    detection_type, frame, _ = camera.capture_and_detect()
+
+    assert detection_type == 'cat'
+    assert frame.image.shape == (720, 1280, 3)
+    assert frame.detections[0, :4].tolist() == [20, 40, 220, 240]
+
+
+def test_picamera2_is_only_imported_when_a_camera_is_opened():
+    code = ("import sys\n"
+            "class Block:\n"
+            "    def find_spec(self, name, path=None, target=None):\n"
+            "        if name.split('.')[0] in ('picamera2', 'ultralytics', 'torch'):\n"
+            "            raise AssertionError(f'{name} imported at startup')\n"
+            "sys.meta_path.insert(0, Block())\n"
+            "import src.camera, src.camera_manager, src.telegram_notifier, src.detection\n")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=Path(__file__).parent.parent)
@@ -0,0 +1,91 @@
+import os
+import signal
+import threading
+import numpy as np
+import pytest
+
+from src.inference_server import InferenceServer
+from src.roi import RegionOfInterest
+
+
+class FakeDetector:
+    """Reports the batch size as x1 and the frame value as the cat score; a white frame crashes the process."""
+    def __init__(self):
+        self.input_scale = 1.0
+
+    def detect_batch(self, images):
+        detections = []
+        for image in images:
+            value = int(image[0, 0, 0])
+            if value == 255:
+                os._exit(3)
+            h, w = image.shape[:2]
+            detections.append(np.array([[len(images), 0, w, h, value / 100, 15]], dtype=np.float32)
+                              if value else np.empty((0, 6), dtype=np.float32))
+        return detections
+
+
+@pytest.fixture
+def server():
+    server = InferenceServer(FakeDetector, slots=4, max_frame_shape=(64, 64, 3), batch_window=0.3,
+                             restart_delay=0.01)
+    server.start()
+    yield server
+    server.stop()
+
+
+def frame(value, shape=(36, 64, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_round_trip_through_shared_memory(server):
+    client = server.client()
+    results = client.detect_batch([frame(80), frame(0), frame(30, (20, 20, 3))])
+
+    assert [len(d) for d in results] == [1, 0, 1]
+    assert results[0][0, 2:].tolist() == [64, 36, pytest.approx(0.8), 15]
+    assert results[2][0, 2:4].tolist() == [20, 20]
+    assert client.classify(results[0]) == 'cat' and client.classify(results[1]) == 'none'
+    # More frames than slots go in several requests.
+    assert len(client.detect_batch([frame(10)] * 6)) == 6
+    with pytest.raises(RuntimeError):
+        client.detect(frame(10, (128, 128, 3)))
+
+
+def test_client_crops_to_its_roi(server):
+    client = server.client(roi=RegionOfInterest([(10, 5, 40, 25)]))
+
+    detections = client.detect(frame(50))
+
+    assert detections[0, :4].tolist() == [11, 5, 40, 25]
+
+
+def test_requests_of_clients_are_batched(server):
+    clients = [server.client(), server.client()]
+    client_results = [None, None]
+
+    def detect(index):
+        client_results[index] = clients[index].detect(frame(40))
+
+    threads = [threading.Thread(target=detect, args=(i,)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [d[0, 0] for d in client_results] == [2, 2]
+
+
+def test_server_restarts_after_crash(server):
+    client = server.client()
+    client.detect(frame(10))
+    os.kill(server._process.pid, signal.SIGKILL)
+
+    assert client.detect(frame(60))[0, 4] == pytest.approx(0.6)
+    assert server.restarts == 1
+
+    # A frame that crashes the model fails after max_attempts instead of restarting forever.
+    with pytest.raises(RuntimeError):
+        client.detect(frame(255))
+    assert server.restarts == 3
+    assert len(client.detect(frame(10))) == 1
@@ -0,0 +1,65 @@
+import urllib.request
+import pytest
+
+from src.metrics import Histogram, Metrics, MetricsServer, process_uptime
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.005, 0.05, 0.5, 5.0):
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum == pytest.approx(5.56)
+    assert histogram.quantile(0.2) == pytest.approx(0.005)
+    assert 0.01 < histogram.quantile(0.5) <= 0.1
+    assert histogram.quantile(1.0) == 1.0
+
+
+def test_timer_and_counters():
+    metrics = Metrics()
+    with metrics.timer("inference"):
+        pass
+    metrics.inc("frames_gated", 3)
+
+    assert metrics.histograms["inference"].count == 1
+    assert metrics.counters["frames_gated"] == 3
+    assert "inference: 1 samples" in metrics.summary()
+    assert "frames gated 3" in metrics.summary()
+
+
+def test_prometheus_rendering():
+    metrics = Metrics(buckets=(0.01, 0.1))
+    metrics.observe("encode", 0.05)
+    metrics.inc("notifications_sent")
+
+    text = metrics.render_prometheus()
+
+    assert 'catbot_stage_seconds_bucket{stage="encode",le="0.01"} 0' in text
+    assert 'catbot_stage_seconds_bucket{stage="encode",le="0.1"} 1' in text
+    assert 'catbot_stage_seconds_bucket{stage="encode",le="+Inf"} 1' in text
+    assert 'catbot_stage_seconds_count{stage="encode"} 1' in text
+    assert 'catbot_notifications_sent_total 1' in text
+
+
+def test_metrics_server_serves_localhost():
+    metrics = Metrics()
+    metrics.inc("frames_inferred")
+    server = MetricsServer(metrics, port=0).start()
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+            body = response.read().decode()
+    finally:
+        server.close()
+
+    assert "catbot_frames_inferred_total 1" in body
+
+
+def test_gauges_and_process_uptime():
+    metrics = Metrics()
+    metrics.set("time_to_first_detection_seconds", 4.5)
+
+    assert "catbot_time_to_first_detection_seconds 4.5" in metrics.render_prometheus()
+    assert "time to first detection seconds 4.50" in metrics.summary()
+    assert 0 < process_uptime() < 3600
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from utils.motion_detection import BackgroundMotionDetector, MOTION_ENGINES, parse_regions
+
+
+def scene(x=None, brightness=80):
+    frame = np.full((360, 640, 3), brightness, dtype=np.uint8)
+    if x is not None:
+        frame[160:220, x:x + 80] = 220
+    return frame
+
+
+@pytest.mark.parametrize('method', BackgroundMotionDetector.METHODS)
+def test_background_engine_detects_object_and_ignores_light_change(method):
+    detector = BackgroundMotionDetector(method=method)
+    for _ in range(5):
+        assert detector.detect_motion(scene()) == (False, None)
+
+    detected, mask = detector.detect_motion(scene(x=100))
+    assert detected
+    assert mask.shape == (90, 160)
+    assert mask[47, 35] == 255 and mask[10, 140] == 0
+    assert detector.motion_mask is mask
+
+    # A brighter frame changes every pixel: relearned as background, not motion.
+    assert detector.detect_motion(scene(brightness=160)) == (False, None)
+    assert detector.detect_motion(scene(brightness=160)) == (False, None)
+
+
+@pytest.mark.parametrize('area_test', ['integral', 'contours'])
+def test_area_tests_agree(area_test):
+    detector = BackgroundMotionDetector(min_area=500, area_test=area_test)
+    mask = np.zeros((90, 160), dtype=np.uint8)
+    mask[10:14, 10:14] = 255  # 16 pixels, 256 at full resolution
+    assert not detector.has_area(mask)
+    mask[40:48, 80:88] = 255  # 64 pixels, 1024 at full resolution
+    assert detector.has_area(mask)
+
+
+def test_region_masks_limit_motion_to_regions():
+    regions = parse_regions("door=0,0,320,360; path=320,0 640,0 640,360 320,360")
+    detector = BackgroundMotionDetector(regions=regions)
+    detector.detect_motion(scene())
+
+    detected, mask = detector.detect_motion(scene(x=450))
+
+    assert detected
+    assert set(detector.region_masks) == {'door', 'path'}
+    assert detector.region_areas['door'] == 0 and detector.region_areas['path'] > 500
+    assert not detector.region_masks['door'].any()
+    assert (mask == detector.region_masks['path']).all()
+
+    only_door = BackgroundMotionDetector(regions=parse_regions("door=0,0,320,360"))
+    only_door.detect_motion(scene())
+    assert only_door.detect_motion(scene(x=450)) == (False, None)
+
+
+def test_engines_and_parse_errors():
+    assert set(MOTION_ENGINES) == {'frame_diff', 'mog2', 'running_average'}
+    assert MOTION_ENGINES['running_average']().method == 'running_average'
+    with pytest.raises(ValueError):
+        parse_regions("0,0,10,10")
+    with pytest.raises(ValueError):
+        BackgroundMotionDetector(method='optical_flow')
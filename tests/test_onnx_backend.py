@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+
+from src.onnx_backend import GRAPH_OPTIMIZATION_LEVELS, OnnxBackend
+
+
+def make_output(boxes, num_classes=80, num_anchors=100):
+    """Builds a raw YOLOv8 output with the given (cx, cy, w, h, class_id, score) boxes."""
+    output = np.zeros((1, 4 + num_classes, num_anchors), dtype=np.float32)
+    for i, (cx, cy, w, h, class_id, score) in enumerate(boxes):
+        output[0, :4, i] = (cx, cy, w, h)
+        output[0, 4 + class_id, i] = score
+    return output
+
+
+@pytest.fixture
+def session_mock():
+    with patch('src.onnx_backend.ort.InferenceSession') as mock:
+        model_input = Mock()
+        model_input.name = "images"
+        model_input.shape = [1, 3, 640, 640]
+        mock.return_value.get_inputs.return_value = [model_input]
+        yield mock
+
+
+def test_backend_initialization(session_mock):
+    backend = OnnxBackend("model.onnx", intra_op_threads=2, inter_op_threads=1,
+                          graph_optimization_level="basic")
+
+    options = session_mock.call_args.kwargs["sess_options"]
+    assert options.intra_op_num_threads == 2
+    assert options.inter_op_num_threads == 1
+    assert backend.input_name == "images"
+    assert backend.input_size == (640, 640)
+
+
+def test_preprocess_letterboxes_to_input_size(session_mock):
+    backend = OnnxBackend("model.onnx")
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    blob, ratio, pad = backend.preprocess(image)
+
+    assert blob.shape == (1, 3, 640, 640)
+    assert blob.dtype == np.float32
+    assert ratio == 1.0
+    assert pad == (0, 80)
+
+
+def test_preprocess_keeps_rgb_channel_order(session_mock):
+    backend = OnnxBackend("model.onnx")
+    image = np.zeros((640, 640, 3), dtype=np.uint8)
+    image[..., 0] = 255
+
+    blob, _, _ = backend.preprocess(image)
+
+    assert blob[0, 0, 320, 320] == pytest.approx(1.0)
+    assert blob[0, 2, 320, 320] == 0.0
+
+
+def test_predict_maps_boxes_to_original_image(session_mock):
+    session_mock.return_value.run.return_value = [make_output([
+        (320, 320, 100, 100, 15, 0.9),
+        (322, 322, 100, 100, 15, 0.8),   # suppressed by NMS
+        (100, 200, 40, 80, 0, 0.6),
+        (500, 500, 50, 50, 2, 0.1),      # below the confidence threshold
+    ])]
+    backend = OnnxBackend("model.onnx")
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+
+    detections = backend.predict(image)
+
+    assert detections.shape == (2, 6)
+    np.testing.assert_allclose(detections[0], [270, 190, 370, 290, 0.9, 15], rtol=1e-5)
+    np.testing.assert_allclose(detections[1], [80, 80, 120, 160, 0.6, 0], rtol=1e-5)
+
+
+def test_predict_without_detections(session_mock):
+    session_mock.return_value.run.return_value = [make_output([])]
+    backend = OnnxBackend("model.onnx")
+
+    detections = backend.predict(np.zeros((640, 640, 3), dtype=np.uint8))
+
+    assert detections.shape == (0, 6)
+
+
+def test_predict_batch_runs_one_inference_call(session_mock):
+    session_mock.return_value.get_inputs.return_value[0].shape = ["batch", 3, 640, 640]
+    outputs = np.concatenate([
+        make_output([(320, 320, 100, 100, 15, 0.9)]),
+        make_output([]),
+    ])
+    session_mock.return_value.run.return_value = [outputs]
+    backend = OnnxBackend("model.onnx")
+    images = [np.zeros((640, 640, 3), dtype=np.uint8)] * 2
+
+    detections = backend.predict_batch(images)
+
+    session_mock.return_value.run.assert_called_once()
+    assert session_mock.return_value.run.call_args.args[1]["images"].shape == (2, 3, 640, 640)
+    assert [len(d) for d in detections] == [1, 0]
+
+
+def test_predict_batch_chunks_static_batch_models(session_mock):
+    session_mock.return_value.run.return_value = [make_output([])]
+    backend = OnnxBackend("model.onnx")
+    images = [np.zeros((640, 640, 3), dtype=np.uint8)] * 3
+
+    detections = backend.predict_batch(images)
+
+    assert session_mock.return_value.run.call_count == 3
+    assert len(detections) == 3
+
+
+def test_dynamic_models_use_smaller_inputs_for_small_images(session_mock):
+    session_mock.return_value.get_inputs.return_value[0].shape = ["batch", 3, "height", "width"]
+    backend = OnnxBackend("model.onnx")
+
+    blob, ratio, pad = backend.preprocess(np.zeros((250, 300, 3), dtype=np.uint8))
+
+    assert backend.target_size((360, 640)) == (640, 384)
+    assert blob.shape == (1, 3, 256, 320)
+    assert ratio == 1.0
+
+
+def test_optimized_model_is_cached_and_reused(session_mock, tmp_path):
+    model = tmp_path / "model.onnx"
+    model.write_bytes(b"model")
+
+    def create_session(path, sess_options, providers):
+        if sess_options.optimized_model_filepath:
+            with open(sess_options.optimized_model_filepath, "wb") as f:
+                f.write(b"optimized")
+        return session_mock.return_value
+    session_mock.side_effect = create_session
+
+    first = OnnxBackend(str(model), cache_dir=str(tmp_path / "cache"))
+    assert first.cache_path.read_bytes() == b"optimized"
+    assert session_mock.call_args.args[0] == str(model)
+
+    OnnxBackend(str(model), cache_dir=str(tmp_path / "cache"))
+    assert session_mock.call_args.args[0] == str(first.cache_path)
+    assert session_mock.call_args.kwargs["sess_options"].graph_optimization_level == \
+        GRAPH_OPTIMIZATION_LEVELS["disable"]
+    assert list((tmp_path / "cache").iterdir()) == [first.cache_path]
+
+    # Graphs of another optimization level and another model sharing the stem are kept.
+    other_level = OnnxBackend(str(model), cache_dir=str(tmp_path / "cache"), graph_optimization_level="basic")
+    (tmp_path / "other").mkdir()
+    (tmp_path / "other" / "model.onnx").write_bytes(b"other model")
+    other_model = OnnxBackend(str(tmp_path / "other" / "model.onnx"), cache_dir=str(tmp_path / "cache"))
+
+    # A new model file gets a new cache entry and the stale one is removed.
+    model.write_bytes(b"new model")
+    third = OnnxBackend(str(model), cache_dir=str(tmp_path / "cache"))
+    assert third.cache_path != first.cache_path
+    assert sorted((tmp_path / "cache").iterdir()) == sorted(
+        [third.cache_path, other_level.cache_path, other_model.cache_path])
@@ -0,0 +1,70 @@
+import numpy as np
+
+from src.postprocess import decode_predictions, filter_detections, nms
+
+
+def make_output(boxes, num_classes=80, num_anchors=50):
+    output = np.zeros((4 + num_classes, num_anchors), dtype=np.float32)
+    for i, (cx, cy, w, h, class_id, score) in enumerate(boxes):
+        output[:4, i] = (cx, cy, w, h)
+        output[4 + class_id, i] = score
+    return output
+
+
+def test_nms_suppresses_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.8, 0.9, 0.7], dtype=np.float32)
+
+    keep = nms(boxes, scores, 0.5)
+
+    assert keep.tolist() == [1, 2]
+
+
+def test_decode_drops_other_classes_before_nms():
+    output = make_output([
+        (100, 100, 50, 50, 2, 0.99),    # car on top of the cat must not suppress it
+        (100, 100, 50, 50, 15, 0.6),
+        (300, 300, 40, 80, 0, 0.9),
+    ])
+
+    detections = decode_predictions(output, {15: 0.25, 0: 0.25})
+
+    assert detections[:, 5].tolist() == [0, 15]
+    np.testing.assert_allclose(detections[1, :5], [75, 75, 125, 125, 0.6], rtol=1e-5)
+
+
+def test_decode_applies_per_class_thresholds():
+    output = make_output([
+        (100, 100, 50, 50, 15, 0.3),
+        (300, 300, 40, 80, 0, 0.3),
+    ])
+
+    detections = decode_predictions(output, {15: 0.25, 0: 0.5})
+
+    assert detections[:, 5].tolist() == [15]
+
+
+def test_decode_keeps_overlapping_boxes_of_different_classes():
+    output = make_output([
+        (100, 100, 50, 50, 15, 0.7),
+        (102, 102, 50, 50, 0, 0.8),
+        (104, 104, 50, 50, 0, 0.5),
+    ])
+
+    detections = decode_predictions(output, {15: 0.25, 0: 0.25})
+
+    assert detections[:, 5].tolist() == [0, 15]
+    assert detections[:, 4].tolist() == sorted(detections[:, 4].tolist(), reverse=True)
+
+
+def test_filter_detections_sorts_by_score():
+    detections = np.array([
+        [0, 0, 1, 1, 0.4, 15],
+        [0, 0, 1, 1, 0.9, 0],
+        [0, 0, 1, 1, 0.95, 2],
+        [0, 0, 1, 1, 0.2, 15],
+    ], dtype=np.float32)
+
+    kept = filter_detections(detections, {15: 0.3, 0: 0.3})
+
+    assert kept[:, 4].tolist() == [np.float32(0.9), np.float32(0.4)]
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from src.roi import RegionOfInterest
+
+
+def test_parse_rectangles_and_polygons():
+    roi = RegionOfInterest.parse("100,50,400,300; 10,10 200,10 200,200")
+
+    assert len(roi.polygons) == 2
+    assert roi.polygons[0].tolist() == [[100, 50], [400, 50], [400, 300], [100, 300]]
+    assert roi.bounds == (10, 10, 400, 300)
+
+
+def test_invalid_region_is_rejected():
+    with pytest.raises(ValueError):
+        RegionOfInterest([(1, 2, 3)])
+
+
+def test_crop_returns_view_and_offset():
+    roi = RegionOfInterest([(100, 50, 400, 300)])
+    image = np.zeros((360, 640, 3), dtype=np.uint8)
+
+    crop, offset = roi.crop(image)
+
+    assert crop.shape == (250, 300, 3)
+    assert offset == (100, 50)
+    assert np.shares_memory(crop, image)
+
+
+def test_to_frame_maps_boxes_and_drops_outside_regions():
+    # L-shaped area: the bounding box covers (0, 0)-(200, 200) but the top right is excluded.
+    roi = RegionOfInterest([[(0, 0), (100, 0), (100, 100), (200, 100), (200, 200), (0, 200)]])
+    detections = np.array([
+        [10, 10, 50, 50, 0.9, 15],      # inside
+        [140, 10, 180, 50, 0.8, 0],     # inside the crop but outside the polygon
+    ], dtype=np.float32)
+
+    kept = roi.to_frame(detections, (5, 5), (360, 640))
+
+    assert kept.tolist() == [[15, 15, 55, 55, np.float32(0.9), 15]]
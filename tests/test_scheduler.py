@@ -0,0 +1,67 @@
+import datetime
+import pytest
+
+from src.scheduler import AdaptiveScheduler, FixedScheduler, VisitHistogram
+from utils.simulate_scheduler import simulate
+
+
+def at(day, hour, minute=0):
+    return datetime.datetime(2024, 1, day, hour, minute).timestamp()
+
+
+def test_histogram_likelihood_peaks_at_usual_visit_time():
+    histogram = VisitHistogram.from_timestamps([at(day, 7, 10) for day in range(1, 8)] + [at(3, 18)])
+
+    assert histogram.likelihood(at(9, 7, 5)) == 1.0
+    assert 0 < histogram.likelihood(at(9, 18)) < 1.0
+    assert histogram.likelihood(at(9, 2)) == 0.0
+    assert VisitHistogram().likelihood(at(9, 2)) == 0.5
+
+
+def test_adaptive_interval_follows_motion_and_visit_history():
+    scheduler = AdaptiveScheduler(min_interval=10, max_interval=300, motion_window=60)
+    scheduler.update_visits([at(day, 7) for day in range(1, 8)])
+
+    assert scheduler.next_delay(at(9, 7)) == pytest.approx(10)
+    assert scheduler.next_delay(at(9, 2)) == pytest.approx(300)
+
+    scheduler.record_cycle(at(9, 2), motion=True, decision=None)
+    assert scheduler.next_delay(at(9, 2) + 30) == pytest.approx(10)
+    assert scheduler.next_delay(at(9, 2) + 120) == pytest.approx(300)
+
+
+def test_cooldown_after_visit():
+    for scheduler in (FixedScheduler(interval=30, cooldown=7200), AdaptiveScheduler(cooldown=7200)):
+        now = at(9, 7)
+        scheduler.record_cycle(now, motion=True, decision="cat")
+
+        assert scheduler.next_delay(now) == pytest.approx(7200)
+        assert scheduler.next_delay(now + 7000) == pytest.approx(200)
+
+
+def test_fixed_interval():
+    scheduler = FixedScheduler(interval=30)
+    scheduler.record_cycle(at(9, 7), motion=True, decision="person")
+
+    assert scheduler.next_delay(at(9, 10)) == 30
+
+
+def test_invalid_bounds():
+    with pytest.raises(ValueError):
+        AdaptiveScheduler(min_interval=300, max_interval=10)
+    with pytest.raises(ValueError):
+        AdaptiveScheduler(min_interval=0)
+
+
+def test_simulation_adaptive_runs_fewer_cycles_with_same_visits_seen():
+    visits = [at(day, 7, 15) for day in range(1, 22)]
+    start, end = at(15, 0), at(22, 0)
+
+    fixed = simulate(FixedScheduler(30), visits, start, end, visit_duration=300, cycle_duration=5,
+                     false_motion_rate=0.0)
+    adaptive = simulate(AdaptiveScheduler(10, 300), visits, start, end, visit_duration=300, cycle_duration=5,
+                        false_motion_rate=0.0)
+
+    assert fixed["visits"] == adaptive["visits"] == 7
+    assert fixed["missed"] == adaptive["missed"] == 0
+    assert adaptive["cycles"] < fixed["cycles"] / 4
@@ -1,35 +1,194 @@
+import asyncio
 import cv2
 import numpy as np
-import pytest
-from unittest.mock import Mock, patch
+from telegram.error import NetworkError, RetryAfter
+
+from src.frame_artifact import FrameArtifact
 from src.telegram_notifier import TelegramNotifier
 
 
-@pytest.fixture
-def mock_bot():
-    with patch('telegram.Bot') as mock:
-        yield mock
+class StubBot:
+    """Records calls like telegram.Bot and fails the first `failures` of them."""
+    def __init__(self, failures=()):
+        self.calls = []
+        self.failures = list(failures)
+
+    async def _record(self, name, **kwargs):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.calls.append((name, kwargs))
+
+    async def send_message(self, **kwargs):
+        await self._record('send_message', **kwargs)
+
+    async def send_photo(self, **kwargs):
+        await self._record('send_photo', **kwargs)
+
+    async def send_media_group(self, **kwargs):
+        await self._record('send_media_group', **kwargs)
+
+    async def send_video(self, **kwargs):
+        await self._record('send_video', **kwargs)
+
 
+def run_notifier(notifier, enqueue):
+    async def scenario():
+        task = asyncio.create_task(notifier.run())
+        enqueue()
+        await asyncio.sleep(0)
+        await notifier.flush()
+        task.cancel()
 
-@pytest.fixture
-def telegram_notifier(mock_bot):
-    return TelegramNotifier(bot_token="dummy_token", chat_id="dummy_chat_id")
+    asyncio.run(scenario())
 
 
-def test_send_message(telegram_notifier, mock_bot):
-    message = "Test message"
-    telegram_notifier.send_message(message)
-    mock_bot.return_value.send_message.assert_called_once_with(
-        chat_id="dummy_chat_id", text=message)
+def cat_frame():
+    return FrameArtifact(np.zeros((48, 64, 3), dtype=np.uint8), 'cat',
+                         np.array([[4, 4, 40, 40, 0.9, 15]], dtype=np.float32))
 
 
-def test_send_photo(telegram_notifier, mock_bot):
+def test_send_message():
+    bot = StubBot()
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0)
+
+    run_notifier(notifier, lambda: notifier.send_message("Test message"))
+
+    assert bot.calls == [('send_message', {'chat_id': "dummy_chat_id", 'text': "Test message"})]
+
+
+def test_send_photo():
+    bot = StubBot()
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0)
     image = np.random.randint(0, 255, (480, 640, 3), dtype=np.uint8)
-    caption = "Test photo"
-
-    with patch('cv2.imencode') as mock_imencode:
-        mock_imencode.return_value = (True, np.array([1, 2, 3]))
-        telegram_notifier.send_photo(image, caption)
-        mock_imencode.assert_called_once_with('.jpg', image)
-        mock_bot.return_value.send_photo.assert_called_once_with(
-            chat_id="dummy_chat_id", photo=np.array([1, 2, 3]).tobytes(), caption=caption)
+
+    run_notifier(notifier, lambda: notifier.send_photo(image, "Test photo"))
+
+    [(name, kwargs)] = bot.calls
+    decoded = cv2.imdecode(np.frombuffer(kwargs['photo'], np.uint8), cv2.IMREAD_COLOR)
+    assert name == 'send_photo'
+    assert kwargs['caption'] == "Test photo"
+    assert decoded.shape == image.shape
+
+
+def test_send_photo_reuses_encoded_frame():
+    bot = StubBot()
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0)
+    frame = cat_frame()
+    encoded = frame.annotated_jpeg()
+
+    run_notifier(notifier, lambda: notifier.send_photo(frame, "Cat detected!"))
+
+    assert bot.calls[0][1]['photo'] is encoded
+
+
+def test_burst_of_photos_is_coalesced_into_one_album():
+    bot = StubBot()
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0.05)
+
+    def enqueue():
+        notifier.send_album([cat_frame(), cat_frame()], "Cat detected!")
+        notifier.send_photo(cat_frame(), "Cat detected!")
+        notifier.send_message("first")
+        notifier.send_message("second")
+
+    run_notifier(notifier, enqueue)
+
+    assert [name for name, _ in bot.calls] == ['send_media_group', 'send_message']
+    media = bot.calls[0][1]['media']
+    assert len(media) == 3
+    assert media[0].caption == "Cat detected!"
+    assert bot.calls[1][1]['text'] == "first\nsecond"
+
+
+def test_network_errors_are_retried_with_backoff():
+    bot = StubBot(failures=[NetworkError("down"), RetryAfter(0)])
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0, min_interval=0, backoff=0.01)
+
+    run_notifier(notifier, lambda: notifier.send_message("hello"))
+
+    assert len(bot.calls) == 1
+    assert notifier.stats == {'sent': 1, 'dropped': 0, 'retries': 2}
+
+
+def test_gives_up_after_max_retries():
+    bot = StubBot(failures=[NetworkError("down")] * 3)
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0, min_interval=0, backoff=0,
+                                max_retries=2)
+
+    run_notifier(notifier, lambda: notifier.send_message("hello"))
+
+    assert bot.calls == []
+    assert notifier.stats['dropped'] == 1
+
+
+def test_calls_are_rate_limited():
+    bot = StubBot()
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0, min_interval=0.05)
+    times = []
+    original = bot._record
+
+    async def record(name, **kwargs):
+        times.append(asyncio.get_running_loop().time())
+        await original(name, **kwargs)
+
+    bot._record = record
+
+    def enqueue():
+        notifier.send_photo(cat_frame())
+        notifier.send_message("between")
+        notifier.send_photo(cat_frame())
+
+    run_notifier(notifier, enqueue)
+
+    assert len(times) == 3
+    assert all(b - a >= 0.045 for a, b in zip(times, times[1:]))
+
+
+def test_sending_never_blocks_when_the_queue_is_full():
+    notifier = TelegramNotifier(StubBot(), "dummy_chat_id", maxsize=1)
+
+    assert notifier.send_message("one")
+    assert not notifier.send_message("two")
+    assert notifier.stats['dropped'] == 1
+
+
+def test_videos_are_sent_on_their_own(tmp_path):
+    clip = tmp_path / 'clip.mp4'
+    clip.write_bytes(b'mp4 data')
+    bot = StubBot()
+    notifier = TelegramNotifier(bot, "dummy_chat_id", min_interval=0)
+
+    def enqueue():
+        notifier.send_video(str(clip), "Cat clip")
+        notifier.send_video(str(clip), "Cat clip")
+
+    run_notifier(notifier, enqueue)
+
+    assert [name for name, _ in bot.calls] == ['send_video', 'send_video']
+    assert bot.calls[0][1]['video'] == b'mp4 data'
+    assert bot.calls[0][1]['caption'] == "Cat clip"
+
+
+def test_send_current_frame_with_detections():
+    from unittest.mock import Mock
+    from src.detection import CatDetector
+
+    bot = StubBot()
+    notifier = TelegramNotifier(bot, "dummy_chat_id", coalesce_window=0)
+    camera = Mock()
+    camera.capture_frame.return_value = np.zeros((48, 64, 3), dtype=np.uint8)
+    detector = Mock(spec=CatDetector)
+    detector.detect.return_value = np.array([[4, 4, 40, 40, 0.9, 15]], dtype=np.float32)
+    detector.classify.return_value = 'cat'
+    detector.scores.return_value = {'cat': 0.9, 'person': 0.0}
+
+    async def scenario():
+        task = asyncio.create_task(notifier.run())
+        await notifier.send_current_frame(camera, detector=detector)
+        await notifier.flush()
+        task.cancel()
+
+    asyncio.run(scenario())
+
+    assert [name for name, _ in bot.calls] == ['send_photo']
+    assert bot.calls[0][1]['caption'] == "Current Frame (cat 0.90, person 0.00)"
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from unittest.mock import Mock, patch
+
+from src.detection import CatDetector
+from src.thermal import QUALITY_LEVELS, ThermalGovernor
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    (tmp_path / 'sys/class/thermal/thermal_zone0').mkdir(parents=True)
+    (tmp_path / 'sys/devices/system/cpu/cpu0/cpufreq').mkdir(parents=True)
+    (tmp_path / 'proc').mkdir()
+
+    def write(temperature, allowed_mhz=2400, load=0.1):
+        (tmp_path / 'sys/class/thermal/thermal_zone0/temp').write_text(f"{int(temperature * 1000)}\n")
+        cpufreq = tmp_path / 'sys/devices/system/cpu/cpu0/cpufreq'
+        (cpufreq / 'scaling_cur_freq').write_text("1500000\n")
+        (cpufreq / 'scaling_max_freq').write_text(f"{allowed_mhz * 1000}\n")
+        (cpufreq / 'cpuinfo_max_freq').write_text("2400000\n")
+        (tmp_path / 'proc/loadavg').write_text(f"{load} 0.5 0.5 1/100 1234\n")
+
+    write(45)
+    return tmp_path, write
+
+
+def test_levels_follow_temperature_with_hysteresis(sysfs):
+    root, write = sysfs
+    governor = ThermalGovernor(str(root), thresholds=(65, 72, 78), hysteresis=3)
+
+    assert governor.update() == 0
+    write(73)
+    assert governor.update() == 2
+    write(70)
+    assert governor.update() == 2
+    write(68)
+    assert governor.update() == 1
+    write(90)
+    assert governor.update() == 3
+    write(40)
+    assert governor.update() == 0
+
+
+def test_throttled_clock_and_load_raise_the_level(sysfs):
+    root, write = sysfs
+    governor = ThermalGovernor(str(root))
+
+    write(45, allowed_mhz=1500)
+    assert governor.update() == 1
+    write(45, load=1000)
+    assert governor.update() == 1
+    write(45)
+    assert governor.update() == 0
+
+
+def test_missing_sensors_keep_full_quality(tmp_path):
+    governor = ThermalGovernor(str(tmp_path))
+
+    assert governor.update() == 0
+    assert governor.read_temperature() is None
+
+
+def test_apply_sets_detector_and_worker(sysfs):
+    root, write = sysfs
+    governor = ThermalGovernor(str(root), max_batch_size=2)
+    detector, worker = Mock(), Mock()
+    write(80)
+    governor.update()
+
+    governor.apply(detector, worker)
+
+    assert detector.input_scale == QUALITY_LEVELS[3]['input_scale']
+    assert worker.batch_size == 1
+    assert worker.frame_interval == QUALITY_LEVELS[3]['frame_interval']
+
+    write(45)
+    governor.update()
+    governor.apply(detector, worker)
+    assert detector.input_scale == 1.0
+    assert worker.batch_size == 2
+
+
+def test_detector_input_scale_shrinks_frames_and_maps_boxes_back():
+    with patch('src.onnx_backend.OnnxBackend') as backend_mock:
+        backend_mock.return_value.predict_batch.side_effect = lambda images: [
+            np.array([[10, 10, 50, 40, 0.9, 15]], dtype=np.float32) for _ in images]
+        backend_mock.return_value.dynamic_input = True
+        detector = CatDetector("model.onnx")
+        detector.input_scale = 0.5
+
+        detections = detector.detect(np.zeros((360, 640, 3), dtype=np.uint8))
+
+        assert backend_mock.return_value.predict_batch.call_args.args[0][0].shape == (180, 320, 3)
+        assert detections[0, :4].tolist() == [20, 20, 100, 80]
+
+
+def test_detector_input_scale_is_skipped_for_static_models():
+    with patch('src.onnx_backend.OnnxBackend') as backend_mock:
+        backend_mock.return_value.predict_batch.side_effect = lambda images: [
+            np.array([[10, 10, 50, 40, 0.9, 15]], dtype=np.float32) for _ in images]
+        backend_mock.return_value.dynamic_input = False
+        detector = CatDetector("model.onnx")
+        detector.input_scale = 0.5
+
+        detections = detector.detect(np.zeros((360, 640, 3), dtype=np.uint8))
+
+        assert backend_mock.return_value.predict_batch.call_args.args[0][0].shape == (360, 640, 3)
+        assert detections[0, :4].tolist() == [10, 10, 50, 40]
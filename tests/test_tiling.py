@@ -0,0 +1,117 @@
+import numpy as np
+from unittest.mock import Mock
+
+from src.camera import Camera
+from src.cascade import CascadeDetector
+from src.detection import CatDetector
+from src.frame_source import CapturedFrame, FrameSource
+from src.roi import RegionOfInterest
+from src.tiling import TiledDetector, merge_detections, tile_grid, tiles_with_motion
+
+
+def test_tile_grid_covers_frame_with_equal_tiles():
+    tiles = tile_grid((1080, 1920), tile_size=640, overlap=0.2)
+
+    assert [t[0] for t in tiles[:4]] == [0, 512, 1024, 1280]
+    assert sorted({t[1] for t in tiles}) == [0, 440]
+    assert {(t[2] - t[0], t[3] - t[1]) for t in tiles} == {(640, 640)}
+    assert max(t[2] for t in tiles) == 1920 and max(t[3] for t in tiles) == 1080
+    assert tile_grid((360, 640), tile_size=640) == [(0, 0, 640, 360)]
+
+
+def test_tiles_with_motion_uses_downscaled_mask():
+    tiles = tile_grid((1080, 1920), tile_size=640, overlap=0.2)
+    mask = np.zeros((90, 160), dtype=np.uint8)
+    mask[80:85, 5:8] = 255  # bottom left corner of the frame
+
+    assert [tiles[i] for i in tiles_with_motion(tiles, (1080, 1920), mask)] == [(0, 440, 640, 1080)]
+
+
+def test_merge_detections_offsets_and_suppresses_seam_duplicates():
+    left = np.array([[600, 10, 700, 60, 0.9, 15]], dtype=np.float32)
+    right = np.array([[88, 10, 188, 60, 0.7, 15], [88, 10, 188, 60, 0.6, 0]], dtype=np.float32)
+
+    merged = merge_detections([left, right, np.empty((0, 6))], [(0, 0), (512, 0), (1024, 0)])
+
+    assert merged[:, 4].tolist() == [np.float32(0.9), np.float32(0.6)]
+    assert merged[1, :4].tolist() == [600, 10, 700, 60]
+    assert merge_detections([np.empty((0, 6))], [(0, 0)]).shape == (0, 6)
+
+
+def tile_detector(roi=None):
+    detector = Mock(spec=CatDetector)
+    detector.roi = roi
+    detector.derive.return_value = Mock(spec=CatDetector)
+    # A distant cat in the bottom left tile, nothing in the whole frame.
+    detector.derive.return_value.detect_batch.side_effect = lambda tiles: [
+        np.array([[10, 20, 40, 50, 0.8, 15]], dtype=np.float32) if i == 0 else np.empty((0, 6), dtype=np.float32)
+        for i in range(len(tiles))]
+    return detector
+
+
+def test_tiled_detector_batches_moving_tiles_and_full_frame():
+    detector = tile_detector()
+    tiler = TiledDetector(detector, tile_size=640, overlap=0.2)
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    mask = np.zeros((90, 160), dtype=np.uint8)
+    mask[80:85, 5:8] = 255
+
+    detections = tiler.detect(frame, mask)
+
+    detector.derive.assert_called_once_with(input_scale=1.0)
+    batch = detector.derive.return_value.detect_batch.call_args.args[0]
+    assert len(batch) == 2
+    assert all(tile.shape == (640, 640, 3) for tile in batch)
+    assert detections[:, :4].tolist() == [[10, 460, 40, 490]]
+
+    tiler.detect(frame)
+    assert len(detector.derive.return_value.detect_batch.call_args.args[0]) == 9
+
+
+def test_tiled_detector_applies_roi_in_lores_pixels():
+    detector = tile_detector(RegionOfInterest([(320, 0, 640, 360)]))
+    tiler = TiledDetector(detector, tile_size=640, overlap=0.2)
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+
+    assert len(tiler.detect(frame, None, (360, 640))) == 0
+    # Only tiles reaching into the right half are inferred, plus the whole frame.
+    assert len(detector.derive.return_value.detect_batch.call_args.args[0]) == 7
+
+
+def test_camera_detects_on_tiles_of_main_frame():
+    detector = tile_detector()
+    detector.classify.side_effect = lambda d: 'cat' if len(d) else 'none'
+    detector.scores.return_value = {'cat': 0.8, 'person': 0.0}
+    source = Mock(spec=FrameSource)
+    release = Mock()
+    source.capture.return_value = CapturedFrame(lambda: np.zeros((360, 640, 3), dtype=np.uint8),
+                                                lambda: np.zeros((1080, 1920, 3), dtype=np.uint8), release)
+    camera = Camera(detector, motion_gating=False, source=source, tiler=TiledDetector(detector))
+
+    detection_type, artifact, _ = camera.capture_and_detect()
+
+    detector.detect.assert_not_called()
+    assert detection_type == 'cat'
+    assert artifact.image.shape == (1080, 1920, 3)
+    assert artifact.detections[:, :4].tolist() == [[10, 20, 40, 50]]
+    release.assert_called_once()
+
+
+def test_tiled_detector_runs_cascade_on_tiles():
+    roi = RegionOfInterest([(0, 0, 640, 360)])
+    screen, confirm = tile_detector(roi), tile_detector(roi)
+    frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+    mask = np.zeros((90, 160), dtype=np.uint8)
+    mask[80:85, 5:8] = 255
+
+    tiler = TiledDetector(CascadeDetector(screen, confirm))
+    detections = tiler.detect(frame, mask, (360, 640))
+
+    screen.derive.assert_called_once_with(input_scale=1.0)
+    confirm.derive.assert_called_once_with(None, 1.0)
+    assert tiler.roi is roi
+    assert screen.derive.return_value.roi is None and confirm.derive.return_value.roi is None
+    assert screen.roi is roi and confirm.roi is roi
+    # Only the tile with a candidate is confirmed.
+    assert len(confirm.derive.return_value.detect_batch.call_args.args[0]) == 1
+    assert detections[:, :4].tolist() == [[10, 460, 40, 490]]
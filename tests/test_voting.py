@@ -0,0 +1,78 @@
+from src.voting import MajorityVote, SequentialProbabilityRatioTest
+
+
+NOTHING = {'cat': 0.0, 'person': 0.0}
+CAT = {'cat': 0.9, 'person': 0.0}
+PERSON = {'cat': 0.0, 'person': 0.95}
+
+
+def run_engine(engine, frames):
+    engine.reset()
+    for detection_type, scores in frames:
+        decision = engine.update(detection_type, scores)
+        if decision is not None:
+            return decision, engine.frames_used
+    return None, engine.frames_used
+
+
+def test_majority_vote_needs_more_than_three_hits():
+    engine = MajorityVote(max_frames=5)
+
+    assert run_engine(engine, [('cat', CAT)] * 5) == ('cat', 4)
+    assert run_engine(engine, [('cat', CAT)] * 3 + [('none', NOTHING)] * 2) == ('none', 5)
+
+
+def test_sprt_stops_after_one_empty_frame():
+    engine = SequentialProbabilityRatioTest(max_frames=5)
+
+    assert run_engine(engine, [('none', NOTHING)] * 5) == ('none', 1)
+    assert run_engine(engine, [('no motion', NOTHING)] * 5) == ('none', 1)
+
+
+def test_sprt_confirms_cat_and_person_early():
+    engine = SequentialProbabilityRatioTest(max_frames=5)
+
+    assert run_engine(engine, [('cat', CAT)] * 5) == ('cat', 2)
+    assert run_engine(engine, [('person', PERSON)] * 5) == ('person', 2)
+
+
+def test_sprt_confirms_cat_at_moderate_confidence():
+    engine = SequentialProbabilityRatioTest(max_frames=5)
+    frames = [('cat', {'cat': 0.55, 'person': 0.0})] * 5
+
+    assert run_engine(engine, frames) == ('cat', 3)
+    # Below the threshold a frame is a miss, however many of them there are.
+    below = SequentialProbabilityRatioTest(max_frames=5, thresholds={'cat': 0.6})
+    assert run_engine(below, frames) == ('none', 1)
+
+
+def test_sprt_decides_sooner_on_higher_confidence():
+    engine = SequentialProbabilityRatioTest(max_frames=5)
+    frames_used = [run_engine(engine, [('cat', {'cat': score, 'person': 0.0})] * 5)[1]
+                   for score in (0.95, 0.75, 0.55, 0.3)]
+
+    assert frames_used == sorted(frames_used)
+    assert frames_used[0] < frames_used[2] < frames_used[3]
+    # Scores from the threshold up count as evidence, below it as a miss.
+    assert run_engine(engine, [('cat', {'cat': 0.25, 'person': 0.0})] * 5) == ('cat', 4)
+    assert engine._frame_llr('cat', 0.24) < 0 < engine._frame_llr('cat', 0.25)
+
+
+def test_sprt_gives_up_on_ambiguous_evidence():
+    engine = SequentialProbabilityRatioTest(max_frames=5)
+    seen = ('cat', {'cat': 0.55, 'person': 0.0})
+    frames = [seen, ('none', NOTHING), seen, ('none', NOTHING), seen]
+
+    decision, frames_used = run_engine(engine, frames)
+
+    assert decision == 'none'
+    assert frames_used == 5
+
+
+def test_sprt_reset_clears_evidence():
+    engine = SequentialProbabilityRatioTest(max_frames=5)
+    engine.update('cat', CAT)
+    engine.reset()
+
+    assert engine.frames_used == 0
+    assert engine.llr == {'cat': 0.0, 'person': 0.0}
@@ -1,6 +1,7 @@
 import os
 import cv2
 import time
+import numpy as np
 from dotenv import load_dotenv
 from src.camera import Camera
 from src.detection import CatDetector
@@ -17,11 +18,11 @@ def main():
             camera.update_motion_detector()
             if camera.is_motion_detected():
                 print("Motion detected! Checking for cats/persons...")
-                detection_type, detected_image, _ = camera.capture_and_detect()
+                detection_type, frame, _ = camera.capture_and_detect()
 
                 if detection_type in ["cat", "person"]:
                     print(f"{detection_type.capitalize()} detected!")
-                    cv2.imshow("Detection", detected_image)
+                    cv2.imshow("Detection", cv2.imdecode(np.frombuffer(frame.annotated_jpeg(), np.uint8), cv2.IMREAD_COLOR))
                 else:
                     print("No cat or person detected.")
 
@@ -1,12 +1,13 @@
-import cv2
 import os
+import asyncio
+import telegram
 from dotenv import load_dotenv
 from src.camera import Camera
 from src.detection import CatDetector
 from src.telegram_notifier import TelegramNotifier
 
 
-def main():
+async def main():
     # Load environment variables
     load_dotenv()
     bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -18,24 +19,25 @@ def main():
     camera = Camera(detector)
 
     # Initialize Telegram Notifier
-    notifier = TelegramNotifier(bot_token, chat_id)
+    async with telegram.Bot(token=bot_token) as bot:
+        notifier = TelegramNotifier(bot, chat_id)
+        sender = asyncio.create_task(notifier.run())
 
-    # Capture image
-    print("Capturing image...")
-    _, image, _ = camera.capture_and_detect()
+        # Capture image
+        print("Capturing image...")
+        _, image, _ = camera.capture_and_detect()
 
-    # Send test message
-    print("Sending test message...")
-    notifier.send_message("Hello, this is a test message from Raspberry Pi!")
+        # Send test message
+        print("Sending test message...")
+        notifier.send_message("Hello, this is a test message from Raspberry Pi!")
 
-    # Send captured image
-    if image is not None:
+        # Send captured image
         print("Sending captured image...")
-        notifier.send_photo(
-            image, "This is a test image captured by the Raspberry Pi camera.")
-    else:
-        print("No image captured.")
+        notifier.send_photo(image, "This is a test image captured by the Raspberry Pi camera.")
+
+        await notifier.flush()
+        sender.cancel()
 
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+import time
+import argparse
+import numpy as np
+from typing import List
+from src.frame_source import open_source
+from utils.motion_detection import MOTION_ENGINES, MotionDetector
+
+
+def synthetic_frames(count: int, frame_size=(640, 360), speed: float = 1.0, light_change_at: int = -1,
+                     seed: int = 0) -> List[np.ndarray]:
+    """
+    Builds a noisy static scene with a cat-sized square walking across it.
+
+    Args:
+        count (int): Number of frames.
+        frame_size: The (width, height) of the frames.
+        speed (float): Pixels the square moves per frame, low values imitate a slowly walking cat.
+        light_change_at (int): Frame from which the scene is brighter, -1 for constant light.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        List[np.ndarray]: RGB frames.
+    """
+    rng = np.random.default_rng(seed)
+    width, height = frame_size
+    scene = rng.integers(60, 120, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = scene.copy()
+        if 0 <= light_change_at <= i:
+            frame = np.clip(frame.astype(np.int16) + 60, 0, 255).astype(np.uint8)
+        x = int(20 + i * speed) % (width - 60)
+        frame[height // 2:height // 2 + 40, x:x + 60] = 200
+        frame = np.clip(frame + rng.integers(-3, 4, frame.shape), 0, 255).astype(np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def run(detector: MotionDetector, frames: List[np.ndarray]) -> dict:
+    """
+    Times the motion detector on every frame.
+
+    Returns:
+        dict: Frames with motion and the median and p95 milliseconds per frame.
+    """
+    timings, motion = [], 0
+    for frame in frames:
+        start = time.perf_counter()
+        detected, _ = detector.detect_motion(frame)
+        timings.append((time.perf_counter() - start) * 1000)
+        motion += detected
+    p50, p95 = np.percentile(timings, [50, 95])
+    return {"motion_frames": motion, "p50_ms": float(p50), "p95_ms": float(p95)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the per-frame cost and motion rate of the motion engines")
+    parser.add_argument("--source", type=str, default=None,
+                        help="Video file or image folder to replay, a synthetic scene if unset")
+    parser.add_argument("--frames", type=int, default=300, help="Number of frames")
+    parser.add_argument("--speed", type=float, default=1.0, help="Pixels per frame of the synthetic cat")
+    parser.add_argument("--light-change-at", type=int, default=150,
+                        help="Frame at which the synthetic scene gets brighter, -1 for constant light")
+    args = parser.parse_args()
+
+    if args.source:
+        source = open_source(args.source)
+        frames = []
+        try:
+            while len(frames) < args.frames:
+                frames.append(source.capture_lores().copy())
+        except EOFError:
+            pass
+    else:
+        frames = synthetic_frames(args.frames, speed=args.speed, light_change_at=args.light_change_at)
+
+    engines = {name: engine() for name, engine in MOTION_ENGINES.items()}
+    engines["mog2 contours"] = MOTION_ENGINES["mog2"](area_test="contours")
+    print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'engine':>16} {'motion':>7} {'p50 ms':>8} {'p95 ms':>8}")
+    for name, detector in engines.items():
+        result = run(detector, frames)
+        print(f"{name:>16} {result['motion_frames']:>7} {result['p50_ms']:>8.3f} {result['p95_ms']:>8.3f}")
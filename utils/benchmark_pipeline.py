@@ -0,0 +1,163 @@
+import json
+import time
+import asyncio
+import resource
+import argparse
+import tempfile
+from typing import Dict, Optional
+from src.archive import DetectionArchive
+from src.camera import Camera
+from src.detection import CatDetector
+from src.detection_worker import DetectionWorker
+from src.frame_broker import brokered
+from src.frame_source import open_source
+from src.metrics import METRICS, Metrics
+
+
+def summarize(metrics: Metrics = METRICS) -> Dict[str, Dict[str, float]]:
+    """
+    Computes count and p50/p95/p99 latency of every stage the pipeline recorded.
+
+    Args:
+        metrics (Metrics): The metrics the pipeline observed its stages into.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Per-stage count and percentiles in milliseconds, estimated
+                                     from the histogram buckets like /stats does.
+    """
+    return {stage: {"count": histogram.count, "p50_ms": histogram.quantile(0.5) * 1000,
+                    "p95_ms": histogram.quantile(0.95) * 1000, "p99_ms": histogram.quantile(0.99) * 1000}
+            for stage, histogram in metrics.histograms.items() if histogram.count}
+
+
+def peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of this process in MB.
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def is_end_of_source(error: Optional[BaseException]) -> bool:
+    """
+    Whether a detection error was caused by the replayed source running out of frames.
+
+    Camera reports every capture error as RuntimeError("CameraError"), raised while
+    handling the original one.
+    """
+    while error is not None:
+        if isinstance(error, EOFError):
+            return True
+        error = error.__context__
+    return False
+
+
+async def run_pipeline(worker: DetectionWorker, archive: DetectionArchive, max_frames: int, burst: int,
+                       persist_all: bool) -> dict:
+    """
+    Runs detection cycles through the detection worker until the source is exhausted.
+
+    Every cycle asks the worker for a burst of results like the bot does, so
+    capture, motion gating and batched inference run through Camera.burst_detect.
+    Detections are encoded with their boxes drawn, as for a notification, and
+    submitted to the archive, which encodes and writes them on its own thread.
+
+    Args:
+        worker (DetectionWorker): The worker driving the camera on the replayed source.
+        archive (DetectionArchive): Where detection frames are persisted.
+        max_frames (int): Maximum number of frames to process, 0 for the whole source.
+        burst (int): Frames requested per detection cycle.
+        persist_all (bool): Also persist inferred frames without a detection.
+
+    Returns:
+        dict: Frame counts, fps, the pipeline's per-stage latency summary and counters, and peak RSS.
+    """
+    loop = asyncio.get_running_loop()
+    counts = {"frames": 0, "detections": 0}
+    task = asyncio.create_task(worker.run())
+    start = time.perf_counter()
+    try:
+        while not max_frames or counts["frames"] < max_frames:
+            size = min(burst, max_frames - counts["frames"]) if max_frames else burst
+            try:
+                async for detection_type, frame, scores in worker.frames(size):
+                    counts["frames"] += 1
+                    if detection_type in ("cat", "person"):
+                        counts["detections"] += 1
+                        await loop.run_in_executor(None, frame.annotated_jpeg)
+                        archive.submit(frame, scores[detection_type])
+                    elif persist_all and detection_type == "none":
+                        archive.submit(frame, 0.0)
+            except RuntimeError as e:
+                if is_end_of_source(e):
+                    break
+                raise
+        await loop.run_in_executor(None, archive.flush)
+    finally:
+        task.cancel()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "counts": {**counts, **worker.camera.gating_stats(), "archive_dropped": archive.dropped},
+        "seconds": elapsed,
+        "fps": counts["frames"] / elapsed if elapsed > 0 else 0.0,
+        "stages": summarize(),
+        "counters": {counter: value for counter, value in METRICS.counters.items() if value},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def print_report(report: dict):
+    """
+    Prints a benchmark report as a table.
+    """
+    counts = report["counts"]
+    print(f"{counts['frames']} frames in {report['seconds']:.2f} s ({report['fps']:.1f} fps), "
+          f"{counts['gated']} gated, {counts['inferred']} inferred, {counts['detections']} detections")
+    print(f"{'stage':>14} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, summary in report["stages"].items():
+        print(f"{stage:>14} {summary['count']:>7} {summary['p50_ms']:>9.2f} "
+              f"{summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f}")
+    if report["counters"]:
+        print(", ".join(f"{counter.replace('_', ' ')} {value}" for counter, value in report["counters"].items()))
+    print(f"Peak RSS: {report['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline on a recorded clip")
+    parser.add_argument("--model", type=str, required=True, help="Path to the model")
+    parser.add_argument("--source", type=str, required=True,
+                        help="Video file or directory of images to replay")
+    parser.add_argument("--frames", type=int, default=0, help="Maximum frames to process, 0 for all")
+    parser.add_argument("--burst", type=int, default=5, help="Frames per detection cycle")
+    parser.add_argument("--batch-size", type=int, default=5,
+                        help="Frames captured and inferred together, 1 disables batching")
+    parser.add_argument("--broker-fps", type=float, default=None,
+                        help="Read the source through a frame broker capturing at this rate, "
+                             "which skips the frames detection is too slow for")
+    parser.add_argument("--no-motion", action="store_true", help="Disable motion gating")
+    parser.add_argument("--persist-all", action="store_true",
+                        help="Also persist inferred frames without a detection")
+    parser.add_argument("--output-dir", type=str, default=None,
+                        help="Where the archive writes frames, a temporary directory by default")
+    parser.add_argument("--json", type=str, default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    source = open_source(args.source)
+    if args.broker_fps is not None:
+        source = brokered(source, fps=args.broker_fps or None)
+    camera = Camera(CatDetector(args.model), motion_gating=not args.no_motion, source=source)
+    worker = DetectionWorker(camera, batch_size=args.batch_size)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = DetectionArchive(args.output_dir or tmp)
+        try:
+            report = asyncio.run(run_pipeline(worker, archive, args.frames, args.burst, args.persist_all))
+        finally:
+            archive.close()
+            worker.shutdown()
+            camera.source.close()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
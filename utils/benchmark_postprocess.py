@@ -0,0 +1,73 @@
+import argparse
+import timeit
+import numpy as np
+from src.postprocess import CAT_CLASS_ID, PERSON_CLASS_ID, DEFAULT_CLASS_THRESHOLDS, decode_predictions, nms
+
+
+def synthetic_output(num_anchors: int, num_classes: int, num_objects: int, seed: int = 0) -> np.ndarray:
+    """
+    Builds a raw YOLOv8 output with noise scores and a few confident objects.
+
+    Args:
+        num_anchors (int): Number of anchors in the output.
+        num_classes (int): Number of classes in the output.
+        num_objects (int): Number of anchors carrying a confident detection.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        np.ndarray: Array of shape (4 + num_classes, num_anchors).
+    """
+    rng = np.random.default_rng(seed)
+    output = np.empty((4 + num_classes, num_anchors), dtype=np.float32)
+    output[:2] = rng.uniform(0, 640, (2, num_anchors))
+    output[2:4] = rng.uniform(10, 200, (2, num_anchors))
+    output[4:] = rng.uniform(0, 0.1, (num_classes, num_anchors))
+
+    objects = rng.choice(num_anchors, num_objects, replace=False)
+    output[4 + rng.integers(0, num_classes, num_objects), objects] = rng.uniform(0.5, 1.0, num_objects)
+    return output
+
+
+def per_box_postprocess(output: np.ndarray, conf_threshold: float = 0.25, iou_threshold: float = 0.45):
+    """
+    Reference implementation of the previous path: decode every class, NMS all boxes,
+    then loop over them in Python and return the first cat or person.
+    """
+    predictions = output.T
+    boxes = []
+    for row in predictions:
+        class_id = int(row[4:].argmax())
+        score = float(row[4 + class_id])
+        if score < conf_threshold:
+            continue
+        cx, cy, w, h = row[:4]
+        boxes.append((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, score, class_id))
+
+    if not boxes:
+        return None
+
+    boxes = np.asarray(boxes, dtype=np.float32)
+    for i in nms(boxes[:, :4], boxes[:, 4], iou_threshold):
+        if int(boxes[i, 5]) in (CAT_CLASS_ID, PERSON_CLASS_ID):
+            return boxes[i]
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare vectorized postprocessing with the per-box loop")
+    parser.add_argument("--anchors", type=int, default=8400, help="Number of anchors in the raw output")
+    parser.add_argument("--classes", type=int, default=80, help="Number of classes in the raw output")
+    parser.add_argument("--objects", type=int, default=20, help="Number of confident objects")
+    parser.add_argument("--repeat", type=int, default=50, help="Number of timed runs per implementation")
+    args = parser.parse_args()
+
+    output = synthetic_output(args.anchors, args.classes, args.objects)
+
+    implementations = {
+        "per-box loop": lambda: per_box_postprocess(output),
+        "vectorized": lambda: decode_predictions(output, DEFAULT_CLASS_THRESHOLDS),
+    }
+
+    for name, func in implementations.items():
+        runs = timeit.repeat(func, number=1, repeat=args.repeat)
+        print(f"{name:>14}: median {np.median(runs) * 1000:.3f} ms, min {min(runs) * 1000:.3f} ms")
@@ -1,5 +1,237 @@
+import json
+import time
 import argparse
-from ultralytics import YOLO
+import logging
+import cv2
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional
+from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+from onnxruntime.quantization.shape_inference import quant_pre_process
+from src.onnx_backend import OnnxBackend
+
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+EVAL_LABELS = ("cat", "person", "none")
+
+
+def find_images(folder: str, limit: Optional[int] = None) -> List[Path]:
+    """
+    Lists the images below a folder, sorted by path.
+
+    Args:
+        folder (str): The folder to search recursively.
+        limit (Optional[int]): Maximum number of images, spread evenly over the folder.
+
+    Returns:
+        List[Path]: The image paths.
+    """
+    images = sorted(p for p in Path(folder).rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    if limit and len(images) > limit:
+        images = [images[i] for i in np.linspace(0, len(images) - 1, limit).astype(int)]
+    return images
+
+
+def read_rgb(path: Path) -> Optional[np.ndarray]:
+    """
+    Reads an image as RGB, the channel order of the camera frames.
+
+    Args:
+        path (Path): The image file.
+
+    Returns:
+        Optional[np.ndarray]: The RGB image, None if it cannot be read.
+    """
+    image = cv2.imread(str(path))
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB) if image is not None else None
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """
+    Feeds real frames to the onnxruntime calibrator, preprocessed exactly like at inference.
+
+    Attributes:
+        backend (OnnxBackend): The FP32 backend whose preprocessing is reused.
+        images (List[Path]): The calibration images.
+    """
+    def __init__(self, backend: OnnxBackend, images: List[Path]):
+        self.backend = backend
+        self.images = images
+        self._iterator = iter(images)
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        for path in self._iterator:
+            image = read_rgb(path)
+            if image is None:
+                logging.warning(f"Skipping unreadable calibration image: {path}")
+                continue
+            blob, _, _ = self.backend.preprocess(image)
+            return {self.backend.input_name: blob}
+        return None
+
+    def rewind(self):
+        self._iterator = iter(self.images)
+
+
+def export_fp32(model: str, imgsz: int, dynamic: bool, export_format: str = "onnx") -> str:
+    """
+    Exports an ultralytics model, or passes an existing ONNX file through.
+
+    Args:
+        model (str): Model name or path.
+        imgsz (int): Export input size.
+        dynamic (bool): Export with dynamic axes.
+        export_format (str): The export format.
+
+    Returns:
+        str: Path of the exported model.
+    """
+    if model.endswith(".onnx"):
+        return model
+
+    from ultralytics import YOLO
+    return str(YOLO(model).export(format=export_format, imgsz=imgsz, dynamic=dynamic))
+
+
+def head_nodes(model_path: str, prefix: str) -> List[str]:
+    """
+    Lists the nodes of the detection head, which lose too much accuracy when quantized.
+
+    Args:
+        model_path (str): Path to the ONNX model.
+        prefix (str): Name prefix of the head nodes, '/model.22/' for YOLOv8.
+
+    Returns:
+        List[str]: The node names.
+    """
+    import onnx
+    return [node.name for node in onnx.load(model_path).graph.node if node.name.startswith(prefix)]
+
+
+def quantize_int8(fp32_path: str, int8_path: str, calibration_images: List[Path],
+                  exclude_prefix: Optional[str] = "/model.22/") -> str:
+    """
+    Statically quantizes a model to INT8 using calibration frames.
+
+    Args:
+        fp32_path (str): The FP32 ONNX model.
+        int8_path (str): Where to write the INT8 model.
+        calibration_images (List[Path]): Frames used to calibrate activation ranges.
+        exclude_prefix (Optional[str]): Name prefix of nodes kept in FP32.
+
+    Returns:
+        str: Path of the quantized model.
+    """
+    prepared_path = str(Path(int8_path).with_name(Path(fp32_path).stem + "_prep.onnx"))
+    quant_pre_process(fp32_path, prepared_path, skip_symbolic_shape=True)
+
+    try:
+        backend = OnnxBackend(prepared_path)
+        reader = FrameCalibrationReader(backend, calibration_images)
+        excluded = head_nodes(prepared_path, exclude_prefix) if exclude_prefix else []
+
+        logging.info(f"Calibrating on {len(calibration_images)} frames, keeping {len(excluded)} head nodes in FP32")
+        quantize_static(prepared_path, int8_path, reader, quant_format=QuantFormat.QDQ,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+                        per_channel=True, nodes_to_exclude=excluded)
+    finally:
+        Path(prepared_path).unlink(missing_ok=True)
+    return int8_path
+
+
+def measure_latency(backend: OnnxBackend, images: List[np.ndarray], runs: int) -> Dict[str, float]:
+    """
+    Measures end-to-end predict latency.
+
+    Args:
+        backend (OnnxBackend): The backend to measure.
+        images (List[np.ndarray]): Images to cycle through.
+        runs (int): Number of timed runs, after one warm-up run.
+
+    Returns:
+        Dict[str, float]: Median and p95 latency in milliseconds.
+    """
+    backend.predict(images[0])
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        backend.predict(images[i % len(images)])
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"median_ms": float(np.median(timings)), "p95_ms": float(np.percentile(timings, 95))}
+
+
+def predict_labels(backend: OnnxBackend, eval_dir: str) -> Dict[str, List[str]]:
+    """
+    Predicts the top label of every image in a labelled set laid out as
+    eval_dir/{cat,person,none}/*.jpg.
+
+    Args:
+        backend (OnnxBackend): The backend to evaluate.
+        eval_dir (str): The labelled image folder.
+
+    Returns:
+        Dict[str, List[str]]: Predicted labels ('cat', 'person' or 'none') per folder label.
+    """
+    class_labels = {15: "cat", 0: "person"}
+    predictions = {}
+    for label in EVAL_LABELS:
+        predictions[label] = []
+        for path in find_images(str(Path(eval_dir) / label)):
+            image = read_rgb(path)
+            if image is None:
+                logging.warning(f"Skipping unreadable evaluation image: {path}")
+                continue
+            detections = backend.predict(image)
+            predictions[label].append(class_labels.get(int(detections[0, 5]), "none") if len(detections) else "none")
+    return predictions
+
+
+def recall(predictions: Dict[str, List[str]]) -> Dict[str, Dict[str, float]]:
+    """
+    Computes per-label recall from predict_labels() output.
+
+    Args:
+        predictions (Dict[str, List[str]]): Predicted labels per folder label.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Number of images and recall per label.
+    """
+    return {label: {"images": len(predicted), "recall": predicted.count(label) / len(predicted)}
+            for label, predicted in predictions.items() if predicted}
+
+
+def build_report(models: Dict[str, str], eval_dir: Optional[str], benchmark_images: List[np.ndarray],
+                 runs: int) -> Dict[str, dict]:
+    """
+    Collects size, latency and recall for each model variant. Variants other than
+    'fp32' also report how often their top label agrees with the FP32 model.
+
+    Args:
+        models (Dict[str, str]): Model paths by variant name.
+        eval_dir (Optional[str]): The labelled image folder, skipped if None.
+        benchmark_images (List[np.ndarray]): Images used for latency measurement.
+        runs (int): Number of timed runs per model.
+
+    Returns:
+        Dict[str, dict]: Report entries by variant name.
+    """
+    report = {}
+    reference = None
+    for name, path in models.items():
+        backend = OnnxBackend(path)
+        entry = {"path": path, "size_mb": Path(path).stat().st_size / 1e6}
+        entry.update(measure_latency(backend, benchmark_images, runs))
+        if eval_dir:
+            predictions = predict_labels(backend, eval_dir)
+            entry["recall"] = recall(predictions)
+            if name == "fp32":
+                reference = predictions
+            elif reference is not None:
+                pairs = [(a, b) for label in EVAL_LABELS for a, b in zip(reference[label], predictions[label])]
+                entry["agreement_with_fp32"] = sum(a == b for a, b in pairs) / max(len(pairs), 1)
+        report[name] = entry
+    return report
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -10,8 +242,53 @@ if __name__ == "__main__":
         type=str,
         default="onnx",
         help="Expected export format")
+    parser.add_argument(
+        "--dynamic",
+        action="store_true",
+        help="Export with a dynamic batch axis for batched inference")
+    parser.add_argument("--imgsz", type=int, default=640, help="Export input size")
+    parser.add_argument("--int8", action="store_true",
+                        help="Also build a statically quantized INT8 model")
+    parser.add_argument("--calibration-dir", type=str, default="data/detections",
+                        help="Folder of real frames used for INT8 calibration")
+    parser.add_argument("--calibration-count", type=int, default=200,
+                        help="Maximum number of calibration frames")
+    parser.add_argument("--quantize-head", action="store_true",
+                        help="Also quantize the YOLOv8 detection head (usually costs accuracy)")
+    parser.add_argument("--eval-dir", type=str, default=None,
+                        help="Labelled images in cat/, person/ and none/ subfolders for the recall report")
+    parser.add_argument("--runs", type=int, default=50, help="Timed runs per model for the latency report")
+    parser.add_argument("--report", type=str, default=None,
+                        help="Where to write the JSON report, next to the model by default")
     args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s - %(name)s - %(levelname)s - %(message)s', level=logging.INFO)
+
+    exported = export_fp32(args.model, args.imgsz, args.dynamic, args.format)
+    if args.format != "onnx":
+        raise SystemExit(0)
+
+    models = {"fp32": exported}
+    if args.int8:
+        calibration_images = find_images(args.calibration_dir, args.calibration_count)
+        if not calibration_images:
+            raise SystemExit(f"No calibration images found in {args.calibration_dir}")
+        int8_path = str(Path(exported).with_name(Path(exported).stem + "_int8.onnx"))
+        models["int8"] = quantize_int8(exported, int8_path, calibration_images,
+                                       None if args.quantize_head else "/model.22/")
+
+    sample_paths = find_images(args.eval_dir or args.calibration_dir, 10)
+    benchmark_images = [image for image in map(read_rgb, sample_paths) if image is not None] \
+        or [np.zeros((args.imgsz, args.imgsz, 3), dtype=np.uint8)]
+    report = build_report(models, args.eval_dir, benchmark_images, args.runs)
 
-    model = YOLO(args.model)
+    report_path = args.report or str(Path(exported).with_name(Path(exported).stem + "_report.json"))
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
 
-    model.export(format=args.format)
+    for name, entry in report.items():
+        print(f"{name}: {entry['size_mb']:.1f} MB, median {entry['median_ms']:.1f} ms, p95 {entry['p95_ms']:.1f} ms")
+        for label, result in entry.get("recall", {}).items():
+            print(f"    {label} recall: {result['recall']:.3f} ({result['images']} images)")
+        if "agreement_with_fp32" in entry:
+            print(f"    agreement with fp32: {entry['agreement_with_fp32']:.3f}")
+    print(f"Report written to {report_path}")
@@ -0,0 +1,92 @@
+import cv2
+import json
+import time
+import argparse
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Dict, List
+from src.cascade import CascadeDetector
+from src.detection import CatDetector
+from utils.convert_to_onnx import EVAL_LABELS, find_images, recall
+
+
+def load_eval_set(eval_dir: str) -> Dict[str, List[np.ndarray]]:
+    """
+    Loads a labelled set laid out as eval_dir/{cat,person,none}/*.jpg as RGB frames, like the cameras deliver them.
+    """
+    return {label: [cv2.cvtColor(cv2.imread(str(path)), cv2.COLOR_BGR2RGB)
+                    for path in find_images(str(Path(eval_dir) / label))]
+            for label in EVAL_LABELS}
+
+
+def evaluate(detector, frames: Dict[str, List[np.ndarray]]) -> dict:
+    """
+    Runs every frame through a detector, one frame at a time like the pipeline's first frame.
+
+    Args:
+        detector: A CatDetector or CascadeDetector.
+        frames (Dict[str, List[np.ndarray]]): Frames per label.
+
+    Returns:
+        dict: Recall per label, mean and p95 milliseconds per frame, and the predictions.
+    """
+    detector.detect(next(frame for label_frames in frames.values() for frame in label_frames))
+    predictions, timings = {}, []
+    for label, label_frames in frames.items():
+        predictions[label] = []
+        for frame in label_frames:
+            start = time.perf_counter()
+            detections = detector.detect(frame)
+            timings.append((time.perf_counter() - start) * 1000)
+            predictions[label].append(detector.classify(detections))
+    return {
+        "recall": recall(predictions),
+        "mean_ms": float(np.mean(timings)),
+        "p95_ms": float(np.percentile(timings, 95)),
+        "predictions": predictions,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the two-stage cascade with the single-pass detector")
+    parser.add_argument("--model", type=str, required=True, help="The full model, used by single pass and stage two")
+    parser.add_argument("--eval-dir", type=str, required=True,
+                        help="Labelled images in cat/, person/ and none/ subfolders")
+    parser.add_argument("--screen-model", type=str, default=None,
+                        help="Smaller model for stage one, the full model at --screen-scale if unset")
+    parser.add_argument("--screen-scale", type=float, default=None,
+                        help="Input scale of stage one, 0.5 with the shared model and 1 with a screen model")
+    parser.add_argument("--screen-threshold", type=float, default=0.1,
+                        help="Confidence a stage one candidate needs")
+    parser.add_argument("--json", type=str, default=None, help="Also write the report as JSON")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    detector = CatDetector(args.model)
+    screen_thresholds = dict.fromkeys(detector.class_thresholds, args.screen_threshold)
+    screen_scale = args.screen_scale if args.screen_scale is not None else (1.0 if args.screen_model else 0.5)
+    if args.screen_model:
+        screen = CatDetector(args.screen_model, class_thresholds=screen_thresholds)
+        screen.input_scale = screen_scale
+    else:
+        screen = detector.derive(screen_thresholds, screen_scale)
+    cascade = CascadeDetector(screen, detector)
+
+    frames = load_eval_set(args.eval_dir)
+    report = {"single": evaluate(detector, frames), "cascade": evaluate(cascade, frames)}
+    report["cascade"]["confirm_rate"] = cascade.confirm_rate
+    pairs = [(a, b) for label in EVAL_LABELS
+             for a, b in zip(report["single"]["predictions"][label], report["cascade"]["predictions"][label])]
+    report["cascade"]["agreement_with_single"] = sum(a == b for a, b in pairs) / max(len(pairs), 1)
+
+    print(f"{'mode':>8} {'mean ms':>8} {'p95 ms':>8} " + " ".join(f"{label + ' recall':>14}" for label in EVAL_LABELS))
+    for mode, entry in report.items():
+        recalls = " ".join(f"{entry['recall'].get(label, {}).get('recall', float('nan')):>14.3f}" for label in EVAL_LABELS)
+        print(f"{mode:>8} {entry['mean_ms']:>8.1f} {entry['p95_ms']:>8.1f} {recalls}")
+    print(f"Stage two ran on {report['cascade']['confirm_rate']:.1%} of frames, "
+          f"{report['cascade']['agreement_with_single']:.1%} of labels agree with the single pass")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({mode: {k: v for k, v in entry.items() if k != "predictions"} for mode, entry in report.items()},
+                      f, indent=2)
@@ -1,35 +1,59 @@
 import cv2
 import numpy as np
-from typing import Tuple, Optional
+from functools import partial
+from typing import Dict, Tuple, Optional
+from src.roi import RegionOfInterest
 
 class MotionDetector(object):
-    def __init__(self, threshold: float = 25.0, min_area: int = 500):
+    def __init__(self, threshold: float = 25.0, min_area: int = 500, scale: float = 0.25):
         """
         Initialize the MotionDetector
 
         Args:
             threshold (float): The threshold for detecting motion.
-            min_area (int): The minimum area of the contours to consider as motion.
+            min_area (int): The minimum area of the contours to consider as motion,
+                            in full-resolution pixels.
+            scale (float): Factor by which frames are downscaled before processing.
         """
         self.threshold = threshold
         self.min_area = min_area
+        self.scale = scale
+        self.blur_size = max(3, int(21 * scale) | 1)
         self.previous_frame = None
 
+    def _prepare(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Downscale the frame and convert it to a blurred grayscale image.
+
+        Args:
+            frame (np.ndarray): The BGR or BGRA frame.
+
+        Returns:
+            np.ndarray: The blurred, downscaled grayscale frame.
+        """
+        if self.scale != 1.0:
+            frame = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        if frame.ndim == 3:
+            code = cv2.COLOR_BGRA2GRAY if frame.shape[2] == 4 else cv2.COLOR_BGR2GRAY
+            frame = cv2.cvtColor(frame, code)
+        return cv2.GaussianBlur(frame, (self.blur_size, self.blur_size), 0)
+
     def detect_motion(self, frame: np.ndarray) -> Tuple[bool, Optional[np.ndarray]]:
         """
-        DEetect motion in the given frame.
+        Detect motion in the given frame.
 
         Args:
             frame (np.ndarray): The frame in which to detect motion.
         
         Returns:
             Tuple[bool, Optional[np.ndarray]]: A tuple containing a boolean indicating if
-                                               motion is detected and the threshold image.
+                                               motion is detected and the (downscaled)
+                                               threshold image.
         """
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = cv2.GaussianBlur(gray, (21, 21), 0)
+        gray = self._prepare(frame)
+        min_area = self.min_area * self.scale * self.scale
 
-        if self.previous_frame is None:
+        if self.previous_frame is None or self.previous_frame.shape != gray.shape:
             self.previous_frame = gray
             return False, None
         
@@ -37,10 +61,10 @@ class MotionDetector(object):
         thresh = cv2.threshold(frame_delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
 
         thresh = cv2.dilate(thresh, None, iterations=2)
-        contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
         for contour in contours:
-            if cv2.contourArea(contour) < self.min_area:
+            if cv2.contourArea(contour) < min_area:
                 continue
 
             self.previous_frame = gray
@@ -48,3 +72,205 @@ class MotionDetector(object):
         
         self.previous_frame = gray
         return False, None
+
+
+class BackgroundMotionDetector(MotionDetector):
+    """
+    Detects motion against a background model instead of the previous frame.
+
+    Differencing consecutive frames misses a cat that walks slowly, since little
+    changes from one frame to the next, and fires on every change of light. A
+    background model learned over many frames accumulates slow motion, and a
+    mask covering most of the frame is treated as a change of light rather than
+    motion. The background is either OpenCV's MOG2 or a running average, both on
+    the downscaled grayscale frame.
+
+    The area test sums the mask over overlapping windows of an integer integral
+    image instead of extracting contours. Named regions get their own masks and
+    areas, and with regions set only motion inside a region counts.
+
+    Attributes:
+        method (str): 'mog2' or 'running_average'.
+        regions (Dict[str, RegionOfInterest]): Named regions in frame pixels.
+        motion_mask (Optional[np.ndarray]): Foreground mask of the last frame, at the downscaled size.
+        region_masks (Dict[str, np.ndarray]): Foreground mask of the last frame inside each region.
+        region_areas (Dict[str, int]): Foreground pixels of the last frame inside each region,
+                                       in full-resolution pixels.
+    """
+    METHODS = ("mog2", "running_average")
+
+    def __init__(self, method: str = "mog2", threshold: float = 25.0, min_area: int = 500, scale: float = 0.25,
+                 learning_rate: float = 0.01, history: int = 300, var_threshold: float = 16.0,
+                 max_area_fraction: float = 0.6, area_test: str = "integral",
+                 regions: Optional[Dict[str, RegionOfInterest]] = None):
+        """
+        Initialize the BackgroundMotionDetector
+
+        Args:
+            method (str): 'mog2' or 'running_average'.
+            threshold (float): Gray level difference from the running average that counts as motion.
+            min_area (int): The minimum area of motion, in full-resolution pixels.
+            scale (float): Factor by which frames are downscaled before processing.
+            learning_rate (float): Weight of a new frame in the running average, -1 lets MOG2 choose.
+            history (int): Number of frames MOG2 learns the background from.
+            var_threshold (float): Squared distance from the MOG2 background that counts as motion.
+            max_area_fraction (float): Fraction of the frame above which motion is taken as a change of light.
+            area_test (str): 'integral' for the window sum test, 'contours' for the contour area test.
+            regions (Optional[Dict[str, RegionOfInterest]]): Named regions in frame pixels.
+        """
+        super().__init__(threshold, min_area, scale)
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown background method '{method}', expected one of {self.METHODS}")
+        if area_test not in ("integral", "contours"):
+            raise ValueError(f"Unknown area test '{area_test}', expected 'integral' or 'contours'")
+        self.method = method
+        self.learning_rate = learning_rate
+        self.max_area_fraction = max_area_fraction
+        self.area_test = area_test
+        self.regions = regions or {}
+        self.motion_mask: Optional[np.ndarray] = None
+        self.region_masks: Dict[str, np.ndarray] = {}
+        self.region_areas: Dict[str, int] = {}
+        self._background: Optional[np.ndarray] = None
+        self._subtractor = cv2.createBackgroundSubtractorMOG2(history, var_threshold, False) \
+            if method == "mog2" else None
+        self._region_shape = None
+        self._region_pixels: Dict[str, np.ndarray] = {}
+        # Window edge of the area test: twice the side of a square of min_area, so any
+        # compact blob of that area lies completely inside one of the half-overlapping windows.
+        self._min_pixels = max(1, int(np.ceil(min_area * scale * scale)))
+        self._window = 2 * int(np.ceil(np.sqrt(self._min_pixels)))
+
+    def _foreground(self, gray: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Updates the background model and returns the binary foreground mask, None while it has no background yet.
+        """
+        if self._subtractor is not None:
+            first = self._background is None or self._background.shape != gray.shape
+            self._background = gray
+            mask = self._subtractor.apply(gray, learningRate=1.0 if first else self.learning_rate)
+            return None if first else mask
+
+        if self._background is None or self._background.shape != gray.shape:
+            self._background = gray.astype(np.float32)
+            return None
+        delta = cv2.absdiff(gray, cv2.convertScaleAbs(self._background))
+        cv2.accumulateWeighted(gray, self._background, self.learning_rate)
+        return cv2.threshold(delta, self.threshold, 255, cv2.THRESH_BINARY)[1]
+
+    def _relearn(self, gray: np.ndarray):
+        """
+        Replaces the background with the current frame after a change of light.
+        """
+        if self._subtractor is not None:
+            self._subtractor.apply(gray, learningRate=1.0)
+        else:
+            self._background = gray.astype(np.float32)
+
+    def has_area(self, mask: np.ndarray) -> bool:
+        """
+        Tests whether the mask holds at least min_area of motion in one place.
+
+        Args:
+            mask (np.ndarray): Binary mask at the downscaled size.
+
+        Returns:
+            bool: True if some window, or with the contour test some contour, is large enough.
+        """
+        if self.area_test == "contours":
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            return any(cv2.contourArea(contour) >= self._min_pixels for contour in contours)
+
+        h, w = mask.shape
+        integral = cv2.integral(cv2.threshold(mask, 0, 1, cv2.THRESH_BINARY)[1], sdepth=cv2.CV_32S)
+
+        def starts(length: int) -> np.ndarray:
+            size = min(self._window, length)
+            positions = list(range(0, length - size + 1, max(1, size // 2)))
+            if positions[-1] != length - size:
+                positions.append(length - size)
+            return np.asarray(positions)
+
+        ys, xs = starts(h), starts(w)
+        y2, x2 = ys + min(self._window, h), xs + min(self._window, w)
+        sums = (integral[np.ix_(y2, x2)] - integral[np.ix_(ys, x2)]
+                - integral[np.ix_(y2, xs)] + integral[np.ix_(ys, xs)])
+        return bool((sums >= self._min_pixels).any())
+
+    def _region_masks(self, shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
+        """
+        Returns the regions rasterized at the downscaled size, cached per frame size.
+        """
+        if self._region_shape != shape:
+            self._region_pixels = {}
+            for name, region in self.regions.items():
+                pixels = np.zeros(shape, dtype=np.uint8)
+                cv2.fillPoly(pixels, [np.round(p * self.scale).astype(np.int32) for p in region.polygons], 255)
+                self._region_pixels[name] = pixels
+            self._region_shape = shape
+        return self._region_pixels
+
+    def detect_motion(self, frame: np.ndarray) -> Tuple[bool, Optional[np.ndarray]]:
+        """
+        Detect motion in the given frame.
+
+        Args:
+            frame (np.ndarray): The frame in which to detect motion.
+
+        Returns:
+            Tuple[bool, Optional[np.ndarray]]: A tuple containing a boolean indicating if
+                                               motion is detected and the (downscaled)
+                                               foreground mask, limited to the regions if set.
+        """
+        gray = self._prepare(frame)
+        mask = self._foreground(gray)
+        self.motion_mask, self.region_masks, self.region_areas = None, {}, {}
+        if mask is None:
+            return False, None
+
+        mask = cv2.dilate(mask, None, iterations=2)
+        if cv2.countNonZero(mask) > self.max_area_fraction * mask.size:
+            self._relearn(gray)
+            return False, None
+        self.motion_mask = mask
+
+        if not self.regions:
+            return (True, mask) if self.has_area(mask) else (False, None)
+
+        pixel_area = 1.0 / (self.scale * self.scale)
+        for name, pixels in self._region_masks(mask.shape).items():
+            self.region_masks[name] = cv2.bitwise_and(mask, pixels)
+            self.region_areas[name] = int(cv2.countNonZero(self.region_masks[name]) * pixel_area)
+        moving = [name for name, region_mask in self.region_masks.items() if self.has_area(region_mask)]
+        if not moving:
+            return False, None
+        return True, np.bitwise_or.reduce([self.region_masks[name] for name in moving])
+
+
+def parse_regions(spec: str) -> Dict[str, RegionOfInterest]:
+    """
+    Parses named motion regions such as "door=200,120,520,360;path=0,300 200,300 200,360".
+
+    Each entry is a name and one rectangle or polygon in the format of
+    RegionOfInterest.parse, separated by ';'.
+
+    Args:
+        spec (str): The region specification.
+
+    Returns:
+        Dict[str, RegionOfInterest]: The regions by name.
+    """
+    regions = {}
+    for entry in filter(None, (entry.strip() for entry in spec.split(";"))):
+        name, _, region = entry.partition("=")
+        if not name or not region:
+            raise ValueError(f"Invalid motion region '{entry}', expected name=region")
+        regions[name.strip()] = RegionOfInterest.parse(region)
+    return regions
+
+
+MOTION_ENGINES = {
+    "frame_diff": MotionDetector,
+    "mog2": partial(BackgroundMotionDetector, method="mog2"),
+    "running_average": partial(BackgroundMotionDetector, method="running_average"),
+}
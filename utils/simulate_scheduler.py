@@ -0,0 +1,140 @@
+import os
+import json
+import argparse
+import datetime
+import numpy as np
+from typing import Dict, List
+from src.archive import DetectionArchive
+from src.scheduler import AdaptiveScheduler, FixedScheduler, Scheduler
+
+
+def load_visits(path: str) -> List[float]:
+    """
+    Loads visit start times from a detection archive index or a text file.
+
+    Args:
+        path (str): A detections.db file, or a text file with one UNIX timestamp or ISO date per line.
+
+    Returns:
+        List[float]: Sorted UNIX timestamps.
+    """
+    if path.endswith(".db"):
+        archive = DetectionArchive(os.path.dirname(os.path.abspath(path)), db_path=path)
+        try:
+            return archive.visit_times(days=None)
+        finally:
+            archive.close()
+
+    visits = []
+    with open(path) as f:
+        for line in filter(None, (line.strip() for line in f)):
+            try:
+                visits.append(float(line))
+            except ValueError:
+                visits.append(datetime.datetime.fromisoformat(line).timestamp())
+    return sorted(visits)
+
+
+def simulate(scheduler: Scheduler, visits: List[float], start: float, end: float, visit_duration: float,
+             cycle_duration: float, false_motion_rate: float, seed: int = 0) -> Dict[str, float]:
+    """
+    Replays visits through a scheduler and counts detection cycles and missed visits.
+
+    A visit is seen by the first cycle that starts while it lasts. Cycles during a
+    visit see motion, other cycles see motion with probability `false_motion_rate`.
+    The visit history is refreshed at every midnight with the visits before it,
+    like the daily refresh in main.py.
+
+    Args:
+        scheduler (Scheduler): The policy to evaluate.
+        visits (List[float]): Visit start times.
+        start (float): Start of the replay.
+        end (float): End of the replay.
+        visit_duration (float): How long a visit stays in view.
+        cycle_duration (float): How long one detection cycle keeps the camera and model busy.
+        false_motion_rate (float): Probability that a cycle without a visit sees motion.
+        seed (int): Seed for the false motion draws.
+
+    Returns:
+        Dict[str, float]: Cycles, busy fraction, detected and missed visits and detection latency.
+    """
+    rng = np.random.default_rng(seed)
+    visits = np.asarray(sorted(visits))
+    replayed = visits[(visits >= start) & (visits < end)]
+    detected = {}
+    cycles = 0
+    next_refresh = start
+
+    now = start
+    while now < end:
+        if now >= next_refresh:
+            scheduler.update_visits(visits[visits < now].tolist())
+            day = datetime.datetime.fromtimestamp(now).date() + datetime.timedelta(days=1)
+            next_refresh = datetime.datetime.combine(day, datetime.time()).timestamp()
+
+        cycles += 1
+        index = np.searchsorted(replayed, now, side="right") - 1
+        in_visit = index >= 0 and now - replayed[index] <= visit_duration
+        decision = None
+        if in_visit and index not in detected:
+            detected[index] = now - replayed[index]
+            decision = "cat"
+        motion = in_visit or rng.random() < false_motion_rate
+
+        now += cycle_duration
+        scheduler.record_cycle(now, motion, decision)
+        now += scheduler.next_delay(now)
+
+    latencies = list(detected.values())
+    return {
+        "cycles": cycles,
+        "busy_fraction": cycles * cycle_duration / (end - start),
+        "visits": len(replayed),
+        "detected": len(detected),
+        "missed": len(replayed) - len(detected),
+        "median_latency_s": float(np.median(latencies)) if latencies else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare detection schedulers on historic visit times")
+    parser.add_argument("--visits", type=str, required=True,
+                        help="detections.db of the archive, or a file with one timestamp per line")
+    parser.add_argument("--train-days", type=int, default=14,
+                        help="Days of history before the replay starts")
+    parser.add_argument("--visit-duration", type=float, default=180, help="Seconds a visit stays in view")
+    parser.add_argument("--cycle-duration", type=float, default=5, help="Seconds one detection cycle takes")
+    parser.add_argument("--false-motion-rate", type=float, default=0.05,
+                        help="Probability of motion in a cycle without a visit")
+    parser.add_argument("--fixed-interval", type=float, default=30)
+    parser.add_argument("--min-interval", type=float, default=10)
+    parser.add_argument("--max-interval", type=float, default=300)
+    parser.add_argument("--cooldown", type=float, default=7200)
+    parser.add_argument("--json", type=str, default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    visits = load_visits(args.visits)
+    if not visits:
+        raise SystemExit(f"No visits found in {args.visits}")
+    first_day = datetime.datetime.combine(datetime.datetime.fromtimestamp(visits[0]).date(), datetime.time())
+    start = (first_day + datetime.timedelta(days=args.train_days)).timestamp()
+    end = visits[-1] + args.visit_duration
+    if start >= end:
+        raise SystemExit(f"Not enough history for {args.train_days} training days")
+
+    policies = {
+        "fixed": FixedScheduler(args.fixed_interval, args.cooldown),
+        "adaptive": AdaptiveScheduler(args.min_interval, args.max_interval, cooldown=args.cooldown),
+    }
+    results = {name: simulate(scheduler, visits, start, end, args.visit_duration, args.cycle_duration,
+                              args.false_motion_rate)
+               for name, scheduler in policies.items()}
+
+    print(f"Replayed {(end - start) / 86400:.1f} days after {args.train_days} training days")
+    print(f"{'policy':>10} {'cycles':>8} {'busy %':>7} {'visits':>7} {'missed':>7} {'latency s':>10}")
+    for name, result in results.items():
+        print(f"{name:>10} {result['cycles']:>8} {result['busy_fraction'] * 100:>7.2f} {result['visits']:>7} "
+              f"{result['missed']:>7} {result['median_latency_s']:>10.1f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)